@@ -0,0 +1,12 @@
+"""
+PaySlice SMS Benchmarks
+=======================
+
+Offline, in-process load tests for the Lambda handlers:
+
+- fakes.py → in-memory stand-ins for SQS, DynamoDB, Secrets Manager and Twilio
+- run.py   → drives ingest → SQS → worker → Twilio and reports latency and
+             throughput as JSON (python -m bench.run --help)
+
+Nothing here talks to AWS or Twilio.
+"""
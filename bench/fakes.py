@@ -0,0 +1,392 @@
+import itertools
+import json
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from botocore.exceptions import ClientError
+
+# ---------------------------------------------------------------------------
+# In-memory stand-ins used by the benchmarks (and by tests/conftest.py).
+# They implement just the API surface the handlers call, with the same
+# request/response shapes as boto3 / the Twilio SDK.
+# ---------------------------------------------------------------------------
+
+
+def _conditional_failure(item: Optional[dict] = None) -> ClientError:
+    response: Dict[str, Any] = {"Error": {"Code": "ConditionalCheckFailedException", "Message": "failed"}}
+    if item is not None:
+        response["Item"] = item
+    return ClientError(response, "ConditionalCheck")
+
+
+def _n(item: Optional[dict], name: str) -> Optional[float]:
+    if not item or name not in item:
+        return None
+    return float(item[name]["N"])
+
+
+class FakeSQS:
+    """
+    Multi-queue SQS fake. Messages are delivered as Lambda SQS event records
+    by receive(); DelaySeconds is recorded but not enforced unless
+    `honor_delay` is set.
+    """
+
+    def __init__(self, honor_delay: bool = False, latency: float = 0.0, clock: Callable[[], float] = time.time):
+        self.honor_delay = honor_delay
+        self.latency = latency
+        self._clock = clock
+        self._queues: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+        self.calls: Dict[str, int] = {"send_message": 0, "send_message_batch": 0}
+
+    def _queue(self, url: str) -> deque:
+        return self._queues.setdefault(url, deque())
+
+    def _enqueue(self, url: str, body: str, delay: int, attributes: Optional[dict] = None) -> str:
+        message_id = str(uuid.uuid4())
+        now = self._clock()
+        self._queue(url).append(
+            {
+                "messageId": message_id,
+                "receiptHandle": f"rh-{message_id}",
+                "body": body,
+                "attributes": {
+                    "ApproximateReceiveCount": "0",
+                    "SentTimestamp": str(int(now * 1000)),
+                },
+                "messageAttributes": attributes or {},
+                "eventSource": "aws:sqs",
+                "_visible_at": now + (delay or 0),
+            }
+        )
+        return message_id
+
+    def send_message(self, QueueUrl, MessageBody, DelaySeconds=0, MessageAttributes=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls["send_message"] += 1
+            return {"MessageId": self._enqueue(QueueUrl, MessageBody, DelaySeconds, MessageAttributes)}
+
+    def send_message_batch(self, QueueUrl, Entries, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls["send_message_batch"] += 1
+            successful = [
+                {
+                    "Id": e["Id"],
+                    "MessageId": self._enqueue(
+                        QueueUrl, e["MessageBody"], e.get("DelaySeconds", 0), e.get("MessageAttributes")
+                    ),
+                }
+                for e in Entries
+            ]
+        return {"Successful": successful, "Failed": []}
+
+    def receive(self, url: str, max_records: int = 10) -> List[dict]:
+        """
+        Pop up to `max_records` visible messages as Lambda SQS records.
+        """
+        now = self._clock()
+        out: List[dict] = []
+        with self._lock:
+            queue = self._queue(url)
+            skipped: List[dict] = []
+            while queue and len(out) < max_records:
+                msg = queue.popleft()
+                if self.honor_delay and msg["_visible_at"] > now:
+                    skipped.append(msg)
+                    continue
+                attrs = msg["attributes"]
+                attrs["ApproximateReceiveCount"] = str(int(attrs["ApproximateReceiveCount"]) + 1)
+                attrs.setdefault("ApproximateFirstReceiveTimestamp", str(int(now * 1000)))
+                out.append(msg)
+            queue.extendleft(reversed(skipped))
+        return [{k: v for k, v in m.items() if not k.startswith("_")} for m in out]
+
+    def receive_message(self, QueueUrl, MaxNumberOfMessages=1, VisibilityTimeout=30, WaitTimeSeconds=0, **kwargs):
+        """
+        SQS API receive: messages stay queued, hidden for VisibilityTimeout,
+        until delete_message_batch removes them.
+        """
+        now = self._clock()
+        out: List[dict] = []
+        with self._lock:
+            self.calls["receive_message"] = self.calls.get("receive_message", 0) + 1
+            for msg in self._queue(QueueUrl):
+                if len(out) >= MaxNumberOfMessages:
+                    break
+                if msg.get("_hidden_until", 0) > now or (self.honor_delay and msg["_visible_at"] > now):
+                    continue
+                msg["_hidden_until"] = now + VisibilityTimeout
+                msg["receiptHandle"] = f"rh-{msg['messageId']}-{uuid.uuid4().hex[:8]}"
+                attrs = msg["attributes"]
+                attrs["ApproximateReceiveCount"] = str(int(attrs["ApproximateReceiveCount"]) + 1)
+                out.append(
+                    {
+                        "MessageId": msg["messageId"],
+                        "ReceiptHandle": msg["receiptHandle"],
+                        "Body": msg["body"],
+                        "Attributes": dict(attrs),
+                    }
+                )
+        return {"Messages": out} if out else {}
+
+    def delete_message_batch(self, QueueUrl, Entries, **kwargs):
+        with self._lock:
+            self.calls["delete_message_batch"] = self.calls.get("delete_message_batch", 0) + 1
+            queue = self._queue(QueueUrl)
+            handles = {e["ReceiptHandle"]: e["Id"] for e in Entries}
+            kept = [m for m in queue if m["receiptHandle"] not in handles]
+            deleted = {m["receiptHandle"] for m in queue} & handles.keys()
+            queue.clear()
+            queue.extend(kept)
+        return {
+            "Successful": [{"Id": handles[h]} for h in deleted],
+            "Failed": [
+                {"Id": i, "Code": "ReceiptHandleIsInvalid", "SenderFault": True}
+                for h, i in handles.items()
+                if h not in deleted
+            ],
+        }
+
+    def requeue(self, url: str, records: List[dict]) -> None:
+        """
+        Make records visible again (what SQS does for batchItemFailures).
+        """
+        with self._lock:
+            for rec in records:
+                self._queue(url).append(dict(rec, _visible_at=0))
+
+    def depth(self, url: str) -> int:
+        with self._lock:
+            return len(self._queue(url))
+
+
+class FakeDynamoDB:
+    """
+    Dict-backed DynamoDB fake. Only the condition / update expressions that
+    utils.* issue are understood; anything else raises NotImplementedError
+    so a new expression can't silently pass.
+    """
+
+    # Known ConditionExpressions -> predicate(existing_item, values)
+    CONDITIONS: Dict[str, Callable[[Optional[dict], dict], bool]] = {
+        "attribute_not_exists(id) OR expires_at < :now": (
+            lambda item, v: item is None or _n(item, "expires_at") < float(v[":now"]["N"])
+        ),
+        "attribute_not_exists(id) OR expires_at < :now OR event_id = :eid": (
+            lambda item, v: item is None
+            or _n(item, "expires_at") < float(v[":now"]["N"])
+            or item.get("event_id") == v[":eid"]
+        ),
+        "claimed_at = :claimed_at": lambda item, v: item is not None and item.get("claimed_at") == v[":claimed_at"],
+        "attribute_not_exists(id)": lambda item, v: item is None,
+        "attribute_not_exists(message_sid) OR status_rank < :r": (
+            lambda item, v: item is None or _n(item, "status_rank") < float(v[":r"]["N"])
+        ),
+        "updated_at = :prev": lambda item, v: item is not None and item["updated_at"] == v[":prev"],
+        "#s = :in_flight": lambda item, v: item is not None and item.get("status") == v[":in_flight"],
+    }
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.tables: Dict[str, Dict[str, dict]] = {}
+        self.calls: List[str] = []
+        self._lock = threading.Lock()
+
+    def _table(self, name: str) -> Dict[str, dict]:
+        return self.tables.setdefault(name, {})
+
+    @staticmethod
+    def _key(key: dict) -> str:
+        (attr,) = key.values()
+        return attr["S"]
+
+    def _check(self, expression: Optional[str], item: Optional[dict], values: Optional[dict]) -> bool:
+        if not expression:
+            return True
+        predicate = self.CONDITIONS.get(expression)
+        if predicate is None:
+            raise NotImplementedError(f"FakeDynamoDB: unsupported condition {expression!r}")
+        return predicate(item, values or {})
+
+    def _call(self, name: str) -> None:
+        self.calls.append(name)
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get_item(self, TableName, Key, **kwargs):
+        self._call("get_item")
+        with self._lock:
+            item = self._table(TableName).get(self._key(Key))
+        return {"Item": dict(item)} if item else {}
+
+    def put_item(self, TableName, Item, ConditionExpression=None, ExpressionAttributeValues=None,
+                 ReturnValuesOnConditionCheckFailure=None, **kwargs):
+        self._call("put_item")
+        key_attr = "message_sid" if "message_sid" in Item else "id"
+        with self._lock:
+            table = self._table(TableName)
+            existing = table.get(Item[key_attr]["S"])
+            if not self._check(ConditionExpression, existing, ExpressionAttributeValues):
+                raise _conditional_failure(
+                    existing if ReturnValuesOnConditionCheckFailure == "ALL_OLD" else None
+                )
+            table[Item[key_attr]["S"]] = dict(Item)
+        return {}
+
+    def delete_item(self, TableName, Key, ConditionExpression=None, ExpressionAttributeValues=None, **kwargs):
+        self._call("delete_item")
+        with self._lock:
+            table = self._table(TableName)
+            key = self._key(Key)
+            if not self._check(ConditionExpression, table.get(key), ExpressionAttributeValues):
+                raise _conditional_failure()
+            table.pop(key, None)
+        return {}
+
+    def update_item(self, TableName, Key, UpdateExpression, ConditionExpression=None,
+                    ExpressionAttributeNames=None, ExpressionAttributeValues=None, **kwargs):
+        self._call("update_item")
+        names = ExpressionAttributeNames or {}
+        values = ExpressionAttributeValues or {}
+        (key_attr, key_value), = Key.items()
+        with self._lock:
+            table = self._table(TableName)
+            existing = table.get(key_value["S"])
+            if not self._check(ConditionExpression, existing, values):
+                raise _conditional_failure()
+            item = dict(existing or {key_attr: key_value})
+            assert UpdateExpression.startswith("SET "), UpdateExpression
+            for assignment in UpdateExpression[4:].split(", "):
+                target, expr = (part.strip() for part in assignment.split(" = ", 1))
+                target = names.get(target, target)
+                if expr.startswith("if_not_exists("):
+                    attr, placeholder = expr[len("if_not_exists("):-1].split(", ")
+                    if attr not in item:
+                        item[target] = values[placeholder]
+                else:
+                    item[target] = values[expr]
+            table[key_value["S"]] = item
+        return {}
+
+    def batch_get_item(self, RequestItems):
+        self._call("batch_get_item")
+        responses: Dict[str, List[dict]] = {}
+        with self._lock:
+            for name, request in RequestItems.items():
+                table = self._table(name)
+                keys = (self._key(k) for k in request["Keys"])
+                responses[name] = [dict(table[k]) for k in keys if k in table]
+        return {"Responses": responses, "UnprocessedKeys": {}}
+
+    def query(self, TableName, KeyConditionExpression, ExpressionAttributeValues, IndexName=None, **kwargs):
+        self._call("query")
+        attr, placeholder = (p.strip() for p in KeyConditionExpression.split(" = "))
+        wanted = ExpressionAttributeValues[placeholder]
+        with self._lock:
+            items = [dict(i) for i in self._table(TableName).values() if i.get(attr) == wanted]
+        return {"Items": items}
+
+
+class FakeSecretsManager:
+    def __init__(self, secrets: Optional[Dict[str, dict]] = None, latency: float = 0.0):
+        self.secrets = secrets or {}
+        self.latency = latency
+        self.calls = 0
+
+    def get_secret_value(self, SecretId):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return {"SecretString": json.dumps(self.secrets[SecretId])}
+
+
+class FakeTwilioError(Exception):
+    """Shaped like twilio.base.exceptions.TwilioRestException (has .status)."""
+
+    def __init__(self, status: int, code: Optional[int] = None):
+        super().__init__(f"HTTP {status} error from fake Twilio")
+        self.status = status
+        self.code = code
+
+
+class FakeTwilioMessage:
+    __slots__ = ("sid", "status", "to", "body")
+
+    def __init__(self, sid, status, to, body):
+        self.sid = sid
+        self.status = status
+        self.to = to
+        self.body = body
+
+
+class FakeTwilio:
+    """
+    Twilio client fake: `client.messages.create(...)` with configurable
+    latency (mean ± jitter, seconds), 5xx error rate and 429 rate.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self._random = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.sent: List[FakeTwilioMessage] = []
+        self.errors = 0
+        self.throttled = 0
+        self.messages = self
+
+    def create(self, to, body, messaging_service_sid=None, status_callback=None, **kwargs):
+        with self._lock:
+            roll = self._random.random()
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+        if delay:
+            time.sleep(delay)
+
+        with self._lock:
+            if roll < self.throttle_rate:
+                self.throttled += 1
+                raise FakeTwilioError(429, 20429)
+            if roll < self.throttle_rate + self.error_rate:
+                self.errors += 1
+                raise FakeTwilioError(503)
+            msg = FakeTwilioMessage(f"SM{next(self._ids):032d}", "accepted", to, body)
+            self.sent.append(msg)
+            return msg
+
+
+class FakeAWS:
+    """
+    Bundle of AWS fakes with a boto3.client-compatible factory.
+    """
+
+    def __init__(self, sqs=None, dynamodb=None, secretsmanager=None):
+        self.services = {
+            "sqs": sqs or FakeSQS(),
+            "dynamodb": dynamodb or FakeDynamoDB(),
+            "secretsmanager": secretsmanager or FakeSecretsManager(),
+        }
+
+    def client(self, service_name, *args, **kwargs):
+        try:
+            return self.services[service_name]
+        except KeyError:
+            raise NotImplementedError(f"FakeAWS: no fake for {service_name!r}")
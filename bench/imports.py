@@ -0,0 +1,139 @@
+"""
+Cold-start import profile for each Lambda entry point.
+
+    python -m bench.imports                  # every handler
+    python -m bench.imports status --top 15  # one handler, more detail
+
+Each handler is imported in a fresh interpreter with `-X importtime` (the
+same data Lambda writes to CloudWatch when PYTHONPROFILEIMPORTTIME=1 is set
+on a function). The report shows total import time, the time per top-level
+package, and the slowest individual modules.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, "src")
+
+HANDLERS = ("health", "status", "status_consumer", "ingest", "worker", "dispatcher", "replay")
+
+# Minimal env so modules that read config at import don't fail
+IMPORT_ENV = {
+    "AWS_REGION": "us-east-1",
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "LOG_LEVEL": "WARNING",
+}
+
+# (self_us, cumulative_us, depth, module)
+ImportRow = Tuple[int, int, int, str]
+
+
+def parse_importtime(stderr: str) -> List[ImportRow]:
+    """
+    Parse `-X importtime` output lines:
+
+        import time: self [us] | cumulative | imported package
+        import time:       125 |        125 |   utils.logger
+    """
+    rows: List[ImportRow] = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        rows.append((int(self_us), int(cumulative_us), depth, name.strip()))
+    return rows
+
+
+def profile_handler(handler: str, env: Optional[Dict[str, str]] = None) -> List[ImportRow]:
+    """
+    Import `handler` in a fresh interpreter (cwd=src/, like Lambda) and
+    return its import-time rows.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {handler}"],
+        cwd=SRC_DIR,
+        env=dict(os.environ, **IMPORT_ENV, **(env or {}), PYTHONPATH=SRC_DIR),
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {handler} failed:\n{proc.stderr[-2000:]}")
+
+    rows = parse_importtime(proc.stderr)
+    # Everything imported before the handler (site, encodings, ...) is
+    # interpreter startup, not handler cold start.
+    for i, row in enumerate(rows):
+        if row[2] == 0 and row[3] == handler:
+            start = i
+            while start > 0 and rows[start - 1][2] > 0:
+                start -= 1
+            return rows[start:i + 1]
+    return rows
+
+
+def summarize(rows: List[ImportRow], top: int = 10) -> Dict[str, Any]:
+    total_us = sum(r[1] for r in rows if r[2] == 0)
+    packages: Dict[str, int] = {}
+    for self_us, _, _, name in rows:
+        root = name.split(".", 1)[0]
+        packages[root] = packages.get(root, 0) + self_us
+
+    def ms(us: int) -> float:
+        return round(us / 1000, 3)
+
+    return {
+        "total_ms": ms(total_us),
+        "modules": len(rows),
+        "by_package_ms": {
+            name: ms(us) for name, us in sorted(packages.items(), key=lambda kv: -kv[1])[:top]
+        },
+        "slowest_modules_ms": [
+            {"module": name, "self": ms(self_us), "cumulative": ms(cum_us)}
+            for self_us, cum_us, _, name in sorted(rows, key=lambda r: -r[0])[:top]
+        ],
+    }
+
+
+def profile(handlers=HANDLERS, runs: int = 3, top: int = 10) -> Dict[str, Any]:
+    """
+    Median-of-`runs` total import time per handler, with the breakdown of
+    the median run.
+    """
+    report: Dict[str, Any] = {}
+    for handler in handlers:
+        summaries = sorted(
+            (summarize(profile_handler(handler), top) for _ in range(max(1, runs))),
+            key=lambda s: s["total_ms"],
+        )
+        median = summaries[len(summaries) // 2]
+        median["runs_ms"] = [s["total_ms"] for s in summaries]
+        median["total_ms"] = round(statistics.median(median["runs_ms"]), 3)
+        report[handler] = median
+    return report
+
+
+def main(argv=None) -> None:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("handlers", nargs="*", default=list(HANDLERS), help="handler modules (default: all)")
+    p.add_argument("--runs", type=int, default=3, help="fresh-interpreter imports per handler")
+    p.add_argument("--top", type=int, default=10, help="packages/modules to list per handler")
+    p.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = p.parse_args(argv)
+
+    report = json.dumps(profile(args.handlers, args.runs, args.top), indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
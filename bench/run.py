@@ -0,0 +1,255 @@
+"""
+Offline load test: ingest → SQS → worker → Twilio, entirely in-process.
+
+    python -m bench.run --events 2000 --rate 500 --twilio-latency-ms 80 \
+        --out bench_output.json
+
+Reports p50/p95/p99 handler latency, msgs/sec and cold-start import time
+per handler as JSON (stdout, or --out).
+"""
+
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from bench import imports
+from bench.fakes import FakeAWS, FakeDynamoDB, FakeSecretsManager, FakeSQS, FakeTwilio
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, "src")
+
+QUEUE_URL = "https://sqs.us-east-1.amazonaws.com/000000000000/bench-approved"
+SECRET_NAME = "bench/twilio"
+HANDLERS = imports.HANDLERS
+
+BENCH_ENV = {
+    "AWS_REGION": "us-east-1",
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "AWS_ACCESS_KEY_ID": "bench",
+    "AWS_SECRET_ACCESS_KEY": "bench",
+    "APPROVED_QUEUE_URL": QUEUE_URL,
+    "APPROVED_DELAY_SECONDS": "120",
+    "IDEMPOTENCY_TABLE": "bench-idempotency",
+    "TWILIO_SECRET_NAME": SECRET_NAME,
+    # Requests carry the secret's bearer token, as in production
+    "INGEST_AUTH_REQUIRED": "true",
+}
+
+
+def percentiles(samples: List[float]) -> Dict[str, Optional[float]]:
+    """
+    p50/p95/p99/max in milliseconds (None when there are no samples).
+    """
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": round(ordered[-1] * 1000, 3)}
+
+
+def measure_cold_starts(runs: int) -> Dict[str, Dict[str, Any]]:
+    """
+    Median import time per handler in a fresh interpreter, with the three
+    most expensive packages (see bench.imports for the full breakdown).
+    """
+    return {
+        handler: {"import_ms_median": r["total_ms"], "top_packages_ms": r["by_package_ms"]}
+        for handler, r in imports.profile(HANDLERS, runs, top=3).items()
+    }
+
+
+def install_fakes(aws: FakeAWS, twilio: FakeTwilio):
+    """
+    Point boto3 and the Twilio SDK at the fakes, then (re)load the handlers.
+    """
+    os.environ.update(BENCH_ENV)
+    if SRC_DIR not in sys.path:
+        sys.path.insert(0, SRC_DIR)
+
+    import boto3
+
+    boto3.client = aws.client
+
+    import utils.idempotency as idempotency
+    import utils.secrets as secrets
+    import utils.twilio_client as twilio_client
+
+    # Build the real client path (Secrets Manager → build_client) but hand
+    # back the fake instead of twilio.rest.Client
+    twilio_client.TwilioClient = lambda *args, **kwargs: twilio
+    secrets._client = None
+    idempotency._client = None
+    idempotency.recent.clear()
+
+    ingest = importlib.reload(importlib.import_module("ingest"))
+    worker = importlib.reload(importlib.import_module("worker"))
+    return ingest, worker
+
+
+def _event(i: int, in_transit_ratio: float) -> dict:
+    in_transit = (i % 100) < in_transit_ratio * 100
+    return {
+        "event_id": str(uuid.uuid4()),
+        "event": "advance_in_transit" if in_transit else "advance_approved",
+        "user": {"phone": f"+1555{2_000_000 + i % 8_000_000:07d}"},
+        "amount": round(10 + (i % 500) * 1.5, 2),
+    }
+
+
+def drive_ingest(ingest, events: int, rate: float, in_transit_ratio: float, ingest_batch: int) -> Dict[str, Any]:
+    """
+    Open-loop: issue requests on a fixed schedule of `rate` events/sec
+    (0 = as fast as possible) and time each handler call.
+    """
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    interval = ingest_batch / rate if rate else 0.0
+    started = time.perf_counter()
+
+    for n, first in enumerate(range(0, events, ingest_batch)):
+        if interval:
+            delay = started + n * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        batch = [_event(i, in_transit_ratio) for i in range(first, min(events, first + ingest_batch))]
+        body = batch if ingest_batch > 1 else batch[0]
+        t = time.perf_counter()
+        resp = ingest.lambda_handler({"headers": {"authorization": "Bearer bench"}, "body": json.dumps(body)}, None)
+        latencies.append(time.perf_counter() - t)
+        statuses[resp["statusCode"]] = statuses.get(resp["statusCode"], 0) + 1
+
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "events": events,
+        "status_codes": statuses,
+        "latency_ms": percentiles(latencies),
+        "events_per_sec": round(events / elapsed, 2) if elapsed else None,
+    }
+
+
+def drain_worker(worker, sqs: FakeSQS, batch_size: int, max_receives: int) -> Dict[str, Any]:
+    """
+    Feed the queue to the worker in SQS-sized batches, redelivering
+    batchItemFailures until `max_receives` (then they count as DLQ'd).
+    """
+    latencies: List[float] = []
+    batch_sizes: List[int] = []
+    dead_lettered = 0
+    redelivered = 0
+    started = time.perf_counter()
+
+    while True:
+        records = sqs.receive(QUEUE_URL, batch_size)
+        if not records:
+            break
+        t = time.perf_counter()
+        resp = worker.lambda_handler({"Records": records}, None)
+        latencies.append(time.perf_counter() - t)
+        batch_sizes.append(len(records))
+
+        failed = {f["itemIdentifier"] for f in (resp or {}).get("batchItemFailures", [])}
+        retry = []
+        for rec in records:
+            if rec["messageId"] not in failed:
+                continue
+            if int(rec["attributes"]["ApproximateReceiveCount"]) >= max_receives:
+                dead_lettered += 1
+            else:
+                retry.append(rec)
+        redelivered += len(retry)
+        sqs.requeue(QUEUE_URL, retry)
+
+    elapsed = time.perf_counter() - started
+    processed = sum(batch_sizes)
+    return {
+        "batches": len(latencies),
+        "records": processed,
+        "redelivered": redelivered,
+        "dead_lettered": dead_lettered,
+        "batch_latency_ms": percentiles(latencies),
+        "msgs_per_sec": round(processed / elapsed, 2) if elapsed else None,
+    }
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    os.environ.setdefault("LOG_LEVEL", args.log_level)
+    os.environ["WORKER_CONCURRENCY"] = str(args.worker_concurrency)
+
+    sqs = FakeSQS(latency=args.sqs_latency_ms / 1000)
+    ddb = FakeDynamoDB(latency=args.dynamodb_latency_ms / 1000)
+    secrets = FakeSecretsManager(
+        {SECRET_NAME: {"account_sid": "ACbench", "auth_token": "bench", "msid": "MGbench", "bearer": "bench"}}
+    )
+    twilio = FakeTwilio(
+        latency=args.twilio_latency_ms / 1000,
+        jitter=args.twilio_jitter_ms / 1000,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        seed=args.seed,
+    )
+    aws = FakeAWS(sqs=sqs, dynamodb=ddb, secretsmanager=secrets)
+
+    report: Dict[str, Any] = {"config": vars(args)}
+    if args.cold_start_runs:
+        report["cold_start"] = measure_cold_starts(args.cold_start_runs)
+
+    ingest, worker = install_fakes(aws, twilio)
+    report["ingest"] = drive_ingest(ingest, args.events, args.rate, args.in_transit_ratio, args.ingest_batch)
+    report["worker"] = drain_worker(worker, sqs, args.batch_size, args.max_receives)
+    report["twilio"] = {
+        "sent": len(twilio.sent),
+        "errors": twilio.errors,
+        "throttled": twilio.throttled,
+    }
+    report["aws_calls"] = {
+        "sqs": dict(sqs.calls),
+        "dynamodb": len(ddb.calls),
+        "secretsmanager": secrets.calls,
+    }
+    return report
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--events", type=int, default=1000, help="events to ingest")
+    p.add_argument("--rate", type=float, default=0, help="ingest events/sec (0 = unthrottled)")
+    p.add_argument("--ingest-batch", type=int, default=1, help="events per /sms request (>1 uses batch mode)")
+    p.add_argument("--in-transit-ratio", type=float, default=0.5, help="share of advance_in_transit events")
+    p.add_argument("--batch-size", type=int, default=10, help="SQS → worker batch size")
+    p.add_argument("--worker-concurrency", type=int, default=10)
+    p.add_argument("--max-receives", type=int, default=3, help="redeliveries before a record is DLQ'd")
+    p.add_argument("--twilio-latency-ms", type=float, default=50.0)
+    p.add_argument("--twilio-jitter-ms", type=float, default=10.0)
+    p.add_argument("--error-rate", type=float, default=0.0, help="share of Twilio 5xx responses")
+    p.add_argument("--throttle-rate", type=float, default=0.0, help="share of Twilio 429 responses")
+    p.add_argument("--sqs-latency-ms", type=float, default=0.0)
+    p.add_argument("--dynamodb-latency-ms", type=float, default=0.0)
+    p.add_argument("--cold-start-runs", type=int, default=3, help="fresh-interpreter imports per handler (0 = skip)")
+    p.add_argument("--seed", type=int, default=None)
+    p.add_argument("--log-level", default="WARNING")
+    p.add_argument("--out", help="write the JSON report here instead of stdout")
+    return p.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    report = json.dumps(run(args), indent=2, sort_keys=True)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
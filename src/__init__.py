@@ -9,8 +9,9 @@ through Twilio, using AWS SAM, Lambda, SQS, and Secrets Manager.
 Modules under this package:
 - ingest.py   → HTTP endpoint for event ingestion (/sms)
 - worker.py   → SQS-triggered processor for delayed “Approved” messages
-- status.py   → Twilio delivery status webhook (/twilio/status)
-- health.py   → Health and version checks (/healthz, /version)
+- status.py   → Twilio delivery status webhook (/status) + GET /status/{event_id}
+- status_consumer.py → SQS-triggered batch writer for delivery status
+- health.py   → Health, readiness and version checks (/health, /health?deep=1, /version)
 - utils/      → Shared helper modules (logging, secrets, Twilio client, etc.)
 
 Environment variables expected:
@@ -0,0 +1,91 @@
+import os
+import time
+from typing import Any, Dict, List
+
+import boto3
+
+from utils import sqs_batch
+from utils.concurrency import resolve_max_workers
+from utils.logger import flush_logs, get_logger
+from utils.metrics import UNIT_MILLISECONDS, flush_metrics, get_metrics
+from utils.scheduler import from_env as scheduler_from_env
+
+logger = get_logger("dispatcher")
+
+# EMF metrics, flushed once per invocation (POWERTOOLS_METRICS_NAMESPACE)
+metrics = get_metrics("dispatcher")
+
+# Reuse AWS clients across invocations
+sqs = boto3.client("sqs")
+
+# Schedule index written by ingest (None without SCHEDULE_TABLE)
+scheduler = scheduler_from_env()
+
+# Stop starting new buckets this long before the function times out
+DEADLINE_MARGIN_SECONDS = 10
+
+
+def _enqueue(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Enqueue a page of due entries with SendMessageBatch, each to its own
+    queue_url or APPROVED_QUEUE_URL. Returns the entries that failed.
+
+    Runs on the scheduler's shard threads, so chunks are sent one after the
+    other here rather than on another pool.
+    """
+    default_queue_url = os.getenv("APPROVED_QUEUE_URL")
+    by_queue: Dict[str, List[Dict[str, Any]]] = {}
+    for entry in entries:
+        by_queue.setdefault(entry.get("queue_url") or default_queue_url, []).append(entry)
+
+    failed: List[Dict[str, Any]] = []
+    for queue_url, group in by_queue.items():
+        for chunk in sqs_batch.chunks(group):
+            outcomes = sqs_batch.send_message_batch(
+                sqs,
+                queue_url,
+                [
+                    {"Id": str(n), "MessageBody": entry["body"], "DelaySeconds": entry["delay_seconds"]}
+                    for n, entry in enumerate(chunk)
+                ],
+                metrics=metrics,
+            )
+            for entry_id, outcome in outcomes.items():
+                if outcome["status"] != "queued":
+                    entry = chunk[int(entry_id)]
+                    failed.append(entry)
+                    logger.warning(
+                        "dispatcher.enqueue_failed",
+                        extra={"schedule_id": entry["schedule_id"], "error": outcome.get("error")},
+                    )
+    return failed
+
+
+@flush_logs
+@flush_metrics(metrics)
+def lambda_handler(event, context):
+    if scheduler is None or not os.getenv("APPROVED_QUEUE_URL"):
+        msg = "Scheduled dispatch needs SCHEDULE_TABLE and APPROVED_QUEUE_URL"
+        logger.error("dispatcher.env_error", extra={"error": msg})
+        raise RuntimeError(msg)
+
+    deadline = None
+    if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+        deadline = time.time() + context.get_remaining_time_in_millis() / 1000 - DEADLINE_MARGIN_SECONDS
+
+    stats = scheduler.dispatch(
+        _enqueue,
+        deadline=deadline,
+        max_workers=resolve_max_workers("DISPATCH_CONCURRENCY", default=scheduler.shards),
+    )
+
+    logger.info("dispatcher.run", extra=stats)
+    metrics.count("ScheduleBucketsScanned", stats["buckets"])
+    metrics.count("ScheduledDue", stats["due"])
+    metrics.count("ScheduledDispatched", stats["dispatched"])
+    metrics.count("ScheduledEnqueueErrors", stats["failed"])
+    if stats["due"]:
+        # How late the most overdue message was enqueued (0 when nothing was late)
+        metrics.gauge("ScheduleDispatchLag", stats["max_lag_seconds"] * 1000, unit=UNIT_MILLISECONDS)
+    metrics.gauge("ScheduleCursorBehind", stats["behind_seconds"] * 1000, unit=UNIT_MILLISECONDS)
+    return stats
@@ -1,12 +1,188 @@
-from utils.logger import get_logger
+import http.client
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import wait
+from typing import Any, Callable, Dict, Optional
 
-log = get_logger("health")
+from utils.concurrency import get_executor
+from utils.logger import flush_logs, get_logger
 
+logger = get_logger("health")
 
-def lambda_handler(event, context):
-    log("health.check", path="/health", method=event.get("requestContext", {}).get("http", {}).get("method", "GET"))
+# GET /health          liveness: answers from memory, imports no SDKs
+# GET /health?deep=1   readiness: probes every configured dependency
+#                      concurrently and returns 503 if any of them is down
+# GET /version         deployed __version__
+#
+# Probe results are cached per container for HEALTH_CACHE_TTL_SECONDS, so
+# load balancers and synthetic monitors polling every few seconds don't turn
+# into load on Secrets Manager, SQS, DynamoDB or Twilio.
+PROBE_TIMEOUT_SECONDS = float(os.getenv("HEALTH_PROBE_TIMEOUT_SECONDS", "1"))
+CACHE_TTL_SECONDS = float(os.getenv("HEALTH_CACHE_TTL_SECONDS", "15"))
+
+TWILIO_API_HOST = "api.twilio.com"
+
+
+def _read_version() -> str:
+    # src/ is the deployment root, so its __init__.py is not importable as a
+    # package; read __version__ out of it instead.
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "__init__.py")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            match = re.search(r'^__version__\s*=\s*["\']([^"\']+)["\']', f.read(), re.MULTILINE)
+    except OSError:
+        match = None
+    return match.group(1) if match else "unknown"
+
+
+__version__ = _read_version()
+
+# boto3 clients for the probes, created on the first deep check. Their
+# timeouts are tight and they never retry: a probe should report a slow
+# dependency, not wait it out.
+_clients: Dict[str, Any] = {}
+_clients_lock = threading.Lock()
+
+
+def _client(service: str):
+    client = _clients.get(service)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(service)
+            if client is None:
+                import boto3
+                from botocore.config import Config
+
+                client = boto3.client(
+                    service,
+                    config=Config(
+                        connect_timeout=PROBE_TIMEOUT_SECONDS,
+                        read_timeout=PROBE_TIMEOUT_SECONDS,
+                        retries={"total_max_attempts": 1},
+                    ),
+                )
+                _clients[service] = client
+    return client
+
+
+def _probe_secrets() -> None:
+    # Metadata only; the secret value never leaves Secrets Manager
+    _client("secretsmanager").describe_secret(SecretId=os.environ["TWILIO_SECRET_NAME"])
+
+
+def _probe_sqs() -> None:
+    _client("sqs").get_queue_attributes(
+        QueueUrl=os.environ["APPROVED_QUEUE_URL"], AttributeNames=["ApproximateNumberOfMessages"]
+    )
+
+
+def _probe_dynamodb() -> None:
+    _client("dynamodb").describe_table(TableName=os.environ["IDEMPOTENCY_TABLE"])
+
+
+def _probe_twilio() -> None:
+    # Unauthenticated HEAD: proves DNS, TLS and the Twilio edge are reachable
+    # without spending API quota or loading the Twilio SDK
+    conn = http.client.HTTPSConnection(TWILIO_API_HOST, timeout=PROBE_TIMEOUT_SECONDS)
+    try:
+        conn.request("HEAD", "/2010-04-01")
+        status = conn.getresponse().status
+    finally:
+        conn.close()
+    if status >= 500:
+        raise RuntimeError(f"HTTP {status}")
+
+
+# name → (probe, env var it needs). Probes whose env var is unset are skipped.
+PROBES: Dict[str, tuple] = {
+    "secrets_manager": (_probe_secrets, "TWILIO_SECRET_NAME"),
+    "sqs": (_probe_sqs, "APPROVED_QUEUE_URL"),
+    "dynamodb": (_probe_dynamodb, "IDEMPOTENCY_TABLE"),
+    "twilio": (_probe_twilio, None),
+}
+
+# name → (checked_at, result)
+_cache: Dict[str, tuple] = {}
+
+
+def _run_probe(probe: Callable[[], None]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        probe()
+        result: Dict[str, Any] = {"status": "ok"}
+    except Exception as e:
+        result = {"status": "error", "error": f"{type(e).__name__}: {e}"[:200]}
+    result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def check_dependencies(now: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Probe every configured dependency concurrently, each bounded by
+    PROBE_TIMEOUT_SECONDS, reusing results younger than CACHE_TTL_SECONDS.
+    """
+    now = time.monotonic() if now is None else now
+    checks: Dict[str, Dict[str, Any]] = {}
+    due: Dict[str, Callable[[], None]] = {}
+    for name, (probe, env_var) in PROBES.items():
+        if env_var and not os.getenv(env_var):
+            continue
+        cached = _cache.get(name)
+        if cached is not None and now - cached[0] < CACHE_TTL_SECONDS:
+            checks[name] = dict(cached[1], cached=True)
+        else:
+            due[name] = probe
+
+    if due:
+        executor = get_executor(len(PROBES))
+        futures = {name: executor.submit(_run_probe, probe) for name, probe in due.items()}
+        wait(futures.values(), timeout=PROBE_TIMEOUT_SECONDS)
+        for name, future in futures.items():
+            if future.done():
+                result = future.result()
+            else:
+                # Left to finish in the background; its result is discarded
+                result = {"status": "timeout", "latency_ms": round(PROBE_TIMEOUT_SECONDS * 1000, 1)}
+            _cache[name] = (now, result)
+            checks[name] = dict(result, cached=False)
+
+    return checks
+
+
+def _json(status_code: int, body: dict) -> dict:
     return {
-        "statusCode": 200,
-        "headers": {"Content-Type": "application/json"},
-        "body": '{"status":"ok"}',
+        "statusCode": status_code,
+        "headers": {"Content-Type": "application/json", "Cache-Control": "no-store"},
+        "body": json.dumps(body),
     }
+
+
+@flush_logs
+def lambda_handler(event, context):
+    path = event.get("rawPath") or event.get("requestContext", {}).get("http", {}).get("path", "/health")
+    deep = (event.get("queryStringParameters") or {}).get("deep", "").lower() in ("1", "true", "yes")
+    logger.info(
+        "health.check",
+        extra={
+            "path": path,
+            "method": event.get("requestContext", {}).get("http", {}).get("method", "GET"),
+            "deep": deep,
+        },
+    )
+
+    if path.endswith("/version"):
+        return _json(200, {"version": __version__})
+    if not deep:
+        return _json(200, {"status": "ok", "version": __version__})
+
+    checks = check_dependencies()
+    down = sorted(name for name, result in checks.items() if result["status"] != "ok")
+    if down:
+        logger.warning("health.dependencies_down", extra={"dependencies": down, "checks": checks})
+    return _json(
+        503 if down else 200,
+        {"status": "degraded" if down else "ok", "version": __version__, "checks": checks},
+    )
@@ -1,19 +1,69 @@
 import json
+import logging
+import math
 import os
-from typing import Tuple
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
 import boto3
 
-from utils.logger import get_logger
-from utils.twilio_client import build_client
+from utils import auth, idempotency, lanes, schema, sqs_batch, templates
+from utils.auth import from_env as authenticator_from_env
+from utils.concurrency import bounded_map, resolve_max_workers
+from utils.logger import flush_logs, get_logger
+from utils.metrics import UNIT_COUNT, flush_metrics, get_metrics
+from utils.phone import MOBILE
+from utils.rate_limit import from_env as rate_limiter_from_env
+from utils.scheduler import from_env as scheduler_from_env
+from utils.twilio_client import TwilioClientProvider
 
 logger = get_logger("ingest")
 
+# EMF metrics, flushed once per invocation (POWERTOOLS_METRICS_NAMESPACE)
+metrics = get_metrics("ingest")
+
 # Reuse AWS clients across invocations
 sqs = boto3.client("sqs")
 
-# Build Twilio client once per container
-twilio_client, twilio_conf = build_client()
+# Bearer-token check on POST /sms; the accepted tokens come from the Twilio
+# secret and are cached like the Twilio client
+authenticator = authenticator_from_env()
+
+# Twilio client is only needed for INSTANT_SEND_MODE=inline, so it is built
+# lazily on first use instead of on every cold start
+twilio = TwilioClientProvider()
+
+# Same Twilio throughput limits as the Worker (only used in inline mode)
+limiter = rate_limiter_from_env()
+
+# Sends further out than SQS's 15-minute DelaySeconds go to the schedule
+# index (None without SCHEDULE_TABLE)
+scheduler = scheduler_from_env()
+
+SQS_BATCH_LIMIT = sqs_batch.SQS_BATCH_LIMIT
+SQS_MAX_DELAY_SECONDS = sqs_batch.SQS_MAX_DELAY_SECONDS
+
+# Batch mode limits and retry policy for partially failed SendMessageBatch calls
+MAX_BATCH_EVENTS = 500
+ENQUEUE_MAX_ATTEMPTS = 3
+ENQUEUE_RETRY_BASE_SECONDS = 0.05
+
+# How the instant "in transit" SMS requested via send_in_transit_now is sent:
+#   queue  → enqueued with DelaySeconds=0 and sent by the Worker (default)
+#   inline → sent synchronously from this function (legacy behaviour)
+INSTANT_SEND_MODES = ("queue", "inline")
+IN_TRANSIT_EVENT = schema.IN_TRANSIT_EVENT
+
+
+def _instant_send_mode() -> str:
+    mode = os.getenv("INSTANT_SEND_MODE", "queue").lower()
+    if mode not in INSTANT_SEND_MODES:
+        logger.warning(
+            "ingest.invalid_instant_send_mode",
+            extra={"value": mode, "default": "queue"},
+        )
+        return "queue"
+    return mode
 
 
 def _load_env() -> Tuple[str, int, str]:
@@ -21,9 +71,10 @@ def _load_env() -> Tuple[str, int, str]:
     Load required environment variables for the ingest function.
 
     APPROVED_QUEUE_URL: SQS queue URL for approved events
-    APPROVED_DELAY_SECONDS: Delay (in seconds) before Worker processes message
-    IDEMPOTENCY_TABLE: DynamoDB table name (reserved for future use here;
-                       actively used by the Worker microservice)
+    APPROVED_DELAY_SECONDS: Delay (in seconds) before Worker processes message;
+                            over 900 needs the scheduler (SCHEDULE_TABLE)
+    IDEMPOTENCY_TABLE: DynamoDB table name (pre-checked here to acknowledge
+                       client retries; claimed by the Worker around sends)
 
     Raises RuntimeError with a clear message if something is missing/invalid.
     """
@@ -54,10 +105,18 @@ def _load_env() -> Tuple[str, int, str]:
         logger.error(msg)
         raise RuntimeError(msg)
 
+    if approved_delay_seconds > SQS_MAX_DELAY_SECONDS and scheduler is None:
+        msg = (
+            f"APPROVED_DELAY_SECONDS={approved_delay_seconds} exceeds the SQS "
+            f"maximum of {SQS_MAX_DELAY_SECONDS}s and SCHEDULE_TABLE is not set."
+        )
+        logger.error(msg)
+        raise RuntimeError(msg)
+
     return approved_queue_url, approved_delay_seconds, idempotency_table
 
 
-def _parse_body(event: dict) -> dict:
+def _parse_body(event: dict) -> Any:
     """
     Extract and parse the JSON body from the Lambda event.
 
@@ -66,34 +125,330 @@ def _parse_body(event: dict) -> dict:
     """
     body = event.get("body")
 
-    # If there's an explicit body string, parse that.
-    if isinstance(body, str):
-        raw_body = body
-    # If body is already a dict (local testing), just use it.
-    elif isinstance(body, dict):
+    # If body is already a dict/list (local testing), just use it.
+    if isinstance(body, (dict, list)):
         return body
-    else:
-        # Fallback: treat the whole event as the payload for local tests
-        raw_body = json.dumps(event)
+    # Without a body string, the event itself is the payload (local tests)
+    if not isinstance(body, str):
+        return event
 
     try:
-        return json.loads(raw_body)
+        return schema.loads(body)
     except json.JSONDecodeError:
         logger.warning(
             "ingest.invalid_json",
-            extra={"body_preview": str(raw_body)[:200]},
+            extra={"body_preview": body[:200]},
         )
         raise
 
 
+def _send_at_error(event: schema.SmsEvent, now: float) -> Optional[str]:
+    """
+    Return an error code if the event's send time can't be honoured.
+    """
+    send_at = event.send_at
+    if send_at is None or send_at - now <= SQS_MAX_DELAY_SECONDS:
+        return None
+    if scheduler is None:
+        return "scheduling_unavailable"
+    if send_at - now > scheduler.max_delay_seconds:
+        return "invalid_send_at"
+    return None
+
+
+def _entry(msg: schema.WorkerMessage, send_at: float, now: float, approved_queue_url: str) -> dict:
+    """
+    One entry for `msg`, routed to its lane's queue. `due_at_ms` lets the
+    Worker measure how late past its send time the message was picked up.
+    "QueueUrl" (and, beyond the SQS delay cap, "SendAt") are ours, not
+    SendMessageBatch fields; _by_queue() strips the former.
+    """
+    msg.due_at_ms = int(send_at * 1000)
+    entry = {
+        "MessageBody": msg.encode(),
+        "QueueUrl": lanes.queue_url_for(lanes.lane_for(msg.event), approved_queue_url),
+    }
+    if send_at - now > SQS_MAX_DELAY_SECONDS:
+        entry.update({"SendAt": send_at, "ScheduleId": msg.event_id})
+    else:
+        entry["DelaySeconds"] = max(0, math.ceil(send_at - now))
+    return entry
+
+
+def _by_queue(entries: List[dict]) -> Dict[str, List[dict]]:
+    """
+    Group entries by target queue, without their "QueueUrl" key.
+    """
+    groups: Dict[str, List[dict]] = {}
+    for entry in entries:
+        entry = dict(entry)
+        groups.setdefault(entry.pop("QueueUrl"), []).append(entry)
+    return groups
+
+
+def _delay_for(event_type: Optional[str], approved_delay_seconds: int) -> int:
+    # Instant for advance_in_transit, delayed for everything else
+    return 0 if event_type == IN_TRANSIT_EVENT else approved_delay_seconds
+
+
+def _in_transit_message(event: schema.SmsEvent) -> schema.WorkerMessage:
+    """
+    Build the Worker message for the instant "in transit" SMS requested
+    with send_in_transit_now. It gets its own event_id so it is tracked
+    separately from the event it accompanies.
+    """
+    msg = event.worker_message()
+    msg.event = IN_TRANSIT_EVENT
+    if msg.event_id:
+        msg.event_id = f"{msg.event_id}:{IN_TRANSIT_EVENT}"
+    return msg
+
+
+def _queue_entries(
+    event: schema.SmsEvent,
+    approved_delay_seconds: int,
+    send_in_transit: bool,
+    now: float,
+    approved_queue_url: str,
+) -> List[dict]:
+    """
+    Build the SQS entries (without Ids) to enqueue for one validated event:
+    the event itself plus, when requested, an instant in-transit SMS. Each
+    goes to the queue of its event type's lane (see utils.lanes).
+
+    The event goes out at its `send_at` when it has one, else after the
+    default delay for its type. Entries further out than SQS allows carry
+    "SendAt" (and no DelaySeconds) and are handed to the scheduler instead.
+    """
+    send_at = event.send_at
+    if send_at is None:
+        send_at = now + _delay_for(event.event, approved_delay_seconds)
+
+    entries = [_entry(event.worker_message(), send_at, now, approved_queue_url)]
+    # An in-transit event is already sent instantly; don't send it twice.
+    if send_in_transit and event.event != IN_TRANSIT_EVENT:
+        entries.insert(0, _entry(_in_transit_message(event), now, now, approved_queue_url))
+    return entries
+
+
+def _batch_events(payload: Any) -> Optional[list]:
+    """
+    Return the list of events if the request is a batch, otherwise None.
+
+    A batch is either a bare JSON array or an object with an "events" array.
+    """
+    if isinstance(payload, list):
+        return payload
+    if isinstance(payload, dict) and isinstance(payload.get("events"), list):
+        return payload["events"]
+    return None
+
+
+def _send_message_batch(queue_url: str, entries: List[dict]) -> Dict[str, dict]:
+    """
+    Enqueue up to SQS_BATCH_LIMIT entries with SendMessageBatch, retrying
+    transient failures up to ENQUEUE_MAX_ATTEMPTS.
+
+    Returns a mapping of entry Id -> outcome dict.
+    """
+    return sqs_batch.send_message_batch(
+        sqs,
+        queue_url,
+        entries,
+        max_attempts=ENQUEUE_MAX_ATTEMPTS,
+        retry_base_seconds=ENQUEUE_RETRY_BASE_SECONDS,
+        metrics=metrics,
+    )
+
+
+def _schedule(entry: dict) -> dict:
+    """
+    Store an entry carrying "SendAt" in the schedule index, to be enqueued
+    to its lane's queue when due. Returns an outcome dict like
+    _send_message_batch's.
+    """
+    try:
+        scheduler.schedule(
+            entry["MessageBody"],
+            entry["SendAt"],
+            schedule_id=entry.get("ScheduleId"),
+            queue_url=entry["QueueUrl"],
+        )
+    except Exception as e:
+        logger.error(
+            "ingest.schedule_error",
+            extra={"error": str(e), "schedule_id": entry.get("ScheduleId")},
+        )
+        return {"status": "failed", "error": "schedule_failure"}
+    return {"status": "scheduled", "send_at": int(entry["SendAt"])}
+
+
+def _flag_line_type(evt: schema.SmsEvent) -> None:
+    """
+    Numbers the offline line-type table knows as something other than
+    mobile (e.g. VoIP) are still sent, but counted and logged.
+    """
+    if evt.line_type and evt.line_type != MOBILE:
+        metrics.count("PhoneFlagged", dimensions={"LineType": evt.line_type})
+        logger.info("ingest.phone_flagged", extra={"event_id": evt.event_id, "line_type": evt.line_type})
+
+
+def _handle_batch(events: list, approved_queue_url: str, approved_delay_seconds: int) -> dict:
+    """
+    Validate every event in a batch and enqueue the valid ones in chunks of
+    SQS_BATCH_LIMIT. Returns an HTTP response with a per-item status.
+
+    Batch mode only enqueues; it never sends SMS inline. Events with
+    send_in_transit_now get an extra DelaySeconds=0 entry, and an item is
+    only reported as queued once all of its entries are. Events whose
+    send_at is beyond SQS's delay cap are reported as scheduled.
+    """
+    if not events:
+        return {
+            "statusCode": 400,
+            "body": json.dumps({"error": "empty_batch"}),
+        }
+
+    if len(events) > MAX_BATCH_EVENTS:
+        return {
+            "statusCode": 413,
+            "body": json.dumps({"error": "batch_too_large", "max_events": MAX_BATCH_EVENTS}),
+        }
+
+    results: List[dict] = []
+    entries: List[dict] = []
+    scheduled: List[dict] = []
+    now = time.time()
+
+    # One BatchGetItem for the whole request: events whose SMS already went
+    # out (client retries) are acknowledged without being enqueued again.
+    completed = idempotency.completed_ids(
+        item["event_id"] for item in events if isinstance(item, dict) and item.get("event_id")
+    )
+
+    for index, item in enumerate(events):
+        event_id = item.get("event_id") if isinstance(item, dict) else None
+        result = {"index": index, "event_id": event_id}
+        results.append(result)
+
+        try:
+            evt = schema.parse_event(item)
+        except schema.InvalidMessage as e:
+            result.update({"status": "rejected", "error": e.error})
+            if e.error == schema.ERROR_MISSING_FIELDS:
+                result["missing"] = e.fields
+            elif e.error != schema.ERROR_INVALID_SEND_AT:
+                result["fields"] = e.fields
+            continue
+
+        send_at_error = _send_at_error(evt, now)
+        if send_at_error:
+            result.update({"status": "rejected", "error": send_at_error})
+            continue
+
+        if event_id in completed:
+            result["status"] = "duplicate"
+            continue
+        _flag_line_type(evt)
+
+        item_entries = _queue_entries(evt, approved_delay_seconds, evt.send_in_transit_now, now, approved_queue_url)
+        for n, entry in enumerate(item_entries):
+            entry["Id"] = f"{index}-{n}"
+            (scheduled if "SendAt" in entry else entries).append(entry)
+
+    # Chunks never mix lanes: each SendMessageBatch targets one queue
+    chunks = [
+        (queue_url, chunk)
+        for queue_url, group in _by_queue(entries).items()
+        for chunk in sqs_batch.chunks(group, SQS_BATCH_LIMIT)
+    ]
+    max_workers = resolve_max_workers("INGEST_ENQUEUE_CONCURRENCY", default=4)
+    all_outcomes = bounded_map(lambda job: _send_message_batch(*job), chunks, max_workers)
+    if scheduled:
+        all_outcomes.append(
+            dict(zip([entry["Id"] for entry in scheduled], bounded_map(_schedule, scheduled, max_workers)))
+        )
+    for outcomes in all_outcomes:
+        for entry_id, outcome in outcomes.items():
+            result = results[int(entry_id.split("-", 1)[0])]
+            # Keep the first failure for items that produced several entries
+            if result.get("status") != "failed":
+                result.update(outcome)
+
+    counts = {"queued": 0, "scheduled": 0, "duplicate": 0, "rejected": 0, "failed": 0}
+    for result in results:
+        counts[result["status"]] += 1
+
+    metrics.observe("BatchSize", len(events), unit=UNIT_COUNT)
+    for outcome, n in counts.items():
+        if n:
+            metrics.count("Events", n, dimensions={"Outcome": outcome})
+
+    logger.info(
+        "ingest.batch_enqueued",
+        extra={"queue_url": approved_queue_url, "events": len(events), "chunks": len(chunks), **counts},
+    )
+
+    return {
+        "statusCode": 202 if counts["queued"] + counts["scheduled"] + counts["duplicate"] == len(events) else 207,
+        "body": json.dumps({**counts, "results": results}),
+    }
+
+
+@flush_logs
+@flush_metrics(metrics)
 def lambda_handler(event, context):
+    with metrics.timer("RequestLatency"):
+        response = _handle_request(event, context)
+    metrics.count("Requests", dimensions={"StatusCode": str(response["statusCode"])})
+    return response
+
+
+def _authenticate(event) -> Optional[dict]:
+    """
+    Return the rejection response for an unauthenticated request, or None.
+
+    Runs before the body is parsed or anything is logged, so a rejected
+    request costs one hash (or nothing, for a throttled client).
+    """
+    client = event.get("requestContext", {}).get("http", {}).get("sourceIp") or "unknown"
+    try:
+        outcome = authenticator.authenticate(event.get("headers"), client)
+    except Exception as e:
+        logger.error("ingest.auth_error", extra={"error": str(e)})
+        return {
+            "statusCode": 503,
+            "body": json.dumps({"error": "auth_unavailable"}),
+        }
+    if outcome == auth.AUTHENTICATED:
+        return None
+
+    metrics.count("AuthRejected", dimensions={"Reason": outcome})
+    if outcome == auth.THROTTLED:
+        return {
+            "statusCode": 429,
+            "headers": {"Retry-After": str(int(authenticator.tracker.window_seconds))},
+            "body": json.dumps({"error": "too_many_failed_attempts"}),
+        }
+    return {
+        "statusCode": 401,
+        "headers": {"WWW-Authenticate": "Bearer"},
+        "body": json.dumps({"error": "unauthorized"}),
+    }
+
+
+def _handle_request(event, context):
+    rejected = _authenticate(event)
+    if rejected is not None:
+        return rejected
+
     logger.info(
         "ingest.lambda_start",
-        extra={
-            "request_id": getattr(context, "aws_request_id", None),
-            "event_preview": str(event)[:500],
-        },
+        extra={"request_id": getattr(context, "aws_request_id", None)},
     )
+    # Full request dumps are expensive; only build them when DEBUG is on
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("ingest.event", extra={"event_preview": str(event)[:500]})
 
     # 1) Load environment configuration lazily
     try:
@@ -126,61 +481,92 @@ def lambda_handler(event, context):
             "body": json.dumps({"error": "invalid_json"}),
         }
 
+    # 2b) Batch mode: an array of events, enqueued with SendMessageBatch
+    events = _batch_events(payload)
+    if events is not None:
+        try:
+            return _handle_batch(events, approved_queue_url, approved_delay_seconds)
+        except Exception as e:
+            logger.error(
+                "ingest.queue_error",
+                extra={"error": str(e), "queue_url": approved_queue_url},
+            )
+            return {
+                "statusCode": 500,
+                "body": json.dumps({"error": "queue_failure"}),
+            }
+
     # --- Start Main Logic ---
     # This try block wraps all business logic
     try:
-        logger.info("ingest.payload_received", extra={"payload": payload})
-
-        # 3) Extract required fields
-        evt = payload.get("event")
-        event_id = payload.get("event_id")
-        user = payload.get("user") or {}
-        phone = user.get("phone")
-        amount = payload.get("amount")
-        send_in_transit_now = bool(payload.get("send_in_transit_now"))
+        logger.debug("ingest.payload_received", extra={"payload": payload})
 
-        if not phone or amount is None:
+        # 3) Validate against the message contract
+        try:
+            event_in = schema.parse_event(payload)
+        except schema.InvalidMessage as e:
             logger.warning(
-                "ingest.missing_fields",
+                "ingest.invalid_event",
                 extra={
-                    "event": evt,
-                    "event_id": event_id,
-                    "phone_present": bool(phone),
-                    "amount_present": amount is not None,
+                    "event": payload.get("event") if isinstance(payload, dict) else None,
+                    "event_id": e.event_id,
+                    "error": e.error,
+                    "fields": e.fields,
                 },
             )
+            body = {"error": e.error}
+            if e.error not in (schema.ERROR_MISSING_FIELDS, schema.ERROR_INVALID_SEND_AT):
+                body["fields"] = e.fields
             return {
                 "statusCode": 400,
-                "body": json.dumps({"error": "missing_required_fields"}),
+                "body": json.dumps(body),
+            }
+        evt = event_in.event
+        event_id = event_in.event_id
+        phone = event_in.phone
+        amount = event_in.amount
+        send_in_transit_now = event_in.send_in_transit_now
+        _flag_line_type(event_in)
+
+        now = time.time()
+        send_at_error = _send_at_error(event_in, now)
+        if send_at_error:
+            logger.warning(
+                "ingest.invalid_send_at",
+                extra={"event_id": event_id, "send_at": payload.get("send_at"), "error": send_at_error},
+            )
+            return {
+                "statusCode": 400,
+                "body": json.dumps({"error": send_at_error}),
             }
 
-        # 4) Optional: send instant “in transit” SMS via Twilio
-        if send_in_transit_now:
-            try:
-                amount_float = float(amount)
-            except (TypeError, ValueError):
-                amount_float = None
-
-            if amount_float is not None:
-                body_text = (
-                    f"🎉 Your ${amount_float:.2f} advance is on its way! "
-                    "We’ve sent it to your bank. – PaySlice"
-                )
-            else:
-                body_text = (
-                    "🎉 Your advance is on its way! "
-                    "We’ve sent it to your bank. – PaySlice"
-                )
+        # 3b) Client retries of an event that was already sent are acknowledged
+        #     without enqueueing (the Worker would drop them anyway)
+        if event_id and idempotency.completed_ids([event_id]):
+            logger.info("ingest.duplicate", extra={"event_id": event_id, "event": evt})
+            return {
+                "statusCode": 200,
+                "body": json.dumps({"queued": False, "duplicate": True}),
+            }
 
+        # 4) Optional: send instant “in transit” SMS via Twilio (legacy inline mode)
+        instant_mode = _instant_send_mode()
+        if send_in_transit_now and instant_mode == "inline":
             try:
-                resp = twilio_client.messages.create(
-                    msid=twilio_conf["msid"],
-                    to=phone,
-                    body=body_text,
-                )
+                # Same copy (and segment accounting) as the Worker's in-transit SMS
+                rendered = templates.render({"event": IN_TRANSIT_EVENT, "amount": amount})
+                limiter.acquire(phone)
+                with metrics.timer("TwilioSendLatency"):
+                    resp = twilio.call(
+                        lambda client, conf: client.messages.create(
+                            messaging_service_sid=conf["messaging_service_sid"],
+                            to=phone,
+                            body=rendered.body,
+                        )
+                    )
                 logger.info(
                     "ingest.twilio_in_transit_sent",
-                    extra={"sid": resp.sid, "to": phone, "amount": amount},
+                    extra={"sid": resp.sid, "to": phone, "amount": amount, **rendered.as_fields()},
                 )
             except Exception as e:
                 logger.error(
@@ -189,39 +575,61 @@ def lambda_handler(event, context):
                 )
                 # We still continue to enqueue the delayed event.
 
-        # 5) Always enqueue approved event for Worker (delayed SMS)
-        msg_for_worker = {
-            "event_id": payload.get("event_id"),
-            "event": payload.get("event"),
-            "user": {"phone": payload["user"]["phone"]},
-            "amount": payload["amount"],
-        }
-
-        event_type = msg_for_worker.get("event")
-
-        # Instant for advance_in_transit, delayed for everything else
-        delay_seconds = 0 if event_type == "advance_in_transit" else approved_delay_seconds
-
-        resp = sqs.send_message(
-            QueueUrl=approved_queue_url,
-            MessageBody=json.dumps(msg_for_worker),
-            DelaySeconds=delay_seconds,
+        # 5) Enqueue for Worker. In queue mode the instant SMS rides along
+        #    with DelaySeconds=0, so this request never waits on Twilio.
+        #    Sends beyond the SQS delay cap go to the schedule index.
+        entries = _queue_entries(
+            event_in,
+            approved_delay_seconds,
+            send_in_transit=send_in_transit_now and instant_mode == "queue",
+            now=now,
+            approved_queue_url=approved_queue_url,
         )
+        scheduled = [entry for entry in entries if "SendAt" in entry]
+        entries = [entry for entry in entries if "SendAt" not in entry]
+
+        for entry in scheduled:
+            outcome = _schedule(entry)
+            if outcome["status"] != "scheduled":
+                raise RuntimeError(f"Scheduling failed: {outcome['error']}")
+
+        queue_urls = [entry["QueueUrl"] for entry in entries]
+        if not entries:
+            message_ids = []
+        elif len(entries) == 1:
+            (queue_url, (entry,)), = _by_queue(entries).items()
+            with metrics.timer("SqsEnqueueLatency"):
+                resp = sqs.send_message(QueueUrl=queue_url, **entry)
+            message_ids = [resp["MessageId"]]
+        else:
+            for n, entry in enumerate(entries):
+                entry["Id"] = str(n)
+            outcomes: Dict[str, dict] = {}
+            for queue_url, group in _by_queue(entries).items():
+                outcomes.update(_send_message_batch(queue_url, group))
+            failed = [o for o in outcomes.values() if o["status"] != "queued"]
+            if failed:
+                raise RuntimeError(f"SendMessageBatch failed: {failed[0].get('error')}")
+            message_ids = [outcomes[entry["Id"]]["message_id"] for entry in entries]
 
         logger.info(
             "ingest.enqueued",
             extra={
-                "queue_url": approved_queue_url,
-                "message_id": resp["MessageId"],
-                "event": event_type,
-                "delay_seconds": delay_seconds,
+                "queue_url": queue_urls,
+                "message_ids": message_ids,
+                "event": evt,
+                "delay_seconds": [entry["DelaySeconds"] for entry in entries],
+                "scheduled_at": [int(entry["SendAt"]) for entry in scheduled],
             },
         )
 
         # 6) Happy path
+        body = {"queued": True}
+        if scheduled:
+            body.update({"scheduled": True, "send_at": int(scheduled[-1]["SendAt"])})
         return {
             "statusCode": 202,
-            "body": json.dumps({"queued": True}),
+            "body": json.dumps(body),
         }
 
     # This 'except' block now correctly catches errors from the 'try' block above
@@ -0,0 +1,431 @@
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+import boto3
+from botocore.exceptions import BotoCoreError, ClientError
+
+from utils import idempotency, lanes, schema, sqs_batch
+from utils.concurrency import bounded_map, resolve_max_workers
+from utils.logger import flush_logs, get_logger
+from utils.metrics import flush_metrics, get_metrics
+from utils.rate_limit import InMemoryTokenBucketStore, RateLimitExceeded, RateLimiter
+
+logger = get_logger("replay")
+
+# EMF metrics, flushed once per invocation (POWERTOOLS_METRICS_NAMESPACE)
+metrics = get_metrics("replay")
+
+# Reuse AWS clients across invocations
+sqs = boto3.client("sqs")
+
+# DLQ redrive: stream messages off the DLQ, keep the ones that match the
+# filters, skip event_ids that were sent after all, re-enqueue the rest to
+# their lane queue at a fixed rate, and delete them from the DLQ only once
+# SQS accepted the copy.
+#
+# Every receive hides its messages until the run's deadline, so messages that
+# are skipped (filtered out, unparseable, failed to enqueue) are not seen twice
+# in one run and nothing has to be remembered per message. They become
+# visible again afterwards, for the next run.
+DEFAULT_RATE_PER_SECOND = 25
+DEFAULT_POLLERS = 4
+DEFAULT_MAX_SECONDS = 900
+
+RECEIVE_WAIT_SECONDS = 2
+# A poller stops after this many empty receives in a row
+EMPTY_RECEIVES_TO_STOP = 2
+# Failed receives (throttling, connection resets) are retried with jittered
+# exponential backoff; a poller gives up after this many in a row
+RECEIVE_ERRORS_TO_STOP = 5
+RECEIVE_RETRY_BASE_SECONDS = 0.5
+RECEIVE_RETRY_MAX_SECONDS = 8
+# SQS caps VisibilityTimeout at 12 hours
+MAX_VISIBILITY_TIMEOUT = 43200
+VISIBILITY_MARGIN_SECONDS = 60
+
+# Stop receiving this long before the function times out
+DEADLINE_MARGIN_SECONDS = 10
+
+# Error class of messages the worker recorded nothing for
+ERROR_UNKNOWN = "unknown"
+
+
+class ReplayFilter:
+    """
+    Which DLQ messages to replay. Empty criteria match everything; several
+    criteria must all match.
+    """
+
+    def __init__(
+        self,
+        events: Iterable[str] = (),
+        event_ids: Iterable[str] = (),
+        error_classes: Iterable[str] = (),
+    ):
+        self.events = frozenset(events)
+        self.event_ids = frozenset(event_ids)
+        self.error_classes = frozenset(error_classes)
+
+    @classmethod
+    def from_event(cls, event: Dict[str, Any]) -> "ReplayFilter":
+        return cls(event.get("events") or (), event.get("event_ids") or (), event.get("error_classes") or ())
+
+    @property
+    def needs_error_class(self) -> bool:
+        return bool(self.error_classes)
+
+    def matches(self, msg: schema.WorkerMessage, error_class: Optional[str] = None) -> bool:
+        if self.events and msg.event not in self.events:
+            return False
+        if self.event_ids and msg.event_id not in self.event_ids:
+            return False
+        if self.error_classes and (error_class or ERROR_UNKNOWN) not in self.error_classes:
+            return False
+        return True
+
+
+def _parse(message: Dict[str, Any]) -> Optional[schema.WorkerMessage]:
+    """
+    Decode a DLQ message as a worker message, or None if it is not a valid one.
+    """
+    try:
+        return schema.decode_worker_message(message.get("Body") or "")
+    except schema.InvalidMessage:
+        return None
+
+
+def _replay_body(msg: schema.WorkerMessage, now_ms: int) -> str:
+    # The replay is due now: keep the lane lateness metrics meaningful
+    if msg.due_at_ms is not None:
+        msg.due_at_ms = now_ms
+    return msg.encode()
+
+
+class Replayer:
+    """
+    One replay run over `dlq_url`, with `pollers` threads receiving and
+    redriving in parallel and a shared `rate_per_second` budget.
+    """
+
+    def __init__(
+        self,
+        client,
+        dlq_url: str,
+        filters: ReplayFilter,
+        deadline: float,
+        default_queue_url: Optional[str] = None,
+        rate_per_second: float = DEFAULT_RATE_PER_SECOND,
+        pollers: int = DEFAULT_POLLERS,
+        max_messages: Optional[int] = None,
+        dry_run: bool = False,
+        clock=time.time,
+        sleep=time.sleep,
+    ):
+        self.client = client
+        self.dlq_url = dlq_url
+        self.filters = filters
+        self.deadline = deadline
+        self.default_queue_url = default_queue_url
+        self.pollers = pollers
+        self.max_messages = max_messages
+        self.dry_run = dry_run
+        self._clock = clock
+        self._sleep = sleep
+        self.limiter = RateLimiter(
+            InMemoryTokenBucketStore(),
+            global_rate=rate_per_second,
+            global_burst=min(rate_per_second, sqs_batch.SQS_BATCH_LIMIT),
+            max_wait=math.inf,
+            sleep=sleep,
+        )
+        self.stats: Counter = Counter()
+        self._lock = threading.Lock()
+        self._received = 0
+        # Set once the rate budget can't be met before the deadline
+        self._out_of_time = threading.Event()
+
+    def _reserve(self) -> int:
+        # How many messages the next receive may take (max_messages overall)
+        with self._lock:
+            if self.max_messages is None:
+                return sqs_batch.SQS_BATCH_LIMIT
+            n = max(0, min(sqs_batch.SQS_BATCH_LIMIT, self.max_messages - self._received))
+            self._received += n
+            return n
+
+    def _settle(self, reserved: int, received: int) -> None:
+        # Give back the part of a reservation the receive didn't fill
+        if self.max_messages is not None and received < reserved:
+            with self._lock:
+                self._received -= reserved - received
+
+    def _count(self, **counts: int) -> None:
+        with self._lock:
+            self.stats.update(counts)
+
+    def run(self) -> Dict[str, Any]:
+        bounded_map(lambda _: self._poll(), range(self.pollers), self.pollers)
+        stats = {
+            key: self.stats.get(key, 0)
+            for key in ("received", "matched", "skipped", "unrecognized", "already_sent",
+                        "replayed", "enqueue_failed", "deleted", "delete_failed",
+                        "receive_failed", "pollers_failed", "process_failed")
+        }
+        stats["dry_run"] = self.dry_run
+        return stats
+
+    def _poll(self) -> None:
+        empty = 0
+        errors = 0
+        while empty < EMPTY_RECEIVES_TO_STOP and not self._out_of_time.is_set():
+            remaining = self.deadline - self._clock()
+            if remaining <= 0:
+                return
+            n = self._reserve()
+            if not n:
+                return
+            try:
+                resp = self.client.receive_message(
+                    QueueUrl=self.dlq_url,
+                    MaxNumberOfMessages=n,
+                    WaitTimeSeconds=RECEIVE_WAIT_SECONDS,
+                    VisibilityTimeout=min(MAX_VISIBILITY_TIMEOUT, int(remaining) + VISIBILITY_MARGIN_SECONDS),
+                    AttributeNames=["ApproximateReceiveCount"],
+                )
+            except (ClientError, BotoCoreError) as e:
+                self._settle(n, 0)
+                self._count(receive_failed=1)
+                errors += 1
+                backoff = min(RECEIVE_RETRY_MAX_SECONDS, RECEIVE_RETRY_BASE_SECONDS * (2 ** (errors - 1)))
+                backoff += random.uniform(0, backoff)
+                if errors >= RECEIVE_ERRORS_TO_STOP or self._clock() + backoff >= self.deadline:
+                    # Keep what the run has done so far; the rest of the DLQ
+                    # is left for the next run
+                    logger.error("replay.receive_error", extra={"error": str(e), "attempts": errors})
+                    self._count(pollers_failed=1)
+                    return
+                logger.warning("replay.receive_retry", extra={"error": str(e), "attempts": errors})
+                self._sleep(backoff)
+                continue
+            errors = 0
+            messages = resp.get("Messages") or []
+            self._settle(n, len(messages))
+            empty = 0 if messages else empty + 1
+            if not messages:
+                continue
+            try:
+                self._process(messages)
+            except Exception as e:
+                # Unhandled messages reappear after their visibility timeout
+                logger.error("replay.process_error", extra={"messages": len(messages), "error": str(e)})
+                self._count(process_failed=len(messages))
+
+    def _process(self, messages: List[Dict[str, Any]]) -> None:
+        candidates = []
+        for message in messages:
+            msg = _parse(message)
+            if msg is None:
+                self._count(unrecognized=1)
+            else:
+                candidates.append((message, msg))
+
+        event_ids = [msg.event_id for _, msg in candidates if msg.event_id]
+        errors = idempotency.failure_classes(event_ids) if self.filters.needs_error_class else {}
+        matched = [(m, msg) for m, msg in candidates if self.filters.matches(msg, errors.get(msg.event_id))]
+        self._count(received=len(messages), matched=len(matched), skipped=len(candidates) - len(matched))
+        if not matched or self.dry_run:
+            return
+
+        # Sent after all (e.g. by a redelivery that raced the DLQ move)
+        completed = idempotency.completed_ids(msg.event_id for _, msg in matched if msg.event_id)
+        done = [m for m, msg in matched if msg.event_id in completed]
+        todo = [(m, msg) for m, msg in matched if msg.event_id not in completed]
+        self._count(already_sent=len(done))
+
+        # Back to the lane queue each event is routed to today; the standard
+        # lane is always `default_queue_url`
+        by_queue: Dict[str, List[tuple]] = {}
+        for message, msg in todo:
+            lane = lanes.lane_for(msg.event)
+            queue_url = (
+                self.default_queue_url
+                if lane == lanes.LANE_STANDARD
+                else lanes.queue_url_for(lane, self.default_queue_url)
+            )
+            by_queue.setdefault(queue_url, []).append((message, msg))
+
+        for queue_url, group in by_queue.items():
+            if self._out_of_time.is_set():
+                break
+            group = group[: self._acquire(len(group))]
+            if not group:
+                break
+            now_ms = int(self._clock() * 1000)
+            outcomes = sqs_batch.send_message_batch(
+                self.client,
+                queue_url,
+                [{"Id": str(n), "MessageBody": _replay_body(msg, now_ms)} for n, (_, msg) in enumerate(group)],
+                metrics=metrics,
+            )
+            for n, (message, _) in enumerate(group):
+                outcome = outcomes[str(n)]
+                if outcome["status"] == "queued":
+                    done.append(message)
+                    self._count(replayed=1)
+                else:
+                    self._count(enqueue_failed=1)
+                    logger.warning(
+                        "replay.enqueue_failed",
+                        extra={"message_id": message.get("MessageId"), "error": outcome.get("error")},
+                    )
+
+        self._delete(done)
+
+    def _acquire(self, n: int) -> int:
+        """
+        Take up to `n` rate-limit tokens, waiting no later than the deadline.
+        Returns how many were granted; fewer than `n` stops the run.
+        """
+        for granted in range(n):
+            try:
+                self.limiter.acquire(max_wait=max(0.0, self.deadline - self._clock()))
+            except RateLimitExceeded:
+                # Whatever isn't sent stays in the DLQ for the next run
+                logger.warning("replay.deadline_reached", extra={"unsent": n - granted})
+                self._out_of_time.set()
+                return granted
+        return n
+
+    def _delete(self, messages: List[Dict[str, Any]]) -> None:
+        for chunk in sqs_batch.chunks(messages):
+            entries = [{"Id": str(n), "ReceiptHandle": m["ReceiptHandle"]} for n, m in enumerate(chunk)]
+            try:
+                resp = self.client.delete_message_batch(QueueUrl=self.dlq_url, Entries=entries)
+            except Exception as e:
+                # Already re-enqueued: the worker's idempotency claim stops
+                # the copy left in the DLQ from being sent twice
+                logger.warning("replay.delete_error", extra={"entries": len(entries), "error": str(e)})
+                self._count(delete_failed=len(entries))
+                continue
+            self._count(deleted=len(resp.get("Successful", [])), delete_failed=len(resp.get("Failed", [])))
+
+
+def replay(
+    filters: ReplayFilter,
+    deadline: float,
+    dlq_url: Optional[str] = None,
+    queue_url: Optional[str] = None,
+    rate_per_second: Optional[float] = None,
+    pollers: Optional[int] = None,
+    max_messages: Optional[int] = None,
+    dry_run: bool = False,
+    client=None,
+) -> Dict[str, Any]:
+    """
+    Run one replay, with unset settings taken from the environment
+    (DLQ_URL, APPROVED_QUEUE_URL, REPLAY_RATE_PER_SECOND, REPLAY_CONCURRENCY).
+    """
+    dlq_url = dlq_url or os.getenv("DLQ_URL")
+    queue_url = queue_url or os.getenv("APPROVED_QUEUE_URL")
+    if not dlq_url or not queue_url:
+        msg = "Replay needs DLQ_URL and APPROVED_QUEUE_URL"
+        logger.error("replay.env_error", extra={"error": msg})
+        raise RuntimeError(msg)
+
+    replayer = Replayer(
+        client or sqs,
+        dlq_url,
+        filters,
+        deadline,
+        default_queue_url=queue_url,
+        rate_per_second=rate_per_second or float(os.getenv("REPLAY_RATE_PER_SECOND") or DEFAULT_RATE_PER_SECOND),
+        pollers=pollers or resolve_max_workers("REPLAY_CONCURRENCY", default=DEFAULT_POLLERS),
+        max_messages=max_messages,
+        dry_run=dry_run,
+    )
+    stats = replayer.run()
+    logger.info(
+        "replay.run",
+        extra=dict(
+            stats,
+            events=sorted(filters.events),
+            event_ids=len(filters.event_ids),
+            error_classes=sorted(filters.error_classes),
+        ),
+    )
+    return stats
+
+
+@flush_logs
+@flush_metrics(metrics)
+def lambda_handler(event, context):
+    """
+    Invoke manually, e.g. with
+    {"events": ["advance_approved"], "error_classes": ["twilio_error"],
+     "rate_per_second": 50, "max_messages": 10000, "dry_run": true}
+    """
+    event = event or {}
+    deadline = time.time() + DEFAULT_MAX_SECONDS
+    if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+        deadline = time.time() + context.get_remaining_time_in_millis() / 1000 - DEADLINE_MARGIN_SECONDS
+
+    stats = replay(
+        ReplayFilter.from_event(event),
+        deadline,
+        rate_per_second=event.get("rate_per_second"),
+        max_messages=event.get("max_messages"),
+        dry_run=bool(event.get("dry_run")),
+    )
+    metrics.count("DlqReplayed", stats["replayed"])
+    metrics.count("DlqAlreadySent", stats["already_sent"])
+    metrics.count("DlqReplayEnqueueErrors", stats["enqueue_failed"])
+    metrics.count("DlqReplayReceiveErrors", stats["receive_failed"])
+    metrics.count("DlqReplayProcessErrors", stats["process_failed"])
+    return stats
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(
+        description="Replay messages from the SMS dead-letter queue (run from src/: python -m replay ...)",
+    )
+    p.add_argument("--dlq-url", help="dead-letter queue URL (default: $DLQ_URL)")
+    p.add_argument("--queue-url", help="standard-lane queue URL (default: $APPROVED_QUEUE_URL)")
+    p.add_argument("--event", action="append", default=[], help="only this event type (repeatable)")
+    p.add_argument("--event-id", action="append", default=[], help="only this event_id (repeatable)")
+    p.add_argument("--error-class", action="append", default=[],
+                   help=f"only this recorded error class, e.g. twilio_error or {ERROR_UNKNOWN} (repeatable)")
+    p.add_argument("--rate", type=float, help=f"messages re-enqueued per second (default {DEFAULT_RATE_PER_SECOND})")
+    p.add_argument("--pollers", type=int, help=f"parallel receive/redrive loops (default {DEFAULT_POLLERS})")
+    p.add_argument("--max-messages", type=int, help="stop after receiving this many messages")
+    p.add_argument("--max-seconds", type=float, default=DEFAULT_MAX_SECONDS,
+                   help="stop receiving after this long; skipped messages stay hidden until then")
+    p.add_argument("--dry-run", action="store_true", help="count matches without enqueueing or deleting")
+    return p.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    stats = replay(
+        ReplayFilter(args.event, args.event_id, args.error_class),
+        time.time() + args.max_seconds,
+        dlq_url=args.dlq_url,
+        queue_url=args.queue_url,
+        rate_per_second=args.rate,
+        pollers=args.pollers,
+        max_messages=args.max_messages,
+        dry_run=args.dry_run,
+    )
+    print(json.dumps(stats, indent=2))
+    return 1 if stats["enqueue_failed"] or stats["pollers_failed"] or stats["process_failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
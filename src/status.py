@@ -1,33 +1,245 @@
+import base64
 import json
-from urllib.parse import parse_qs
+import os
+import time
+from typing import Iterable, List, Optional, Tuple
+from urllib.parse import unquote_plus
 
-from utils.logger import get_logger
+from utils import auth, status_store
+from utils.auth import from_env as authenticator_from_env
+from utils.logger import flush_logs, get_logger
+from utils.metrics import flush_metrics, get_metrics
+from utils.twilio_signature import SignatureValidator
 
-log = get_logger("twilio-status")
+logger = get_logger("twilio-status")
 
+# EMF metrics, flushed once per invocation (POWERTOOLS_METRICS_NAMESPACE)
+metrics = get_metrics("status")
 
+# SQS client, created on first callback and reused across invocations.
+# boto3 is imported there too: it is most of this handler's cold start and
+# GET /status never needs SQS.
+sqs = None
+
+# Reject callbacks without a valid X-Twilio-Signature; "false" only for
+# local testing
+VALIDATE_SIGNATURES = os.getenv("TWILIO_VALIDATE_SIGNATURES", "true").lower() != "false"
+signatures = SignatureValidator()
+
+# GET /status/{event_id} takes the same bearer tokens as POST /sms
+# (INGEST_AUTH_*): its answer includes the message SID and error code
+authenticator = authenticator_from_env()
+
+# Twilio status callbacks are well under 2 KB; anything much larger is shed
+# before it is decoded
+MAX_CALLBACK_BYTES = 16384
+
+# The only callback parameters we keep (everything is still needed for the
+# signature, so those are decoded only when validation is off)
+CALLBACK_FIELDS = frozenset({"MessageSid", "MessageStatus", "SmsStatus", "ErrorCode"})
+
+
+def _get_sqs():
+    global sqs
+    if sqs is None:
+        import boto3
+        from botocore.config import Config
+
+        # Short timeouts and one retry: Twilio waits on this call, and a
+        # slow enqueue should fail fast rather than hold the webhook open.
+        sqs = boto3.client(
+            "sqs",
+            config=Config(connect_timeout=1, read_timeout=2, retries={"mode": "standard", "max_attempts": 2}),
+        )
+    return sqs
+
+
+def _json(status_code: int, body: dict) -> dict:
+    return {
+        "statusCode": status_code,
+        "headers": {"Content-Type": "application/json"},
+        "body": json.dumps(body),
+    }
+
+
+def _raw_body(event: dict) -> str:
+    body = event.get("body") or ""
+    if event.get("isBase64Encoded"):
+        body = base64.b64decode(body).decode("utf-8", "replace")
+    return body
+
+
+def _form_params(body: str, keys: Optional[Iterable[str]] = None) -> List[Tuple[str, str]]:
+    """
+    Decode an application/x-www-form-urlencoded body into (name, value)
+    pairs in one pass. With `keys`, only those parameters are decoded.
+    """
+    params: List[Tuple[str, str]] = []
+    for pair in body.split("&"):
+        if not pair:
+            continue
+        key, _, value = pair.partition("=")
+        if keys is not None and key not in keys:
+            continue
+        params.append((unquote_plus(key), unquote_plus(value)))
+    return params
+
+
+def _callback_url(event: dict) -> str:
+    """
+    The URL Twilio requested, as it was signed.
+
+    STATUS_CALLBACK_URL (the base the Worker hands Twilio) wins, since API
+    Gateway may sit behind a custom domain; otherwise the URL is rebuilt from
+    the Host header and raw path. Either way the query string (?event_id=...)
+    comes from the request itself.
+    """
+    base = os.getenv("STATUS_CALLBACK_URL")
+    if base:
+        base = base.split("?", 1)[0]
+    else:
+        headers = event.get("headers") or {}
+        proto = headers.get("x-forwarded-proto", "https")
+        base = f"{proto}://{headers.get('host', '')}{event.get('rawPath', '')}"
+    query = event.get("rawQueryString")
+    return f"{base}?{query}" if query else base
+
+
+def _callback_update(data: dict, event: dict) -> dict:
+    """
+    Reduce a Twilio callback to the fields the status store keeps.
+
+    event_id is not part of Twilio's payload; the Worker appends it to the
+    StatusCallback URL, so it arrives as a query string parameter.
+    """
+    query = event.get("queryStringParameters") or {}
+    return {
+        "message_sid": data.get("MessageSid"),
+        "status": data.get("MessageStatus") or data.get("SmsStatus"),
+        "event_id": query.get("event_id"),
+        "error_code": data.get("ErrorCode"),
+        "received_at": int(time.time()),
+    }
+
+
+def _authenticate(event: dict) -> Optional[dict]:
+    """
+    Return the rejection response for an unauthenticated query, or None.
+    """
+    client = event.get("requestContext", {}).get("http", {}).get("sourceIp") or "unknown"
+    try:
+        outcome = authenticator.authenticate(event.get("headers"), client)
+    except Exception as e:
+        logger.error("twilio.status_auth_error", extra={"error": str(e)})
+        return _json(503, {"error": "auth_unavailable"})
+    if outcome == auth.AUTHENTICATED:
+        return None
+
+    metrics.count("AuthRejected", dimensions={"Reason": outcome})
+    if outcome == auth.THROTTLED:
+        resp = _json(429, {"error": "too_many_failed_attempts"})
+        resp["headers"]["Retry-After"] = str(int(authenticator.tracker.window_seconds))
+        return resp
+    resp = _json(401, {"error": "unauthorized"})
+    resp["headers"]["WWW-Authenticate"] = "Bearer"
+    return resp
+
+
+def _handle_query(event: dict) -> dict:
+    """
+    GET /status/{event_id} → latest delivery status for an event.
+    """
+    rejected = _authenticate(event)
+    if rejected is not None:
+        return rejected
+
+    event_id = (event.get("pathParameters") or {}).get("event_id")
+    if not event_id:
+        return _json(400, {"error": "missing_event_id"})
+
+    try:
+        with metrics.timer("StatusQueryLatency"):
+            item = status_store.latest_for_event(event_id)
+    except Exception as e:
+        logger.error("twilio.status_query_error", extra={"event_id": event_id, "error": str(e)})
+        return _json(500, {"error": "status_lookup_failed"})
+
+    if not item:
+        return _json(404, {"error": "not_found"})
+
+    return _json(
+        200,
+        {
+            "event_id": event_id,
+            "message_sid": item.get("message_sid"),
+            "status": item.get("status"),
+            "error_code": item.get("error_code"),
+            "updated_at": item.get("updated_at"),
+        },
+    )
+
+
+@flush_logs
+@flush_metrics(metrics)
 def lambda_handler(event, context):
-    # Body from API Gateway HTTP API (v2)
-    raw_body = event.get("body") or ""
-    parsed = parse_qs(raw_body)
+    method = event.get("requestContext", {}).get("http", {}).get("method", "POST")
+    if method == "GET":
+        return _handle_query(event)
+
+    # Shed what can't be a Twilio callback before any decoding or I/O
+    raw_body = _raw_body(event)
+    if len(raw_body) > MAX_CALLBACK_BYTES:
+        metrics.count("StatusRejected", dimensions={"Reason": "too_large"})
+        return _json(413, {"error": "payload_too_large"})
 
-    # Flatten: {'MessageSid': ['SM...']} → {'MessageSid': 'SM...'}
-    data = {k: v[0] for k, v in parsed.items() if v}
+    if VALIDATE_SIGNATURES:
+        signature = (event.get("headers") or {}).get("x-twilio-signature")
+        if not signature:
+            metrics.count("StatusRejected", dimensions={"Reason": "missing_signature"})
+            return _json(403, {"error": "invalid_signature"})
+        params = _form_params(raw_body)
+        try:
+            valid = signatures.validate(_callback_url(event), params, signature)
+        except Exception as e:
+            logger.error("twilio.signature_check_error", extra={"error": str(e)})
+            return _json(503, {"error": "signature_check_unavailable"})
+        if not valid:
+            metrics.count("StatusRejected", dimensions={"Reason": "invalid_signature"})
+            logger.warning("twilio.invalid_signature", extra={"path": event.get("rawPath")})
+            return _json(403, {"error": "invalid_signature"})
+        data = {key: value for key, value in params if key in CALLBACK_FIELDS}
+    else:
+        data = dict(_form_params(raw_body, CALLBACK_FIELDS))
 
-    # Optional: extract a few standard fields
-    message_sid = data.get("MessageSid")
-    message_status = data.get("MessageStatus") or data.get("SmsStatus")
+    update = _callback_update(data, event)
 
-    log(
+    logger.info(
         "twilio.status",
-        message_sid=message_sid,
-        message_status=message_status,
-        raw=data,
+        extra={
+            "message_sid": update["message_sid"],
+            "message_status": update["status"],
+            "event_id": update["event_id"],
+        },
     )
 
+    metrics.count("StatusCallbacks", dimensions={"MessageStatus": str(update["status"])})
+    if not update["message_sid"] or status_store.rank(update["status"]) is None:
+        # Nothing the consumer could store; acknowledge so Twilio moves on
+        return _json(200, {"ok": True})
+
+    # Hand the transition to the status consumer, which collapses and
+    # batch-writes callbacks; no DynamoDB write on the webhook path.
+    queue_url = os.getenv("STATUS_QUEUE_URL")
+    if queue_url:
+        try:
+            with metrics.timer("SqsEnqueueLatency"):
+                _get_sqs().send_message(QueueUrl=queue_url, MessageBody=json.dumps(update))
+        except Exception as e:
+            metrics.count("StatusEnqueueErrors")
+            logger.error(
+                "twilio.status_enqueue_error",
+                extra={"message_sid": update["message_sid"], "error": str(e)},
+            )
+
     # We don't block Twilio on internal errors; just acknowledge receipt.
-    return {
-        "statusCode": 200,
-        "headers": {"Content-Type": "application/json"},
-        "body": json.dumps({"ok": True}),
-    }
+    return _json(200, {"ok": True})
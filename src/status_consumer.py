@@ -0,0 +1,104 @@
+import json
+from typing import Any, Dict, List
+
+from utils import status_store
+from utils.concurrency import bounded_map, resolve_max_workers
+from utils.logger import flush_logs, get_logger
+from utils.metrics import flush_metrics, get_metrics
+
+logger = get_logger("status-consumer")
+
+# EMF metrics, flushed once per invocation (POWERTOOLS_METRICS_NAMESPACE)
+metrics = get_metrics("status_consumer")
+
+
+def _collapse(records: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Reduce a batch of callbacks to one update per MessageSid: the furthest
+    status along the lifecycle, remembering every SQS messageId that fed it.
+
+    A message typically reports queued → sent → delivered within seconds,
+    so this turns three conditional writes into one.
+    """
+    latest: Dict[str, Dict[str, Any]] = {}
+    for rec in records:
+        try:
+            update = json.loads(rec.get("body") or "")
+            sid = update["message_sid"]
+            status_rank = status_store.rank(update.get("status"))
+        except (json.JSONDecodeError, KeyError, TypeError):
+            logger.warning(
+                "status.invalid_update",
+                extra={"message_id": rec.get("messageId"), "preview": (rec.get("body") or "")[:200]},
+            )
+            continue
+        if status_rank is None:
+            logger.info("status.unknown_status", extra={"message_sid": sid, "status": update.get("status")})
+            continue
+
+        current = latest.get(sid)
+        if current is None:
+            latest[sid] = {"update": update, "rank": status_rank, "message_ids": [rec.get("messageId")]}
+            continue
+
+        current["message_ids"].append(rec.get("messageId"))
+        # Keep an event_id seen on any callback for this sid
+        event_id = update.get("event_id") or current["update"].get("event_id")
+        if status_rank > current["rank"]:
+            current["update"] = update
+            current["rank"] = status_rank
+        current["update"]["event_id"] = event_id
+
+    return latest
+
+
+def _write(entry: Dict[str, Any]) -> Dict[str, Any]:
+    update = entry["update"]
+    try:
+        applied = status_store.apply_transition(
+            update["message_sid"],
+            update["status"],
+            event_id=update.get("event_id"),
+            error_code=update.get("error_code"),
+            received_at=update.get("received_at"),
+        )
+        return {"ok": True, "applied": applied, "message_ids": entry["message_ids"]}
+    except Exception as e:
+        logger.error(
+            "status.write_error",
+            extra={"message_sid": update["message_sid"], "error": str(e)},
+        )
+        return {"ok": False, "message_ids": entry["message_ids"]}
+
+
+@flush_logs
+@flush_metrics(metrics)
+def lambda_handler(event, context):
+    records = event.get("Records", [])
+    latest = _collapse(records)
+
+    max_workers = resolve_max_workers("STATUS_WRITE_CONCURRENCY")
+    results = bounded_map(_write, list(latest.values()), max_workers)
+
+    failures = [
+        {"itemIdentifier": message_id}
+        for r in results
+        if not r["ok"]
+        for message_id in r["message_ids"]
+        if message_id
+    ]
+    applied = sum(1 for r in results if r.get("applied"))
+    logger.info(
+        "status.batch_written",
+        extra={
+            "records": len(records),
+            "messages": len(latest),
+            "applied": applied,
+            "failed": len(failures),
+        },
+    )
+    metrics.count("StatusUpdates", len(records))
+    metrics.count("StatusWrites", applied)
+    metrics.count("StatusStale", sum(1 for r in results if r["ok"] and not r["applied"]))
+    metrics.count("StatusWriteErrors", len(failures))
+    return {"batchItemFailures": failures}
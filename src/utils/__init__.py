@@ -7,8 +7,24 @@ transactional SMS microservice. It includes:
 
 - logger.py          → structured JSON logging
 - secrets.py         → AWS Secrets Manager integration
-- twilio_client.py   → authenticated Twilio client builder
+- twilio_client.py   → authenticated Twilio client builder + lazy TTL provider
+- auth.py            → /sms bearer tokens: cached multi-token key set, per-client rejection counts
+- twilio_signature.py → X-Twilio-Signature checks with a TTL-cached, rotation-aware auth token
+- http_transport.py  → pooled keep-alive HTTP transport for Twilio, with reuse stats
 - idempotency.py     → DynamoDB-based duplicate-event guard
+- concurrency.py     → bounded thread-pool dispatch helpers
+- rate_limit.py      → global / per-recipient token buckets for Twilio sends
+- lanes.py           → event type → priority lane / queue routing and lane SLOs
+- coalesce.py        → recipient-level merging of SMS about the same advance
+- dedup.py           → content-hash send dedup over a sliding window (LRU + conditional write)
+- circuit_breaker.py → sliding-window circuit breaker for the Twilio send path
+- phone.py           → E.164 normalization, LRU-cached validation, offline line-type table
+- schema.py          → message contract: compiled validators, __slots__ message objects
+- templates.py       → versioned SMS templates with GSM-7/UCS-2 segment accounting
+- status_store.py    → monotonic delivery-status records per MessageSid
+- scheduler.py       → time-bucketed index of future sends + due-bucket dispatch
+- sqs_batch.py       → SendMessageBatch with retry of transient per-entry failures
+- metrics.py         → CloudWatch EMF counters / latency distributions, flushed per invocation
 
 All functions in this package are stateless and thread-safe, suitable for
 AWS Lambda execution.
@@ -0,0 +1,243 @@
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+from utils import secrets
+from utils.logger import get_logger
+
+logger = get_logger("auth")
+
+# Bearer tokens accepted on POST /sms live in the Twilio secret:
+#
+#   "bearer":  "<token>"                  the current token
+#   "bearers": ["<token>", "<token>"]     optional extra active tokens
+#
+# During a rotation, add the new token to "bearers", move clients over, then
+# make it "bearer" and drop the old one. Every listed token is accepted.
+
+DEFAULT_TTL_SECONDS = 900
+# An unknown token triggers at most one key-set reload per this many
+# seconds, so bad tokens can't hammer Secrets Manager while a newly added
+# token still works within a minute
+DEFAULT_MIN_RELOAD_SECONDS = 60
+
+DEFAULT_MAX_REJECTIONS = 20
+DEFAULT_REJECTION_WINDOW_SECONDS = 60
+# Clients tracked per container; the least recently rejected are dropped
+DEFAULT_MAX_TRACKED_CLIENTS = 10000
+
+# authenticate() outcomes
+AUTHENTICATED = "authenticated"
+MISSING_TOKEN = "missing_token"
+INVALID_TOKEN = "invalid_token"
+THROTTLED = "throttled"
+
+
+def _digest(token: str) -> bytes:
+    # Fixed-length digests keep compare_digest's timing independent of the
+    # presented token's length
+    return hashlib.sha256(token.encode()).digest()
+
+
+def _load_tokens() -> List[str]:
+    # Looked up at call time so tests can swap get_twilio_secrets
+    data = secrets.get_twilio_secrets() or {}
+    tokens = [data.get("bearer")] + list(data.get("bearers") or [])
+    tokens = [t for t in tokens if isinstance(t, str) and t]
+    if not tokens:
+        raise RuntimeError("Missing Twilio secrets: bearer")
+    return tokens
+
+
+def bearer_token(headers: Optional[dict]) -> Optional[str]:
+    """
+    The token from an `Authorization: Bearer <token>` header (API Gateway
+    HTTP APIs lower-case header names), or None.
+    """
+    value = (headers or {}).get("authorization") or ""
+    scheme, _, token = value.partition(" ")
+    if scheme.lower() != "bearer":
+        return None
+    return token.strip() or None
+
+
+class BearerKeySet:
+    """
+    TTL-cached set of accepted bearer tokens, checked in constant time.
+
+    Tokens are read from Secrets Manager on first use and kept for
+    `ttl_seconds` (TWILIO_SECRET_TTL_SECONDS), so a warm container
+    authenticates a request with one SHA-256 and no I/O. An unknown token
+    reloads the set once (at most every `min_reload_seconds`) before it is
+    rejected, which is how a token added mid-TTL is picked up.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: Optional[float] = None,
+        min_reload_seconds: float = DEFAULT_MIN_RELOAD_SECONDS,
+        loader: Callable[[], List[str]] = _load_tokens,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if ttl_seconds is None:
+            ttl_seconds = float(os.getenv("TWILIO_SECRET_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+        self.ttl_seconds = ttl_seconds
+        self.min_reload_seconds = min_reload_seconds
+        self._loader = loader
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._digests: Optional[Tuple[bytes, ...]] = None
+        self._loaded_at = 0.0
+
+    def _load(self) -> Tuple[bytes, ...]:
+        with self._lock:
+            self._digests = tuple(_digest(t) for t in self._loader())
+            self._loaded_at = self._clock()
+            return self._digests
+
+    def _cached(self) -> Tuple[bytes, ...]:
+        if self._digests is not None and self._clock() - self._loaded_at < self.ttl_seconds:
+            return self._digests
+        return self._load()
+
+    @staticmethod
+    def _matches(presented: bytes, digests: Tuple[bytes, ...]) -> bool:
+        # Compare against every active token, without stopping at the first
+        # match, so timing doesn't reveal which one matched
+        matched = False
+        for digest in digests:
+            matched |= hmac.compare_digest(presented, digest)
+        return matched
+
+    def verify(self, token: str) -> bool:
+        """
+        True if `token` is one of the active tokens. Secrets Manager errors
+        propagate.
+        """
+        presented = _digest(token)
+        if self._matches(presented, self._cached()):
+            return True
+        if self._clock() - self._loaded_at < self.min_reload_seconds:
+            return False
+
+        logger.info("auth.key_set_reload")
+        return self._matches(presented, self._load())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._digests = None
+            self._loaded_at = 0.0
+
+
+class RejectionTracker:
+    """
+    Per-client count of rejected requests in a fixed window.
+
+    Once a client has `max_rejections` in the current window it is turned
+    away without checking its token at all, until the window rolls over.
+    Counts are per container, bounded to `max_clients` entries.
+    """
+
+    def __init__(
+        self,
+        max_rejections: int = DEFAULT_MAX_REJECTIONS,
+        window_seconds: float = DEFAULT_REJECTION_WINDOW_SECONDS,
+        max_clients: int = DEFAULT_MAX_TRACKED_CLIENTS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_rejections = max_rejections
+        self.window_seconds = window_seconds
+        self.max_clients = max_clients
+        self._clock = clock
+        self._lock = threading.Lock()
+        # client → (window start, rejections in the window)
+        self._counts: "OrderedDict[str, Tuple[float, int]]" = OrderedDict()
+
+    def _current(self, client: str, now: float) -> Tuple[float, int]:
+        entry = self._counts.get(client)
+        if entry is None or now - entry[0] >= self.window_seconds:
+            return now, 0
+        return entry
+
+    def blocked(self, client: str) -> bool:
+        if self.max_rejections <= 0:
+            return False
+        with self._lock:
+            return self._current(client, self._clock())[1] >= self.max_rejections
+
+    def record(self, client: str) -> int:
+        """
+        Count a rejection for `client`; returns its count in this window.
+        """
+        with self._lock:
+            started, count = self._current(client, self._clock())
+            self._counts[client] = (started, count + 1)
+            self._counts.move_to_end(client)
+            while len(self._counts) > self.max_clients:
+                self._counts.popitem(last=False)
+            return count + 1
+
+    def rejections(self, client: str) -> int:
+        with self._lock:
+            return self._current(client, self._clock())[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+
+class Authenticator:
+    """
+    Bearer-token check for an API route: throttled clients first, then the
+    token against `keys`, counting every rejection against the client.
+    """
+
+    def __init__(self, keys: BearerKeySet, tracker: RejectionTracker, required: bool = True):
+        self.keys = keys
+        self.tracker = tracker
+        self.required = required
+
+    def authenticate(self, headers: Optional[dict], client: str) -> str:
+        """
+        One of AUTHENTICATED, MISSING_TOKEN, INVALID_TOKEN or THROTTLED.
+        Secrets Manager errors propagate.
+        """
+        if not self.required:
+            return AUTHENTICATED
+        if self.tracker.blocked(client):
+            return THROTTLED
+
+        token = bearer_token(headers)
+        if token is None:
+            outcome = MISSING_TOKEN
+        elif self.keys.verify(token):
+            return AUTHENTICATED
+        else:
+            outcome = INVALID_TOKEN
+
+        if self.tracker.record(client) == self.tracker.max_rejections:
+            # Logged once per client and window, not per rejected request
+            logger.warning(
+                "auth.client_throttled",
+                extra={"client": client, "rejections": self.tracker.max_rejections},
+            )
+        return outcome
+
+
+def from_env() -> Authenticator:
+    """
+    Build an Authenticator from INGEST_AUTH_REQUIRED (default "true"),
+    INGEST_AUTH_MAX_REJECTIONS and INGEST_AUTH_REJECTION_WINDOW_SECONDS.
+    """
+    return Authenticator(
+        BearerKeySet(),
+        RejectionTracker(
+            max_rejections=int(os.getenv("INGEST_AUTH_MAX_REJECTIONS", DEFAULT_MAX_REJECTIONS)),
+            window_seconds=float(os.getenv("INGEST_AUTH_REJECTION_WINDOW_SECONDS", DEFAULT_REJECTION_WINDOW_SECONDS)),
+        ),
+        required=os.getenv("INGEST_AUTH_REQUIRED", "true").lower() != "false",
+    )
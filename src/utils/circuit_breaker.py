@@ -0,0 +1,279 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, TypeVar
+
+from utils.logger import get_logger
+
+logger = get_logger("circuit_breaker")
+
+T = TypeVar("T")
+
+STATE_CLOSED = "closed"
+STATE_HALF_OPEN = "half_open"
+STATE_OPEN = "open"
+
+# Numeric form for metrics (a single gauge that graphs well)
+STATE_CODES = {STATE_CLOSED: 0, STATE_HALF_OPEN: 1, STATE_OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling the protected dependency while the breaker is
+    open. Callers should treat it as transient (e.g. report the record back
+    to SQS) and not count it as a dependency failure.
+    """
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"circuit '{name}' is open, retry after {retry_after:.2f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Error-rate and latency circuit breaker over a sliding time window.
+
+      - closed: calls pass through. Outcomes are counted in one-second
+        buckets covering the last `window_seconds`. Once the window holds at
+        least `min_calls` calls and either the failure rate or the share of
+        calls slower than `slow_call_seconds` reaches its threshold, the
+        breaker opens.
+      - open: calls fail fast with CircuitOpenError for `open_seconds`.
+      - half_open: up to `half_open_probes` calls go through as probes. That
+        many successes close the breaker; any failure (or slow probe) opens
+        it again.
+
+    `is_failure(error)` decides which exceptions count against the
+    dependency; the others (e.g. a Twilio 400 for a bad number) are
+    recorded as successes. State is per container and thread-safe.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window_seconds: float = 30.0,
+        min_calls: int = 10,
+        failure_rate: float = 0.5,
+        slow_call_seconds: float = 2.0,
+        slow_call_rate: float = 0.5,
+        open_seconds: float = 15.0,
+        half_open_probes: int = 3,
+        is_failure: Callable[[Exception], bool] = lambda e: True,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = max(1, min_calls)
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = max(1, half_open_probes)
+        self.is_failure = is_failure
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        self._state = STATE_CLOSED
+        self._opened_at = 0.0
+        # [second, calls, failures, slow] per second with any traffic
+        self._buckets: Deque[List[int]] = deque()
+        self._probes_started = 0
+        self._probes_succeeded = 0
+
+        # Lifetime counters, for metrics
+        self.times_opened = 0
+        self.rejected = 0
+
+    # -- state ---------------------------------------------------------
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(self._clock())
+
+    def _current_state(self, now: float) -> str:
+        # Caller holds the lock. An open breaker whose timer ran out is
+        # half-open from that moment on.
+        if self._state == STATE_OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = STATE_HALF_OPEN
+            self._probes_started = 0
+            self._probes_succeeded = 0
+            logger.info("circuit_breaker.half_open", extra={"breaker": self.name})
+        return self._state
+
+    def _open(self, now: float, reason: str, stats: Optional[Dict[str, Any]] = None) -> None:
+        self._state = STATE_OPEN
+        self._opened_at = now
+        self._buckets.clear()
+        self.times_opened += 1
+        logger.warning(
+            "circuit_breaker.opened",
+            extra={"breaker": self.name, "reason": reason, "open_seconds": self.open_seconds, **(stats or {})},
+        )
+
+    def _close(self) -> None:
+        self._state = STATE_CLOSED
+        self._buckets.clear()
+        logger.info("circuit_breaker.closed", extra={"breaker": self.name})
+
+    def _window(self, now: float) -> Dict[str, Any]:
+        cutoff = int(now) - self.window_seconds
+        while self._buckets and self._buckets[0][0] <= cutoff:
+            self._buckets.popleft()
+        calls = sum(b[1] for b in self._buckets)
+        failures = sum(b[2] for b in self._buckets)
+        slow = sum(b[3] for b in self._buckets)
+        return {
+            "calls": calls,
+            "failure_rate": failures / calls if calls else 0.0,
+            "slow_call_rate": slow / calls if calls else 0.0,
+        }
+
+    def retry_after(self) -> float:
+        """
+        Seconds until an open breaker lets probes through (0 otherwise).
+        """
+        with self._lock:
+            if self._current_state(self._clock()) != STATE_OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self.open_seconds - self._clock())
+
+    # -- calls ---------------------------------------------------------
+
+    def allow(self) -> bool:
+        """
+        Cheap pre-check: False (counted as a rejection) while open. Does not
+        take a half-open probe slot, so callers can skip work for records
+        that would be shed.
+        """
+        with self._lock:
+            if self._current_state(self._clock()) == STATE_OPEN:
+                self.rejected += 1
+                return False
+            return True
+
+    def _before_call(self) -> bool:
+        """
+        Admit a call or raise CircuitOpenError. Returns True for a probe.
+        """
+        with self._lock:
+            now = self._clock()
+            state = self._current_state(now)
+            if state == STATE_CLOSED:
+                return False
+            if state == STATE_HALF_OPEN and self._probes_started < self.half_open_probes:
+                self._probes_started += 1
+                return True
+            self.rejected += 1
+            retry_after = max(0.0, self._opened_at + self.open_seconds - now) if state == STATE_OPEN else 0.0
+        raise CircuitOpenError(self.name, retry_after)
+
+    def _record(self, probe: bool, duration: float, failed: bool) -> None:
+        slow = duration >= self.slow_call_seconds
+        with self._lock:
+            now = self._clock()
+            state = self._current_state(now)
+
+            if state == STATE_HALF_OPEN:
+                if not probe:
+                    return
+                if failed or slow:
+                    self._open(now, "probe_failed" if failed else "probe_slow")
+                    return
+                self._probes_succeeded += 1
+                if self._probes_succeeded >= self.half_open_probes:
+                    self._close()
+                return
+
+            if state == STATE_OPEN:
+                # A call admitted before the breaker opened finished late
+                return
+
+            second = int(now)
+            if not self._buckets or self._buckets[-1][0] != second:
+                self._buckets.append([second, 0, 0, 0])
+            bucket = self._buckets[-1]
+            bucket[1] += 1
+            bucket[2] += int(failed)
+            bucket[3] += int(slow)
+
+            window = self._window(now)
+            if window["calls"] < self.min_calls:
+                return
+            if window["failure_rate"] >= self.failure_rate:
+                self._open(now, "failure_rate", window)
+            elif window["slow_call_rate"] >= self.slow_call_rate:
+                self._open(now, "slow_calls", window)
+
+    def call(self, fn: Callable[[], T]) -> T:
+        """
+        Run fn() through the breaker. Raises CircuitOpenError without calling
+        fn while open; otherwise fn's result or exception is passed through.
+        """
+        probe = self._before_call()
+        started = self._clock()
+        try:
+            result = fn()
+        except Exception as e:
+            self._record(probe, self._clock() - started, self.is_failure(e))
+            raise
+        self._record(probe, self._clock() - started, False)
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Current state and window statistics, for metrics and logs.
+        """
+        with self._lock:
+            now = self._clock()
+            state = self._current_state(now)
+            window = self._window(now)
+        return {
+            "breaker": self.name,
+            "state": state,
+            "state_code": STATE_CODES[state],
+            "window_calls": window["calls"],
+            "failure_rate": round(window["failure_rate"], 4),
+            "slow_call_rate": round(window["slow_call_rate"], 4),
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+
+def _env_number(name: str, default: float) -> float:
+    raw = os.getenv(name)
+    if not raw:
+        return default
+    try:
+        value = float(raw)
+    except ValueError:
+        logger.warning("circuit_breaker.invalid_setting", extra={"env_var": name, "value": raw})
+        return default
+    return value if value > 0 else default
+
+
+def from_env(name: str, is_failure: Callable[[Exception], bool] = lambda e: True) -> CircuitBreaker:
+    """
+    Build a CircuitBreaker from environment variables:
+
+    CIRCUIT_BREAKER_WINDOW_SECONDS:    sliding window length (default 30)
+    CIRCUIT_BREAKER_MIN_CALLS:         calls in the window before it can trip (default 10)
+    CIRCUIT_BREAKER_FAILURE_RATE:      failure share that opens it (default 0.5)
+    CIRCUIT_BREAKER_SLOW_CALL_SECONDS: a call at least this slow counts as slow (default 2)
+    CIRCUIT_BREAKER_SLOW_CALL_RATE:    slow-call share that opens it (default 0.5)
+    CIRCUIT_BREAKER_OPEN_SECONDS:      how long it stays open before probing (default 15)
+    CIRCUIT_BREAKER_HALF_OPEN_PROBES:  successful probes needed to close (default 3)
+    """
+    return CircuitBreaker(
+        name,
+        window_seconds=_env_number("CIRCUIT_BREAKER_WINDOW_SECONDS", 30),
+        min_calls=int(_env_number("CIRCUIT_BREAKER_MIN_CALLS", 10)),
+        failure_rate=_env_number("CIRCUIT_BREAKER_FAILURE_RATE", 0.5),
+        slow_call_seconds=_env_number("CIRCUIT_BREAKER_SLOW_CALL_SECONDS", 2),
+        slow_call_rate=_env_number("CIRCUIT_BREAKER_SLOW_CALL_RATE", 0.5),
+        open_seconds=_env_number("CIRCUIT_BREAKER_OPEN_SECONDS", 15),
+        half_open_probes=int(_env_number("CIRCUIT_BREAKER_HALF_OPEN_PROBES", 3)),
+        is_failure=is_failure,
+    )
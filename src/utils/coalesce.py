@@ -0,0 +1,331 @@
+import os
+import threading
+import time
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from utils.logger import get_logger
+
+logger = get_logger("coalesce")
+
+# Recipient-level coalescing: messages for the same phone and the same
+# advance are collapsed into one SMS.
+#
+# Rules (COALESCE_RULES, ";"-separated):
+#   a+b=c   a and b pending together are sent as one c message
+#   a>b     a already tells the recipient everything b would, so b is
+#           dropped when a is pending alongside it or was sent within
+#           COALESCE_WINDOW_SECONDS
+# A merged event c conveys everything its inputs do. Messages with
+# different amounts are never coalesced, so no information is lost.
+DEFAULT_RULES = (
+    "advance_approved+advance_in_transit=advance_approved_in_transit;"
+    "advance_in_transit>advance_approved"
+)
+
+# Recently-sent records share the idempotency table, under their own prefix
+KEY_PREFIX = "coalesce#"
+BATCH_GET_LIMIT = 100
+BATCH_GET_MAX_ATTEMPTS = 3
+
+
+class CoalesceRules:
+    """
+    Parsed COALESCE_RULES: which event sets merge into which combined
+    event, and which events convey which others.
+    """
+
+    def __init__(self, merges: Dict[FrozenSet[str], str], supersedes: Dict[str, Set[str]]):
+        self.merges = merges
+        self.supersedes = supersedes
+
+    @classmethod
+    def parse(cls, spec: str) -> "CoalesceRules":
+        merges: Dict[FrozenSet[str], str] = {}
+        supersedes: Dict[str, Set[str]] = {}
+        for rule in spec.split(";"):
+            rule = rule.strip()
+            if not rule:
+                continue
+            if "=" in rule:
+                inputs, _, combined = rule.partition("=")
+                events = frozenset(e.strip() for e in inputs.split("+") if e.strip())
+                if len(events) >= 2 and combined.strip():
+                    merges[events] = combined.strip()
+                    continue
+            elif ">" in rule:
+                winner, _, loser = rule.partition(">")
+                if winner.strip() and loser.strip():
+                    supersedes.setdefault(winner.strip(), set()).add(loser.strip())
+                    continue
+            logger.warning("coalesce.invalid_rule", extra={"rule": rule})
+        return cls(merges, supersedes)
+
+    def conveys(self, event: str) -> Set[str]:
+        """
+        Events whose content `event` already covers (including itself).
+        """
+        covered = {event} | self.supersedes.get(event, set())
+        for inputs, combined in self.merges.items():
+            if combined == event:
+                covered |= inputs
+        for e in list(covered):
+            covered |= self.supersedes.get(e, set())
+        return covered
+
+    def target(self, events: Set[str]) -> Optional[str]:
+        """
+        The single event to send for a set of pending events, or None if
+        no rule covers them.
+        """
+        if len(events) == 1:
+            return next(iter(events))
+        for inputs, combined in self.merges.items():
+            if events <= inputs:
+                return combined
+        for event in events:
+            if events <= self.conveys(event):
+                return event
+        return None
+
+    def describe(self) -> str:
+        parts = [f"{'+'.join(sorted(inputs))}={combined}" for inputs, combined in self.merges.items()]
+        parts += [f"{winner}>{loser}" for winner, losers in self.supersedes.items() for loser in sorted(losers)]
+        return ";".join(parts)
+
+
+def advance_key(msg: Dict[str, Any]) -> Optional[str]:
+    """
+    Identify the advance a message is about: its `advance_id`, else its
+    event_id without a ":<event>" suffix (so "e-1:advance_in_transit",
+    the instant SMS ingest derives from event "e-1", groups with "e-1").
+    """
+    if msg.get("advance_id"):
+        return str(msg["advance_id"])
+    event_id = msg.get("event_id")
+    if not event_id:
+        return None
+    suffix = f":{msg.get('event')}"
+    return event_id[: -len(suffix)] if event_id.endswith(suffix) else event_id
+
+
+def recipient_key(msg: Dict[str, Any]) -> Optional[str]:
+    advance = advance_key(msg)
+    phone = (msg.get("user") or {}).get("phone")
+    if not advance or not phone:
+        return None
+    return f"{KEY_PREFIX}{phone}#{advance}"
+
+
+def _amounts(msgs: Iterable[Dict[str, Any]]) -> Set[float]:
+    return {float(m["amount"]) for m in msgs if m.get("amount") is not None}
+
+
+class InMemoryRecentStore:
+    """
+    What was recently sent per recipient key, held in process memory (tests
+    and local runs).
+    """
+
+    def __init__(self):
+        self._items: Dict[str, Tuple[Dict[str, Any], float]] = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            return {k: self._items[k][0] for k in keys if k in self._items and self._items[k][1] >= now}
+
+    def put(self, key: str, entry: Dict[str, Any], ttl_secs: int) -> None:
+        with self._lock:
+            self._items[key] = (dict(entry), time.time() + ttl_secs)
+
+
+class DynamoDBRecentStore:
+    """
+    Recently-sent records in a DynamoDB table keyed on `id`, with
+    `expires_at` as its TTL attribute (the idempotency table by default).
+    """
+
+    def __init__(self, table: str, client=None):
+        self.table = table
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+
+            self._client = boto3.client("dynamodb")
+        return self._client
+
+    def get_many(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        found: Dict[str, Dict[str, Any]] = {}
+        now = int(time.time())
+        keys = list(dict.fromkeys(keys))
+        for i in range(0, len(keys), BATCH_GET_LIMIT):
+            request = {self.table: {"Keys": [{"id": {"S": k}} for k in keys[i:i + BATCH_GET_LIMIT]]}}
+            for _ in range(BATCH_GET_MAX_ATTEMPTS):
+                resp = self.client.batch_get_item(RequestItems=request)
+                for item in resp.get("Responses", {}).get(self.table, []):
+                    if int(item.get("expires_at", {}).get("N", "0")) < now:
+                        continue
+                    found[item["id"]["S"]] = {
+                        "event": item["event"]["S"],
+                        "event_id": item.get("event_id", {}).get("S"),
+                        "amount": float(item["amount"]["N"]) if "amount" in item else None,
+                    }
+                request = resp.get("UnprocessedKeys") or {}
+                if not request:
+                    break
+        return found
+
+    def put(self, key: str, entry: Dict[str, Any], ttl_secs: int) -> None:
+        item = {
+            "id": {"S": key},
+            "event": {"S": entry["event"]},
+            "expires_at": {"N": str(int(time.time()) + ttl_secs)},
+        }
+        if entry.get("event_id"):
+            item["event_id"] = {"S": entry["event_id"]}
+        if entry.get("amount") is not None:
+            item["amount"] = {"N": repr(float(entry["amount"]))}
+        self.client.put_item(TableName=self.table, Item=item)
+
+
+class Coalescer:
+    """
+    Decides which messages of a batch collapse into one SMS (plan) and
+    which were already covered by a recent send (covered_by).
+    """
+
+    def __init__(self, rules: CoalesceRules, window_seconds: int = 0, store=None, enabled: bool = True):
+        self.rules = rules
+        self.window_seconds = window_seconds
+        self.store = store
+        self.enabled = enabled
+
+    @property
+    def windowed(self) -> bool:
+        return self.enabled and self.window_seconds > 0 and self.store is not None
+
+    def plan(self, msgs: List[Dict[str, Any]]) -> List[Tuple[int, Dict[str, Any], List[int]]]:
+        """
+        Group `msgs` by recipient and advance. For every group of two or more
+        that the rules cover, return (primary index, merged message,
+        suppressed indexes). The primary is the group's last message; the
+        merged message is sent in its place.
+        """
+        if not self.enabled:
+            return []
+        groups: Dict[str, List[int]] = {}
+        for i, msg in enumerate(msgs):
+            key = recipient_key(msg)
+            if key:
+                groups.setdefault(key, []).append(i)
+
+        plans = []
+        for key, indexes in groups.items():
+            if len(indexes) < 2:
+                continue
+            group = [msgs[i] for i in indexes]
+            events = {m.get("event") for m in group}
+            amounts = _amounts(group)
+            target = self.rules.target(events)
+            if target is None or len(amounts) > 1:
+                logger.info(
+                    "coalesce.skipped",
+                    extra={
+                        "key": key,
+                        "events": sorted(events),
+                        "reason": "no_rule" if target is None else "amount_conflict",
+                    },
+                )
+                continue
+
+            primary = indexes[-1]
+            merged = dict(msgs[primary])
+            merged["event"] = target
+            merged["amount"] = next(iter(amounts)) if amounts else None
+            merged["coalesced_event_ids"] = [msgs[i].get("event_id") for i in indexes[:-1]]
+            plans.append((primary, merged, indexes[:-1]))
+        return plans
+
+    def recently_sent(self, msgs: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Recent sends (within the window) for the recipient keys of `msgs`.
+        Errors are logged and treated as "nothing recent": coalescing is an
+        optimisation, never a reason to fail a send.
+        """
+        if not self.windowed:
+            return {}
+        keys = [k for k in (recipient_key(m) for m in msgs) if k]
+        if not keys:
+            return {}
+        try:
+            return self.store.get_many(keys)
+        except Exception as e:
+            logger.warning("coalesce.lookup_error", extra={"keys": len(keys), "error": str(e)})
+            return {}
+
+    def covered_by(self, recent: Dict[str, Any], msg: Dict[str, Any]) -> bool:
+        """
+        True if a recent send already told the recipient everything `msg`
+        would (same or superseding event, and no new amount).
+        """
+        if msg.get("event") not in self.rules.conveys(recent["event"]):
+            return False
+        return msg.get("amount") is None or (
+            recent.get("amount") is not None and float(msg["amount"]) == recent["amount"]
+        )
+
+    def record_sent(self, msg: Dict[str, Any]) -> None:
+        if not self.windowed:
+            return
+        key = recipient_key(msg)
+        if not key:
+            return
+        try:
+            self.store.put(
+                key,
+                {"event": msg.get("event"), "event_id": msg.get("event_id"), "amount": msg.get("amount")},
+                self.window_seconds,
+            )
+        except Exception as e:
+            logger.warning("coalesce.record_error", extra={"key": key, "error": str(e)})
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    raw = os.getenv(name)
+    if raw is None or raw == "":
+        return default
+    return raw.strip().lower() in ("1", "true", "yes", "on")
+
+
+def from_env() -> Coalescer:
+    """
+    Build a Coalescer from environment variables:
+
+    COALESCE_ENABLED:         "false" turns coalescing off (default on)
+    COALESCE_RULES:           rule spec (default DEFAULT_RULES)
+    COALESCE_WINDOW_SECONDS:  also drop messages covered by a send this
+                              recent, across batches and lanes (default 0 = off)
+    COALESCE_TABLE:           DynamoDB table for recent sends (default
+                              IDEMPOTENCY_TABLE; per container without one)
+    """
+    try:
+        window = max(0, int(os.getenv("COALESCE_WINDOW_SECONDS") or 0))
+    except ValueError:
+        logger.warning("coalesce.invalid_setting", extra={"env_var": "COALESCE_WINDOW_SECONDS"})
+        window = 0
+
+    store = None
+    if window:
+        table = os.getenv("COALESCE_TABLE") or os.getenv("IDEMPOTENCY_TABLE")
+        store = DynamoDBRecentStore(table) if table else InMemoryRecentStore()
+
+    return Coalescer(
+        CoalesceRules.parse(os.getenv("COALESCE_RULES") or DEFAULT_RULES),
+        window_seconds=window,
+        store=store,
+        enabled=_env_flag("COALESCE_ENABLED", True),
+    )
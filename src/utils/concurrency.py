@@ -0,0 +1,82 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, TypeVar
+
+from utils.logger import get_logger
+
+logger = get_logger("concurrency")
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+DEFAULT_MAX_WORKERS = 10
+
+# Executors are kept per container so warm invocations reuse their threads.
+_executors: Dict[int, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def resolve_max_workers(env_var: str, default: int = DEFAULT_MAX_WORKERS) -> int:
+    """
+    Read a concurrency limit from the environment.
+
+    Invalid or non-positive values fall back to `default` (with a warning),
+    since a bad tuning knob should never take the function down.
+    """
+    raw = os.getenv(env_var)
+    if raw is None or raw == "":
+        return default
+
+    try:
+        value = int(raw)
+    except ValueError:
+        logger.warning(
+            "concurrency.invalid_limit",
+            extra={"env_var": env_var, "value": raw, "default": default},
+        )
+        return default
+
+    if value < 1:
+        logger.warning(
+            "concurrency.invalid_limit",
+            extra={"env_var": env_var, "value": raw, "default": default},
+        )
+        return default
+
+    return value
+
+
+def get_executor(max_workers: int) -> ThreadPoolExecutor:
+    """
+    Return a shared thread pool of the given size, creating it on first use.
+    """
+    with _executors_lock:
+        executor = _executors.get(max_workers)
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=max_workers,
+                thread_name_prefix=f"payslice-{max_workers}",
+            )
+            _executors[max_workers] = executor
+        return executor
+
+
+def bounded_map(fn: Callable[[T], R], items: Iterable[T], max_workers: int) -> List[R]:
+    """
+    Apply `fn` to every item with at most `max_workers` calls in flight.
+
+    Results are returned in the same order as `items`. Exceptions raised by
+    `fn` propagate to the caller, so callers that want per-item error
+    reporting should catch inside `fn`.
+
+    With a limit of 1 (or a single item) everything runs inline on the
+    calling thread, which keeps the sequential path free of pool overhead.
+    """
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        return [fn(item) for item in items]
+
+    executor = get_executor(max_workers)
+    futures = [executor.submit(fn, item) for item in items]
+    return [f.result() for f in futures]
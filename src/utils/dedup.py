@@ -0,0 +1,309 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.logger import get_logger
+
+logger = get_logger("dedup")
+
+# Content-based send deduplication: upstream systems sometimes emit the same
+# business event twice under different event_ids, which idempotency (keyed on
+# event_id) lets through. Each send first claims a hash of its content
+# (DEDUP_KEY_FIELDS, normalized) for DEDUP_WINDOW_SECONDS; a message whose
+# content was claimed by another event_id within the window is dropped.
+#
+# Claims share the idempotency table, under their own prefix:
+#   id          (S) "content#<hash>"
+#   event_id    (S) the claiming event_id, when it has one
+#   claimed_at  (N) epoch milliseconds; identifies the claim for release()
+#   expires_at  (N) claimed_at + window, in epoch seconds (DynamoDB TTL)
+KEY_PREFIX = "content#"
+
+DEFAULT_FIELDS = ("phone", "event", "amount")
+DEFAULT_LRU_SIZE = 10000
+
+
+def _phone(msg: Dict[str, Any]) -> str:
+    # "+1 (555) 555-0123" and "+15555550123" are the same recipient
+    phone = (msg.get("user") or {}).get("phone") or ""
+    return re.sub(r"[\s().-]", "", str(phone))
+
+
+def _amount(msg: Dict[str, Any]) -> str:
+    amount = msg.get("amount")
+    if amount is None or isinstance(amount, bool):
+        return ""
+    try:
+        return f"{float(amount):.2f}"
+    except (TypeError, ValueError):
+        return str(amount)
+
+
+def _text(field: str) -> Callable[[Dict[str, Any]], str]:
+    return lambda msg: str(msg.get(field) or "").strip().lower()
+
+
+# DEDUP_KEY_FIELDS name → normalizer
+FIELDS: Dict[str, Callable[[Dict[str, Any]], str]] = {
+    "phone": _phone,
+    "event": _text("event"),
+    "amount": _amount,
+    "advance_id": _text("advance_id"),
+}
+
+
+def _is_conditional_failure(error: Exception) -> bool:
+    # Duck-typed botocore ClientError check; avoids importing botocore here
+    code = (getattr(error, "response", None) or {}).get("Error", {}).get("Code")
+    return code == "ConditionalCheckFailedException"
+
+
+class Claim:
+    """
+    Outcome of ContentDeduper.claim(): either this message now owns its
+    content key (`duplicate` is False) or another event_id sent the same
+    content within the window (`duplicate_of`).
+    """
+
+    __slots__ = ("key", "claimed_at", "duplicate", "duplicate_of")
+
+    def __init__(self, key: str, claimed_at: int, duplicate: bool = False, duplicate_of: Optional[str] = None):
+        self.key = key
+        self.claimed_at = claimed_at
+        self.duplicate = duplicate
+        self.duplicate_of = duplicate_of
+
+
+class InMemoryContentStore:
+    """
+    Content claims held in process memory (tests and local runs).
+    """
+
+    def __init__(self):
+        # key → (event_id, claimed_at ms, expires_at s)
+        self._items: Dict[str, Tuple[Optional[str], int, float]] = {}
+        self._lock = threading.Lock()
+
+    def claim(self, key: str, event_id: Optional[str], claimed_at: int, window_seconds: int) -> Optional[Tuple[Optional[str], int]]:
+        """
+        Claim `key`; returns None on success, else the current owner's
+        (event_id, claimed_at).
+        """
+        with self._lock:
+            current = self._items.get(key)
+            if current is not None and current[2] >= claimed_at / 1000 and (event_id is None or current[0] != event_id):
+                return current[0], current[1]
+            self._items[key] = (event_id, claimed_at, claimed_at / 1000 + window_seconds)
+            return None
+
+    def release(self, key: str, claimed_at: int) -> None:
+        with self._lock:
+            current = self._items.get(key)
+            if current is not None and current[1] == claimed_at:
+                del self._items[key]
+
+
+class DynamoDBContentStore:
+    """
+    Content claims in a DynamoDB table keyed on `id`, with `expires_at` as
+    its TTL attribute (the idempotency table by default). The conditional
+    put is the authoritative check across containers and lanes.
+    """
+
+    def __init__(self, table: str, client=None):
+        self.table = table
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+
+            self._client = boto3.client("dynamodb")
+        return self._client
+
+    def claim(self, key: str, event_id: Optional[str], claimed_at: int, window_seconds: int) -> Optional[Tuple[Optional[str], int]]:
+        now = claimed_at // 1000
+        item = {
+            "id": {"S": key},
+            "claimed_at": {"N": str(claimed_at)},
+            "expires_at": {"N": str(now + window_seconds)},
+        }
+        values = {":now": {"N": str(now)}}
+        condition = "attribute_not_exists(id) OR expires_at < :now"
+        if event_id:
+            # A redelivery of the claiming record may claim again
+            item["event_id"] = {"S": event_id}
+            values[":eid"] = {"S": event_id}
+            condition += " OR event_id = :eid"
+        try:
+            self.client.put_item(
+                TableName=self.table,
+                Item=item,
+                ConditionExpression=condition,
+                ExpressionAttributeValues=values,
+                ReturnValuesOnConditionCheckFailure="ALL_OLD",
+            )
+            return None
+        except Exception as e:
+            if not _is_conditional_failure(e):
+                raise
+            old = e.response.get("Item") or {}
+            return old.get("event_id", {}).get("S"), int(old.get("claimed_at", {}).get("N", "0"))
+
+    def release(self, key: str, claimed_at: int) -> None:
+        try:
+            self.client.delete_item(
+                TableName=self.table,
+                Key={"id": {"S": key}},
+                ConditionExpression="claimed_at = :claimed_at",
+                ExpressionAttributeValues={":claimed_at": {"N": str(claimed_at)}},
+            )
+        except Exception as e:
+            # Already taken over by a later claim
+            if not _is_conditional_failure(e):
+                raise
+
+
+class ContentDeduper:
+    """
+    Claims a message's content key before it is sent.
+
+    An in-container LRU of recently claimed keys answers repeats without a
+    round-trip; otherwise the store's conditional write decides. Store
+    errors are logged and the message is sent: event_id idempotency still
+    applies, and dedup must never be the reason an SMS is lost.
+    """
+
+    def __init__(
+        self,
+        fields: Tuple[str, ...] = DEFAULT_FIELDS,
+        window_seconds: int = 0,
+        store=None,
+        lru_size: int = DEFAULT_LRU_SIZE,
+        clock: Callable[[], float] = time.time,
+    ):
+        unknown = [f for f in fields if f not in FIELDS]
+        if unknown or not fields:
+            raise ValueError(f"Unknown dedup key fields: {', '.join(unknown) or '<none>'}")
+        self.fields = tuple(fields)
+        self.window_seconds = window_seconds
+        self.store = store
+        self.lru_size = lru_size
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key → (event_id, claimed_at ms) of the claim this container saw
+        self._recent: "OrderedDict[str, Tuple[Optional[str], int]]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_seconds > 0 and self.store is not None
+
+    def key(self, msg: Dict[str, Any]) -> str:
+        content = "\x1f".join(f"{f}={FIELDS[f](msg)}" for f in self.fields)
+        return KEY_PREFIX + hashlib.sha256(content.encode()).hexdigest()[:32]
+
+    def _remember(self, key: str, event_id: Optional[str], claimed_at: int) -> None:
+        if self.lru_size <= 0:
+            return
+        with self._lock:
+            self._recent[key] = (event_id, claimed_at)
+            self._recent.move_to_end(key)
+            while len(self._recent) > self.lru_size:
+                self._recent.popitem(last=False)
+
+    def _recent_owner(self, key: str, now_ms: int) -> Optional[Tuple[Optional[str], int]]:
+        with self._lock:
+            owner = self._recent.get(key)
+            if owner is None:
+                return None
+            if now_ms - owner[1] >= self.window_seconds * 1000:
+                del self._recent[key]
+                return None
+            return owner
+
+    def claim(self, msg: Dict[str, Any]) -> Optional[Claim]:
+        """
+        Claim `msg`'s content for the window. Returns None when dedup is off
+        or the store failed (send anyway).
+        """
+        if not self.enabled:
+            return None
+        key = self.key(msg)
+        event_id = msg.get("event_id")
+        now_ms = int(self._clock() * 1000)
+
+        owner = self._recent_owner(key, now_ms)
+        if owner is not None and (event_id is None or owner[0] != event_id):
+            return Claim(key, now_ms, duplicate=True, duplicate_of=owner[0])
+
+        try:
+            owner = self.store.claim(key, event_id, now_ms, self.window_seconds)
+        except Exception as e:
+            logger.warning("dedup.claim_error", extra={"key": key, "event_id": event_id, "error": str(e)})
+            return None
+        if owner is not None:
+            self._remember(key, *owner)
+            return Claim(key, now_ms, duplicate=True, duplicate_of=owner[0])
+        self._remember(key, event_id, now_ms)
+        return Claim(key, now_ms)
+
+    def release(self, claim: Optional[Claim]) -> None:
+        """
+        Give up a claim after a failed send, so a retry (or the other copy)
+        can go out. Never raises.
+        """
+        if claim is None or claim.duplicate:
+            return
+        with self._lock:
+            if self._recent.get(claim.key, (None, None))[1] == claim.claimed_at:
+                del self._recent[claim.key]
+        try:
+            self.store.release(claim.key, claim.claimed_at)
+        except Exception as e:
+            logger.warning("dedup.release_error", extra={"key": claim.key, "error": str(e)})
+
+    def clear(self) -> None:
+        with self._lock:
+            self._recent.clear()
+
+
+def from_env() -> ContentDeduper:
+    """
+    Build a ContentDeduper from environment variables:
+
+    DEDUP_WINDOW_SECONDS:  drop a message whose content was sent under another
+                           event_id this recently (default 0 = off)
+    DEDUP_KEY_FIELDS:      comma-separated content fields, from phone, event,
+                           amount and advance_id (default phone,event,amount)
+    DEDUP_TABLE:           DynamoDB table for claims (default
+                           IDEMPOTENCY_TABLE; per container without one)
+    DEDUP_LRU_SIZE:        in-container cache of recent claims (default 10000)
+    """
+    try:
+        window = max(0, int(os.getenv("DEDUP_WINDOW_SECONDS") or 0))
+    except ValueError:
+        logger.warning("dedup.invalid_setting", extra={"env_var": "DEDUP_WINDOW_SECONDS"})
+        window = 0
+
+    fields: List[str] = [f.strip() for f in (os.getenv("DEDUP_KEY_FIELDS") or "").split(",") if f.strip()]
+    if not fields or any(f not in FIELDS for f in fields):
+        if fields:
+            logger.warning("dedup.invalid_setting", extra={"env_var": "DEDUP_KEY_FIELDS", "value": fields})
+        fields = list(DEFAULT_FIELDS)
+
+    store = None
+    if window:
+        table = os.getenv("DEDUP_TABLE") or os.getenv("IDEMPOTENCY_TABLE")
+        store = DynamoDBContentStore(table) if table else InMemoryContentStore()
+
+    return ContentDeduper(
+        tuple(fields),
+        window_seconds=window,
+        store=store,
+        lru_size=int(os.getenv("DEDUP_LRU_SIZE") or DEFAULT_LRU_SIZE),
+    )
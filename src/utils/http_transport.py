@@ -0,0 +1,224 @@
+# utils/http_transport.py
+#
+# Pooled keep-alive HTTP transport for the Twilio SDK. Imported lazily from
+# utils.twilio_client.build_client(), so requests/urllib3 are only loaded on
+# the send path (see tests/test_imports.py).
+
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from requests.adapters import HTTPAdapter
+from twilio.http.http_client import TwilioHttpClient
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from utils.concurrency import resolve_max_workers
+from utils.logger import get_logger
+
+logger = get_logger("http_transport")
+
+# Connect + one read well under the Ingest (10s) and Worker (30s) Lambda
+# timeouts, even with connect retries.
+DEFAULT_CONNECT_TIMEOUT_SECONDS = 2.0
+DEFAULT_READ_TIMEOUT_SECONDS = 5.0
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_BACKOFF_SECONDS = 0.1
+
+
+class TransportStats:
+    """
+    Counters for the shared Twilio connection pool. Thread-safe.
+
+    A "connection" is a TCP connect + TLS handshake; every request that
+    didn't need one reused a pooled keep-alive connection.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests = 0
+            self.connections = 0
+            self.handshake_seconds = 0.0
+            self.handshake_max_seconds = 0.0
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def record_connect(self, seconds: float) -> None:
+        with self._lock:
+            self.connections += 1
+            self.handshake_seconds += seconds
+            self.handshake_max_seconds = max(self.handshake_max_seconds, seconds)
+
+    def snapshot(self, reset: bool = False) -> Dict[str, Any]:
+        """
+        Current counters (reuse_rate is None before the first request).
+        With reset=True the counters restart, giving per-invocation numbers.
+        """
+        with self._lock:
+            requests, connections = self.requests, self.connections
+            out = {
+                "requests": requests,
+                "new_connections": connections,
+                "reuse_rate": round(max(0.0, 1 - connections / requests), 4) if requests else None,
+                "handshake_ms_avg": round(self.handshake_seconds / connections * 1000, 3) if connections else 0.0,
+                "handshake_ms_max": round(self.handshake_max_seconds * 1000, 3),
+            }
+        if reset:
+            self.reset()
+        return out
+
+
+stats = TransportStats()
+
+
+class _TimedConnect:
+    def connect(self) -> None:
+        started = time.perf_counter()
+        super().connect()  # type: ignore[misc]
+        stats.record_connect(time.perf_counter() - started)
+
+
+class TimedHTTPConnection(_TimedConnect, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnect, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose pools time every new connection.
+    """
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+
+class PooledTwilioHttpClient(TwilioHttpClient):
+    """
+    TwilioHttpClient on one keep-alive session with an explicitly sized pool.
+
+    The SDK's default client sizes its pool to min(32, cpu_count + 4), which
+    on a small Lambda is below WORKER_CONCURRENCY. Connections beyond it are
+    discarded after each request and re-handshaked on the next. It also
+    drops its max_retries adapter when it mounts the pooled one.
+
+    Retries (with jittered backoff) only cover connection failures for
+    POST. Once a message create has been sent, it is never replayed, so a
+    read timeout cannot double-send an SMS; SQS redelivery plus idempotency
+    handle that case instead.
+    """
+
+    def __init__(
+        self,
+        pool_size: int,
+        connect_timeout: float,
+        read_timeout: float,
+        max_retries: int,
+        backoff_seconds: float,
+    ):
+        super().__init__(pool_connections=True)
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=0,
+            backoff_factor=backoff_seconds,
+            backoff_jitter=backoff_seconds,
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,  # excludes POST
+            raise_on_status=False,
+        )
+        adapter = PooledHTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # requests takes a (connect, read) tuple; the base class only
+        # validates scalars, so set it after __init__.
+        self.timeout: Tuple[float, float] = (connect_timeout, read_timeout)  # type: ignore[assignment]
+        self.pool_size = pool_size
+
+    def request(self, *args, **kwargs):
+        stats.record_request()
+        return super().request(*args, **kwargs)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        logger.warning("http_transport.invalid_setting", extra={"env_var": name, "default": default})
+        return default
+
+
+def build_http_client(
+    pool_size: Optional[int] = None,
+    connect_timeout: Optional[float] = None,
+    read_timeout: Optional[float] = None,
+    max_retries: Optional[int] = None,
+    backoff_seconds: Optional[float] = None,
+) -> PooledTwilioHttpClient:
+    """
+    Build a pooled Twilio HTTP client. Unset arguments come from:
+
+      TWILIO_HTTP_POOL_SIZE                (default: WORKER_CONCURRENCY, else 10)
+      TWILIO_HTTP_CONNECT_TIMEOUT_SECONDS  (default 2)
+      TWILIO_HTTP_READ_TIMEOUT_SECONDS     (default 5)
+      TWILIO_HTTP_MAX_RETRIES              (default 2)
+      TWILIO_HTTP_BACKOFF_SECONDS          (default 0.1, also the jitter)
+    """
+    if pool_size is None:
+        pool_size = resolve_max_workers(
+            "TWILIO_HTTP_POOL_SIZE", default=resolve_max_workers("WORKER_CONCURRENCY")
+        )
+    if connect_timeout is None:
+        connect_timeout = _env_float("TWILIO_HTTP_CONNECT_TIMEOUT_SECONDS", DEFAULT_CONNECT_TIMEOUT_SECONDS)
+    if read_timeout is None:
+        read_timeout = _env_float("TWILIO_HTTP_READ_TIMEOUT_SECONDS", DEFAULT_READ_TIMEOUT_SECONDS)
+    if max_retries is None:
+        max_retries = int(_env_float("TWILIO_HTTP_MAX_RETRIES", DEFAULT_MAX_RETRIES))
+    if backoff_seconds is None:
+        backoff_seconds = _env_float("TWILIO_HTTP_BACKOFF_SECONDS", DEFAULT_BACKOFF_SECONDS)
+
+    return PooledTwilioHttpClient(pool_size, connect_timeout, read_timeout, max_retries, backoff_seconds)
+
+
+# One transport per container. Credential refreshes rebuild the Twilio
+# client but keep this, so warm invocations keep their open connections.
+_http_client: Optional[PooledTwilioHttpClient] = None
+_http_client_lock = threading.Lock()
+
+
+def get_http_client() -> PooledTwilioHttpClient:
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                _http_client = build_http_client()
+                logger.info(
+                    "http_transport.ready",
+                    extra={
+                        "pool_size": _http_client.pool_size,
+                        "timeout": list(_http_client.timeout),
+                    },
+                )
+    return _http_client
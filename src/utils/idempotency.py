@@ -1,16 +1,340 @@
-import os, time, boto3
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set
+
+import boto3
 from botocore.exceptions import ClientError
-_TBL = os.getenv("IDEMPOTENCY_TABLE")
 
-def was_processed(event_id:str, ttl_secs:int=86400)->bool:
-    if not _TBL: return False
-    ddb = boto3.client("dynamodb")
+from utils.logger import get_logger
+
+logger = get_logger("idempotency")
+
+# Item layout (matches IdempotencyTable in template.yaml):
+#   id         (S) event_id, the partition key
+#   status     (S) in_flight | completed
+#   expires_at (N) epoch seconds; DynamoDB TTL attribute. For in_flight
+#                  items it doubles as the lease expiry, so a crashed
+#                  sender's claim can be taken over once it lapses.
+STATUS_IN_FLIGHT = "in_flight"
+STATUS_COMPLETED = "completed"
+
+# claim() outcomes
+CLAIMED = "claimed"
+ALREADY_COMPLETED = "completed"
+IN_FLIGHT = "in_flight"
+
+DEFAULT_TTL_SECONDS = 86400
+# Must comfortably exceed the worker timeout so a live send is never stolen
+DEFAULT_IN_FLIGHT_SECONDS = 120
+
+# Last error of a record that used up its SQS receives and went to the DLQ,
+# stored as "failure#<event_id>" for as long as the DLQ keeps messages
+FAILURE_KEY_PREFIX = "failure#"
+FAILURE_TTL_SECONDS = 14 * 86400
+
+# BatchGetItem accepts at most 100 keys per call
+BATCH_GET_LIMIT = 100
+BATCH_GET_MAX_ATTEMPTS = 3
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _table() -> Optional[str]:
+    return os.getenv("IDEMPOTENCY_TABLE")
+
+
+def enabled() -> bool:
+    """
+    Idempotency is active whenever IDEMPOTENCY_TABLE is configured.
+    """
+    return bool(_table())
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = boto3.client("dynamodb")
+    return _client
+
+
+class _RecentlyCompleted:
+    """
+    Small in-container LRU of event_ids known to be completed, so
+    redeliveries within a warm container are rejected without DynamoDB.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, event_id: str, expires_at: int) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._items[event_id] = expires_at
+            self._items.move_to_end(event_id)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def __contains__(self, event_id: str) -> bool:
+        with self._lock:
+            expires_at = self._items.get(event_id)
+            if expires_at is None:
+                return False
+            if expires_at < time.time():
+                del self._items[event_id]
+                return False
+            self._items.move_to_end(event_id)
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+recent = _RecentlyCompleted(int(os.getenv("IDEMPOTENCY_LRU_SIZE", "10000")))
+
+
+def claim(event_id: str, in_flight_secs: int = DEFAULT_IN_FLIGHT_SECONDS) -> str:
+    """
+    Try to take ownership of `event_id` before sending.
+
+    Returns CLAIMED if the caller should send, ALREADY_COMPLETED if it was
+    sent before, or IN_FLIGHT if another sender currently holds the lease.
+    DynamoDB errors propagate; callers decide whether to retry.
+    """
+    table = _table()
+    if not table:
+        return CLAIMED
+    if event_id in recent:
+        return ALREADY_COMPLETED
+
+    now = int(time.time())
+    try:
+        _get_client().put_item(
+            TableName=table,
+            Item={
+                "id": {"S": event_id},
+                "status": {"S": STATUS_IN_FLIGHT},
+                "expires_at": {"N": str(now + in_flight_secs)},
+            },
+            # expires_at < now covers both lapsed leases and completed
+            # records that TTL has not deleted yet.
+            ConditionExpression="attribute_not_exists(id) OR expires_at < :now",
+            ExpressionAttributeValues={":now": {"N": str(now)}},
+            ReturnValuesOnConditionCheckFailure="ALL_OLD",
+        )
+        return CLAIMED
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+        item = e.response.get("Item") or {}
+        if item.get("status", {}).get("S") == STATUS_COMPLETED:
+            recent.add(event_id, int(item.get("expires_at", {}).get("N", now)))
+            return ALREADY_COMPLETED
+        return IN_FLIGHT
+
+
+def complete(event_id: str, ttl_secs: int = DEFAULT_TTL_SECONDS, **attributes: str) -> None:
+    """
+    Mark `event_id` as completed (e.g. after Twilio accepted the SMS).
+
+    Never raises: the send already happened, and failing the record here
+    would only get it redelivered and sent twice.
+    """
+    table = _table()
+    if not table:
+        return
+
+    expires_at = int(time.time()) + ttl_secs
+    item = {
+        "id": {"S": event_id},
+        "status": {"S": STATUS_COMPLETED},
+        "expires_at": {"N": str(expires_at)},
+    }
+    for name, value in attributes.items():
+        if value is not None:
+            item[name] = {"S": str(value)}
+
+    recent.add(event_id, expires_at)
+    try:
+        _get_client().put_item(TableName=table, Item=item)
+    except Exception as e:
+        logger.error(
+            "idempotency.complete_error",
+            extra={"event_id": event_id, "error": str(e)},
+        )
+
+
+def release(event_id: str) -> None:
+    """
+    Drop an in-flight claim after a failed send so a retry can claim it.
+    Never raises; an unreleased lease simply expires.
+    """
+    table = _table()
+    if not table:
+        return
+
+    try:
+        _get_client().delete_item(
+            TableName=table,
+            Key={"id": {"S": event_id}},
+            ConditionExpression="#s = :in_flight",
+            ExpressionAttributeNames={"#s": "status"},
+            ExpressionAttributeValues={":in_flight": {"S": STATUS_IN_FLIGHT}},
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            logger.warning(
+                "idempotency.release_error",
+                extra={"event_id": event_id, "error": str(e)},
+            )
+    except Exception as e:
+        logger.warning(
+            "idempotency.release_error",
+            extra={"event_id": event_id, "error": str(e)},
+        )
+
+
+def completed_ids(event_ids: Iterable[str]) -> Set[str]:
+    """
+    Return the subset of `event_ids` already completed.
+
+    Checks the in-container LRU first, then looks up the rest with
+    BatchGetItem (100 keys per call). This is a pre-check only: on DynamoDB
+    errors it returns what it knows and claim() stays authoritative.
+    """
+    table = _table()
+    if not table:
+        return set()
+
+    done: Set[str] = set()
+    pending: List[str] = []
+    for event_id in dict.fromkeys(event_ids):
+        if event_id in recent:
+            done.add(event_id)
+        else:
+            pending.append(event_id)
+
+    now = int(time.time())
+    for i in range(0, len(pending), BATCH_GET_LIMIT):
+        request = {
+            table: {
+                "Keys": [{"id": {"S": event_id}} for event_id in pending[i:i + BATCH_GET_LIMIT]],
+                "ProjectionExpression": "id, #s, expires_at",
+                "ExpressionAttributeNames": {"#s": "status"},
+            }
+        }
+        for _ in range(BATCH_GET_MAX_ATTEMPTS):
+            try:
+                resp = _get_client().batch_get_item(RequestItems=request)
+            except Exception as e:
+                logger.warning(
+                    "idempotency.precheck_error",
+                    extra={"keys": len(request[table]["Keys"]), "error": str(e)},
+                )
+                break
+
+            for item in resp.get("Responses", {}).get(table, []):
+                expires_at = int(item.get("expires_at", {}).get("N", "0"))
+                if item.get("status", {}).get("S") == STATUS_COMPLETED and expires_at >= now:
+                    event_id = item["id"]["S"]
+                    done.add(event_id)
+                    recent.add(event_id, expires_at)
+
+            request = resp.get("UnprocessedKeys") or {}
+            if not request:
+                break
+
+    return done
+
+
+def record_failure(event_id: str, error: str, ttl_secs: int = FAILURE_TTL_SECONDS) -> None:
+    """
+    Remember why `event_id` is headed for the DLQ, so a replay can filter
+    on the error class. Never raises.
+    """
+    table = _table()
+    if not table:
+        return
+
+    try:
+        _get_client().put_item(
+            TableName=table,
+            Item={
+                "id": {"S": FAILURE_KEY_PREFIX + event_id},
+                "error": {"S": error},
+                "expires_at": {"N": str(int(time.time()) + ttl_secs)},
+            },
+        )
+    except Exception as e:
+        logger.warning(
+            "idempotency.record_failure_error",
+            extra={"event_id": event_id, "error": str(e)},
+        )
+
+
+def failure_classes(event_ids: Iterable[str]) -> Dict[str, str]:
+    """
+    Return the recorded error class for each of `event_ids` that has one.
+    On DynamoDB errors it returns what it found so far.
+    """
+    table = _table()
+    if not table:
+        return {}
+
+    found: Dict[str, str] = {}
+    keys = [FAILURE_KEY_PREFIX + event_id for event_id in dict.fromkeys(event_ids)]
+    for i in range(0, len(keys), BATCH_GET_LIMIT):
+        request = {table: {"Keys": [{"id": {"S": key}} for key in keys[i:i + BATCH_GET_LIMIT]]}}
+        for _ in range(BATCH_GET_MAX_ATTEMPTS):
+            try:
+                resp = _get_client().batch_get_item(RequestItems=request)
+            except Exception as e:
+                logger.warning(
+                    "idempotency.failure_lookup_error",
+                    extra={"keys": len(request[table]["Keys"]), "error": str(e)},
+                )
+                break
+
+            for item in resp.get("Responses", {}).get(table, []):
+                found[item["id"]["S"][len(FAILURE_KEY_PREFIX):]] = item.get("error", {}).get("S")
+
+            request = resp.get("UnprocessedKeys") or {}
+            if not request:
+                break
+
+    return found
+
+
+def was_processed(event_id: str, ttl_secs: int = DEFAULT_TTL_SECONDS) -> bool:
+    """
+    Single-shot guard: record `event_id` as completed and return True if it
+    had already been recorded. Prefer claim()/complete() around sends.
+    """
+    table = _table()
+    if not table:
+        return False
+
+    now = int(time.time())
     try:
-        resp = ddb.put_item(
-            TableName=_TBL,
-            Item={"pk":{"S":event_id}, "exp":{"N":str(int(time.time())+ttl_secs)}},
-            ConditionExpression="attribute_not_exists(pk)"
+        _get_client().put_item(
+            TableName=table,
+            Item={
+                "id": {"S": event_id},
+                "status": {"S": STATUS_COMPLETED},
+                "expires_at": {"N": str(now + ttl_secs)},
+            },
+            ConditionExpression="attribute_not_exists(id) OR expires_at < :now",
+            ExpressionAttributeValues={":now": {"N": str(now)}},
         )
+        recent.add(event_id, now + ttl_secs)
         return False
     except ClientError as e:
         if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
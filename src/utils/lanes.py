@@ -0,0 +1,77 @@
+import os
+from functools import lru_cache
+from typing import Dict, Optional
+
+from utils.logger import get_logger
+
+logger = get_logger("lanes")
+
+# Priority lanes: each lane has its own SQS queue and its own Worker
+# function (concurrency, batch size and batching window set per lane in
+# template.yaml), so a burst of delayed approvals coming due can't hold up
+# time-sensitive SMS queued behind them.
+#
+# Configuration:
+#   LANE_ROUTES           "event=lane,..." overrides for DEFAULT_ROUTES
+#   <LANE>_QUEUE_URL      queue for a lane (the standard lane uses
+#                         APPROVED_QUEUE_URL); unset = the standard queue
+#   LANE_DWELL_SLO_MS_<LANE>  queue-lateness SLO for a lane
+#   WORKER_LANE           lane a Worker function consumes (default standard)
+LANE_INSTANT = "instant"
+LANE_STANDARD = "standard"
+
+DEFAULT_LANE = LANE_STANDARD
+DEFAULT_ROUTES = {"advance_in_transit": LANE_INSTANT}
+
+# How late (past its due time) a message may be picked up by a Worker
+DEFAULT_DWELL_SLO_MS = {LANE_INSTANT: 1000, LANE_STANDARD: 60000}
+
+_QUEUE_URL_ENV = {LANE_STANDARD: "APPROVED_QUEUE_URL"}
+
+
+@lru_cache(maxsize=8)
+def _parse_routes(raw: str) -> Dict[str, str]:
+    routes = dict(DEFAULT_ROUTES)
+    for pair in raw.split(","):
+        event_type, sep, lane = pair.partition("=")
+        if not sep or not event_type.strip() or not lane.strip():
+            if pair.strip():
+                logger.warning("lanes.invalid_route", extra={"route": pair})
+            continue
+        routes[event_type.strip()] = lane.strip().lower()
+    return routes
+
+
+def routes() -> Dict[str, str]:
+    """
+    Event type → lane routing table (DEFAULT_ROUTES plus LANE_ROUTES).
+    """
+    return _parse_routes(os.getenv("LANE_ROUTES", ""))
+
+
+def lane_for(event_type: Optional[str]) -> str:
+    return routes().get(event_type or "", DEFAULT_LANE)
+
+
+def queue_url_for(lane: str, default: Optional[str] = None) -> Optional[str]:
+    """
+    Queue URL for `lane`. Lanes without a queue of their own share the
+    standard lane's queue (`default`, else APPROVED_QUEUE_URL), so a stack
+    without lane queues behaves exactly like a single-queue one.
+    """
+    env_var = _QUEUE_URL_ENV.get(lane, f"{lane.upper()}_QUEUE_URL")
+    return os.getenv(env_var) or default or os.getenv(_QUEUE_URL_ENV[LANE_STANDARD])
+
+
+def worker_lane() -> str:
+    return (os.getenv("WORKER_LANE") or DEFAULT_LANE).lower()
+
+
+def dwell_slo_ms(lane: str) -> int:
+    raw = os.getenv(f"LANE_DWELL_SLO_MS_{lane.upper()}")
+    if raw:
+        try:
+            return int(raw)
+        except ValueError:
+            logger.warning("lanes.invalid_slo", extra={"lane": lane, "value": raw})
+    return DEFAULT_DWELL_SLO_MS.get(lane, DEFAULT_DWELL_SLO_MS[DEFAULT_LANE])
@@ -1,32 +1,167 @@
+import functools
 import json
 import logging
 import os
-from datetime import datetime, timezone
-from typing import Any, Dict
+import random
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, FrozenSet, List, Optional
+
+try:  # Optional fast JSON encoder; the stdlib encoder is the fallback
+    import orjson  # type: ignore[import-not-found]
+except ImportError:  # pragma: no cover - depends on the deployment package
+    orjson = None
 
 
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 
+# Attributes every LogRecord has; anything else on a record came from
+# `extra={...}` and is emitted as a structured field.
+_RESERVED_ATTRS: FrozenSet[str] = frozenset(
+    vars(logging.LogRecord("", 0, "", 0, "", (), None)).keys()
+) | {"message", "asctime"}
+
+
+if orjson is not None:
+    def _dumps(payload: Dict[str, Any]) -> str:
+        return orjson.dumps(payload, default=str).decode()
+else:
+    # One reusable encoder instead of json.dumps() building one per call
+    _dumps = json.JSONEncoder(separators=(",", ":"), default=str, ensure_ascii=False).encode
+
 
 class JsonFormatter(logging.Formatter):
     """
     Simple JSON formatter for Lambda logs.
     Produces one JSON object per log line. Easy to parse in CloudWatch / tools.
+
+    Fields passed with `extra={...}` are emitted at the top level; the
+    `fields` dict used by log() is flattened the same way.
     """
 
+    def __init__(self):
+        super().__init__()
+        # Timestamp prefix cache: strftime once per second, not per record
+        self._ts_second = -1
+        self._ts_prefix = ""
+
+    def _timestamp(self, created: float) -> str:
+        second = int(created)
+        if second != self._ts_second:
+            self._ts_prefix = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(second))
+            self._ts_second = second
+        return f"{self._ts_prefix},{int((created - second) * 1_000_000):06d}+0000"
+
     def format(self, record: logging.LogRecord) -> str:
         payload: Dict[str, Any] = {
-            "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S,%f%z"),
+            "timestamp": self._timestamp(record.created),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
         }
 
+        for key, value in record.__dict__.items():
+            if key in _RESERVED_ATTRS:
+                continue
+            if key == "fields" and isinstance(value, dict):
+                payload.update(value)
+            else:
+                payload[key] = value
+
         if record.exc_info:
             payload["exc_info"] = self.formatException(record.exc_info)
 
-        # You can add more structured fields here if desired
-        return json.dumps(payload)
+        return _dumps(payload)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of high-volume INFO/DEBUG events.
+
+    `events` are event names, i.e. the message up to the first ":" (so both
+    "worker.twilio_sent" and "worker.twilio_sent: sid=%s ..." match).
+    WARNING and above are never sampled.
+    """
+
+    def __init__(self, rate: float, events: FrozenSet[str]):
+        super().__init__()
+        self.rate = rate
+        self.events = events
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO or not self.events:
+            return True
+        msg = record.msg if isinstance(record.msg, str) else str(record.msg)
+        if msg.split(":", 1)[0] not in self.events:
+            return True
+        return random.random() < self.rate
+
+
+class BufferedStreamHandler(logging.StreamHandler):
+    """
+    Collects formatted lines in memory and writes them with a single write
+    per flush. Records at `flush_level` or above, or a full buffer, flush
+    immediately so errors are never held back.
+    """
+
+    def __init__(self, stream=None, capacity: int = 1000, flush_level: int = logging.ERROR):
+        super().__init__(stream)
+        self.capacity = capacity
+        self.flush_level = flush_level
+        self._buffer: List[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            line = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+
+        with self.lock:
+            self._buffer.append(line)
+            full = len(self._buffer) >= self.capacity
+        if full or record.levelno >= self.flush_level:
+            self.flush()
+
+    def flush(self) -> None:
+        with self.lock:
+            if self._buffer:
+                self.stream.write("\n".join(self._buffer) + "\n")
+                self._buffer.clear()
+            if self.stream and hasattr(self.stream, "flush"):
+                self.stream.flush()
+
+
+def _env_flag(name: str) -> bool:
+    return os.getenv(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _build_handler() -> logging.Handler:
+    handler: logging.Handler
+    if _env_flag("LOG_BUFFERED"):
+        handler = BufferedStreamHandler(sys.stderr)
+    else:
+        handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter())
+    return handler
+
+
+def _build_sampling_filter() -> Optional[SamplingFilter]:
+    try:
+        rate = float(os.getenv("LOG_SAMPLE_RATE", "1"))
+    except ValueError:
+        rate = 1.0
+    events = frozenset(e.strip() for e in os.getenv("LOG_SAMPLED_EVENTS", "").split(",") if e.strip())
+    if rate >= 1 or not events:
+        return None
+    return SamplingFilter(rate, events)
+
+
+# One handler (and buffer) shared by every logger in the container
+_handler = _build_handler()
+_sampling_filter = _build_sampling_filter()
+_configure_lock = threading.Lock()
 
 
 def get_logger(name: str = "app") -> logging.Logger:
@@ -40,22 +175,48 @@ def get_logger(name: str = "app") -> logging.Logger:
     if getattr(logger, "_configured", False):
         return logger
 
-    level = getattr(logging, LOG_LEVEL, logging.INFO)
-    logger.setLevel(level)
+    with _configure_lock:
+        if getattr(logger, "_configured", False):
+            return logger
 
-    handler = logging.StreamHandler()
-    handler.setFormatter(JsonFormatter())
-    logger.addHandler(handler)
+        level = getattr(logging, LOG_LEVEL, logging.INFO)
+        logger.setLevel(level)
+        logger.addHandler(_handler)
+        if _sampling_filter is not None:
+            logger.addFilter(_sampling_filter)
 
-    # Do not propagate to the root logger; we emit JSON ourselves.
-    logger.propagate = False
+        # Do not propagate to the root logger; we emit JSON ourselves.
+        logger.propagate = False
 
-    # Mark as configured
-    logger._configured = True  # type: ignore[attr-defined]
+        # Mark as configured
+        logger._configured = True  # type: ignore[attr-defined]
 
     return logger
 
 
+def flush() -> None:
+    """
+    Write out any buffered log lines (no-op unless LOG_BUFFERED is set).
+    """
+    _handler.flush()
+
+
+def flush_logs(handler: Callable) -> Callable:
+    """
+    Decorator for Lambda handlers: flush buffered logs once per invocation,
+    however the handler exits.
+    """
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        try:
+            return handler(event, context)
+        finally:
+            flush()
+
+    return wrapper
+
+
 # Convenience helper for “fire-and-forget” logging
 _base_logger = get_logger("root")
 
@@ -66,6 +227,8 @@ def log(message: str, **fields: Any) -> None:
     Example:
         log("twilio.status", message_sid="SMxxx", status="delivered")
     """
+    if not _base_logger.isEnabledFor(logging.INFO):
+        return
     if fields:
         _base_logger.info(message, extra={"fields": fields})
     else:
@@ -0,0 +1,200 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# CloudWatch Embedded Metric Format (EMF): metrics are aggregated in memory
+# during an invocation and written once, as JSON log lines that CloudWatch
+# turns into metrics. No API calls, no extra latency on the request path.
+#
+# Configuration:
+#   POWERTOOLS_METRICS_NAMESPACE  CloudWatch namespace (unset = disabled)
+#   POWERTOOLS_SERVICE_NAME       "Service" dimension on every metric
+#   METRICS_ENABLED               set to "false" to turn emission off
+
+UNIT_COUNT = "Count"
+UNIT_MILLISECONDS = "Milliseconds"
+UNIT_NONE = "None"
+
+# EMF limits: at most 100 values per metric per document, 30 dimensions
+MAX_VALUES_PER_METRIC = 100
+
+_DimensionKey = Tuple[Tuple[str, str], ...]
+
+
+class Metrics:
+    """
+    Per-container metrics recorder; thread-safe, so concurrent worker sends
+    can record into it.
+
+      - count(name, n):      summed into a single value per flush
+      - gauge(name, value):  last value wins
+      - observe(name, ms):   every value kept (a latency distribution, so
+                             CloudWatch can compute p50/p99)
+      - timer(name):         context manager around observe()
+
+    Each call may add `dimensions` on top of the defaults (Service,
+    Function). flush() writes one EMF document per distinct dimension set.
+    """
+
+    enabled = True
+
+    def __init__(
+        self,
+        namespace: str,
+        function: str,
+        service: Optional[str] = None,
+        stream=None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.namespace = namespace
+        self.default_dimensions = {"Function": function}
+        if service:
+            self.default_dimensions["Service"] = service
+        self._stream = stream
+        self._clock = clock
+        self._lock = threading.Lock()
+        # dimension key -> metric name -> [unit, kind, value(s)]
+        self._groups: Dict[_DimensionKey, Dict[str, List[Any]]] = {}
+
+    def _metric(self, name: str, unit: str, kind: str, dimensions: Optional[Dict[str, str]]) -> List[Any]:
+        # Caller holds the lock
+        key: _DimensionKey = tuple(sorted(dimensions.items())) if dimensions else ()
+        group = self._groups.setdefault(key, {})
+        entry = group.get(name)
+        if entry is None:
+            entry = group[name] = [unit, kind, [] if kind == "observe" else 0]
+        return entry
+
+    def count(self, name: str, value: float = 1, dimensions: Optional[Dict[str, str]] = None) -> None:
+        with self._lock:
+            self._metric(name, UNIT_COUNT, "count", dimensions)[2] += value
+
+    def gauge(self, name: str, value: float, unit: str = UNIT_NONE,
+              dimensions: Optional[Dict[str, str]] = None) -> None:
+        with self._lock:
+            self._metric(name, unit, "gauge", dimensions)[2] = value
+
+    def observe(self, name: str, value: float, unit: str = UNIT_MILLISECONDS,
+                dimensions: Optional[Dict[str, str]] = None) -> None:
+        with self._lock:
+            self._metric(name, unit, "observe", dimensions)[2].append(value)
+
+    @contextmanager
+    def timer(self, name: str, dimensions: Optional[Dict[str, str]] = None) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - started) * 1000, dimensions=dimensions)
+
+    def _documents(self, groups: Dict[_DimensionKey, Dict[str, List[Any]]]) -> List[Dict[str, Any]]:
+        timestamp = int(self._clock() * 1000)
+        docs = []
+        for key, metrics in groups.items():
+            dimensions = dict(self.default_dimensions, **dict(key))
+            # Observations beyond 100 values spill into further documents
+            chunks = max(
+                [1] + [
+                    -(-len(v) // MAX_VALUES_PER_METRIC)
+                    for _, kind, v in metrics.values() if kind == "observe"
+                ]
+            )
+            for chunk in range(chunks):
+                doc: Dict[str, Any] = dict(dimensions)
+                definitions = []
+                for name, (unit, kind, value) in metrics.items():
+                    if kind == "observe":
+                        value = value[chunk * MAX_VALUES_PER_METRIC:(chunk + 1) * MAX_VALUES_PER_METRIC]
+                        if not value:
+                            continue
+                        value = [round(v, 3) for v in value]
+                    elif chunk:
+                        continue  # counters and gauges go in the first document only
+                    doc[name] = value
+                    definitions.append({"Name": name, "Unit": unit})
+                doc["_aws"] = {
+                    "Timestamp": timestamp,
+                    "CloudWatchMetrics": [
+                        {
+                            "Namespace": self.namespace,
+                            "Dimensions": [sorted(dimensions)],
+                            "Metrics": definitions,
+                        }
+                    ],
+                }
+                docs.append(doc)
+        return docs
+
+    def flush(self) -> None:
+        """
+        Write everything recorded since the last flush, in a single write,
+        and reset.
+        """
+        with self._lock:
+            groups, self._groups = self._groups, {}
+        if not groups:
+            return
+        lines = "\n".join(json.dumps(doc, separators=(",", ":")) for doc in self._documents(groups))
+        stream = self._stream or sys.stdout
+        stream.write(lines + "\n")
+        stream.flush()
+
+
+class NullMetrics:
+    """
+    Stand-in used when metrics are disabled: every call is a no-op.
+    """
+
+    enabled = False
+
+    def count(self, *args, **kwargs) -> None:
+        pass
+
+    def gauge(self, *args, **kwargs) -> None:
+        pass
+
+    def observe(self, *args, **kwargs) -> None:
+        pass
+
+    @contextmanager
+    def timer(self, *args, **kwargs) -> Iterator[None]:
+        yield
+
+    def flush(self) -> None:
+        pass
+
+
+def get_metrics(function: str):
+    """
+    Recorder for a handler module, or a NullMetrics when metrics are
+    disabled (no namespace configured, or METRICS_ENABLED=false).
+    """
+    namespace = os.getenv("POWERTOOLS_METRICS_NAMESPACE")
+    enabled = os.getenv("METRICS_ENABLED", "true").strip().lower() not in ("0", "false", "no", "off")
+    if not namespace or not enabled:
+        return NullMetrics()
+    return Metrics(namespace, function, service=os.getenv("POWERTOOLS_SERVICE_NAME"))
+
+
+def flush_metrics(metrics) -> Callable[[Callable], Callable]:
+    """
+    Decorator for Lambda handlers: flush `metrics` once per invocation,
+    however the handler exits.
+    """
+
+    def decorator(handler: Callable) -> Callable:
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            try:
+                return handler(event, context)
+            finally:
+                metrics.flush()
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,207 @@
+import functools
+import os
+import re
+import threading
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from utils.logger import get_logger
+
+logger = get_logger("phone")
+
+# Recipient numbers are normalized to E.164 ("+15555550123") at ingest, so
+# malformed numbers are rejected before they cost an SQS round-trip, a
+# worker invocation and Twilio retries, and everything downstream (rate
+# limits, coalescing, dedup) sees one spelling per recipient.
+#
+# Accepted input: E.164 with or without formatting ("+1 (555) 555-0123"),
+# the "00" international prefix, and national numbers for
+# PHONE_DEFAULT_COUNTRY_CODE (default 1: "555-555-0123", "15555550123").
+#
+# Optional offline line-type table (PHONE_LINE_TYPES_FILE), one
+# "<E.164 prefix>,<line type>" per line, longest prefix wins:
+#
+#   # generated from the carrier database export
+#   +1555555,mobile
+#   +1305306,landline
+#
+# Numbers whose line type is in PHONE_REJECT_LINE_TYPES (default
+# "landline,invalid") are rejected; other non-mobile types are accepted
+# but reported so ingest can flag them.
+
+# check() reasons
+INVALID_CHARACTERS = "invalid_characters"
+INVALID_LENGTH = "invalid_length"
+INVALID_COUNTRY_CODE = "invalid_country_code"
+INVALID_NANP = "invalid_nanp"
+UNSUPPORTED_LINE_TYPE = "unsupported_line_type"
+
+DEFAULT_CACHE_SIZE = 10000
+DEFAULT_REJECT_LINE_TYPES = "landline,invalid"
+MOBILE = "mobile"
+
+_FORMATTING = re.compile(r"[\s().\-/]")
+_E164 = re.compile(r"^\+[1-9]\d{7,14}$")
+# North American Numbering Plan: area code and exchange start with 2-9
+_NANP = re.compile(r"^\+1[2-9]\d{2}[2-9]\d{6}$")
+
+
+class InvalidPhone(ValueError):
+    """
+    A number that is not a valid (or acceptable) E.164 recipient. `reason`
+    is one of the check() reasons; `line_type` is set for
+    UNSUPPORTED_LINE_TYPE.
+    """
+
+    def __init__(self, reason: str, line_type: Optional[str] = None):
+        super().__init__(reason if line_type is None else f"{reason}: {line_type}")
+        self.reason = reason
+        self.line_type = line_type
+
+
+def normalize(raw: str, default_country_code: str = "1") -> str:
+    """
+    `raw` as E.164. Raises InvalidPhone.
+    """
+    number = _FORMATTING.sub("", raw)
+    if number.startswith("00"):
+        number = "+" + number[2:]
+    if not number.startswith("+"):
+        if not number.isdigit():
+            raise InvalidPhone(INVALID_CHARACTERS)
+        if default_country_code == "1" and len(number) == 11 and number.startswith("1"):
+            number = "+" + number
+        else:
+            number = f"+{default_country_code}{number}"
+
+    if not number[1:].isdigit():
+        raise InvalidPhone(INVALID_CHARACTERS)
+    if number.startswith("+0"):
+        raise InvalidPhone(INVALID_COUNTRY_CODE)
+    if not _E164.match(number):
+        raise InvalidPhone(INVALID_LENGTH)
+    if number.startswith("+1") and not _NANP.match(number):
+        raise InvalidPhone(INVALID_NANP)
+    return number
+
+
+class LineTypeTable:
+    """
+    Offline E.164 prefix → line type table, loaded once per container.
+    """
+
+    def __init__(self, prefixes: Dict[str, str]):
+        self.prefixes = prefixes
+        self._lengths = sorted({len(p) for p in prefixes}, reverse=True)
+
+    @classmethod
+    def load(cls, path: str) -> "LineTypeTable":
+        prefixes: Dict[str, str] = {}
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                prefix, _, line_type = line.partition(",")
+                if prefix.startswith("+") and line_type:
+                    prefixes[prefix.strip()] = line_type.strip().lower()
+        return cls(prefixes)
+
+    def lookup(self, number: str) -> Optional[str]:
+        for length in self._lengths:
+            line_type = self.prefixes.get(number[:length])
+            if line_type is not None:
+                return line_type
+        return None
+
+
+class PhoneValidator:
+    """
+    normalize() plus the line-type policy, behind an LRU of results (valid
+    and invalid alike), so a repeat number costs one dict lookup.
+    """
+
+    def __init__(
+        self,
+        default_country_code: str = "1",
+        line_types: Optional[LineTypeTable] = None,
+        reject_line_types: FrozenSet[str] = frozenset(DEFAULT_REJECT_LINE_TYPES.split(",")),
+        cache_size: int = DEFAULT_CACHE_SIZE,
+    ):
+        self.default_country_code = default_country_code
+        self.line_types = line_types
+        self.reject_line_types = reject_line_types
+        self._check = functools.lru_cache(maxsize=max(0, cache_size))(self._uncached)
+
+    def _uncached(self, raw: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        # (number, line type, rejection reason); exceptions aren't cached
+        # themselves, since re-raising one instance grows its traceback
+        try:
+            number = normalize(raw, self.default_country_code)
+        except InvalidPhone as e:
+            return None, None, e.reason
+        line_type = self.line_types.lookup(number) if self.line_types else None
+        if line_type in self.reject_line_types:
+            return None, line_type, UNSUPPORTED_LINE_TYPE
+        return number, line_type, None
+
+    def check(self, raw: str) -> Tuple[str, Optional[str]]:
+        """
+        (E.164 number, line type or None when unknown). Raises InvalidPhone.
+        """
+        number, line_type, reason = self._check(raw)
+        if reason is not None:
+            raise InvalidPhone(reason, line_type)
+        return number, line_type
+
+    def cache_info(self):
+        return self._check.cache_info()
+
+
+_validator: Optional[PhoneValidator] = None
+_validator_lock = threading.Lock()
+
+
+def from_env() -> PhoneValidator:
+    """
+    Build a PhoneValidator from environment variables:
+
+    PHONE_DEFAULT_COUNTRY_CODE: country code for national numbers (default 1)
+    PHONE_LINE_TYPES_FILE:      offline line-type table (default none)
+    PHONE_REJECT_LINE_TYPES:    line types to reject (default landline,invalid)
+    PHONE_CACHE_SIZE:           LRU of checked numbers (default 10000)
+    """
+    line_types = None
+    path = os.getenv("PHONE_LINE_TYPES_FILE")
+    if path:
+        try:
+            line_types = LineTypeTable.load(path)
+            logger.info("phone.line_types_loaded", extra={"path": path, "prefixes": len(line_types.prefixes)})
+        except OSError as e:
+            # Validate without it rather than reject every number
+            logger.error("phone.line_types_error", extra={"path": path, "error": str(e)})
+
+    reject = os.getenv("PHONE_REJECT_LINE_TYPES", DEFAULT_REJECT_LINE_TYPES)
+    return PhoneValidator(
+        default_country_code=(os.getenv("PHONE_DEFAULT_COUNTRY_CODE") or "1").lstrip("+"),
+        line_types=line_types,
+        reject_line_types=frozenset(t.strip().lower() for t in reject.split(",") if t.strip()),
+        cache_size=int(os.getenv("PHONE_CACHE_SIZE") or DEFAULT_CACHE_SIZE),
+    )
+
+
+def get_validator() -> PhoneValidator:
+    """
+    The container's validator, built from the environment on first use.
+    """
+    global _validator
+    if _validator is None:
+        with _validator_lock:
+            if _validator is None:
+                _validator = from_env()
+    return _validator
+
+
+def reset() -> None:
+    global _validator
+    with _validator_lock:
+        _validator = None
@@ -0,0 +1,232 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import boto3
+from botocore.exceptions import ClientError
+
+from utils.logger import get_logger
+
+logger = get_logger("rate_limit")
+
+GLOBAL_KEY = "ratelimit#global"
+PHONE_KEY_PREFIX = "ratelimit#phone#"
+
+# Optimistic-concurrency attempts for the DynamoDB store before giving up
+DYNAMODB_MAX_ATTEMPTS = 5
+
+
+class RateLimitExceeded(Exception):
+    """
+    Raised when a send cannot get a token within the allowed wait. Callers
+    should treat it as transient (e.g. report the record back to SQS).
+    """
+
+    def __init__(self, scope: str, retry_after: float):
+        super().__init__(f"rate limit exceeded ({scope}), retry after {retry_after:.2f}s")
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+class InMemoryTokenBucketStore:
+    """
+    Token buckets held in process memory. State is per container, so use
+    it for tests and local runs, or when a single container does all sends.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, rate: float, burst: float) -> float:
+        """
+        Take one token from bucket `key`. Returns 0 when granted, otherwise
+        the number of seconds until a token will be available.
+        """
+        with self._lock:
+            now = self._clock()
+            tokens, updated_at = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return 0.0
+
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / rate
+
+
+class DynamoDBTokenBucketStore:
+    """
+    Token buckets shared by every Lambda container through a DynamoDB table
+    keyed on `id` (with `expires_at` as its TTL attribute).
+
+    Each acquire is a consistent read followed by a conditional write on the
+    previous `updated_at`, retried on contention.
+    """
+
+    def __init__(self, table: str, client=None, clock: Callable[[], float] = time.time):
+        self.table = table
+        self._client = client
+        self._clock = clock
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = boto3.client("dynamodb")
+        return self._client
+
+    def acquire(self, key: str, rate: float, burst: float) -> float:
+        for _ in range(DYNAMODB_MAX_ATTEMPTS):
+            now = self._clock()
+            item = self.client.get_item(
+                TableName=self.table,
+                Key={"id": {"S": key}},
+                ConsistentRead=True,
+            ).get("Item")
+
+            if item:
+                previous = item["updated_at"]["N"]
+                tokens = float(item["tokens"]["N"])
+                tokens = min(burst, tokens + (now - float(previous)) * rate)
+            else:
+                previous = None
+                tokens = burst
+
+            if tokens < 1:
+                # No write needed: nothing changes until tokens refill
+                return (1 - tokens) / rate
+
+            condition = {"ConditionExpression": "attribute_not_exists(id)"}
+            if previous is not None:
+                condition = {
+                    "ConditionExpression": "updated_at = :prev",
+                    "ExpressionAttributeValues": {":prev": {"N": previous}},
+                }
+
+            try:
+                self.client.put_item(
+                    TableName=self.table,
+                    Item={
+                        "id": {"S": key},
+                        "tokens": {"N": repr(tokens - 1)},
+                        "updated_at": {"N": repr(now)},
+                        # Idle buckets are full again after burst / rate seconds
+                        "expires_at": {"N": str(int(now + burst / rate) + 60)},
+                    },
+                    **condition,
+                )
+                return 0.0
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise
+                # Another container took a token first; re-read and retry
+
+        return 1 / rate
+
+
+class RateLimiter:
+    """
+    Throughput control in front of Twilio sends.
+
+      - Global bucket (`global_rate` tokens/s, `global_burst`) matched to
+        the Messaging Service MPS. acquire() waits up to `max_wait` seconds
+        for a token before giving up.
+      - Per-recipient bucket (`phone_rate` tokens/s, `phone_burst`) that
+        stops bursts to a single number. It never waits: a recipient over
+        its limit is deferred.
+
+    Either limit can be disabled by leaving its rate unset. `global_key`
+    names the global bucket; lanes with their own key get a reserved share
+    of the MPS instead of competing for one bucket.
+    """
+
+    def __init__(
+        self,
+        store,
+        global_rate: Optional[float] = None,
+        global_burst: Optional[float] = None,
+        phone_rate: Optional[float] = None,
+        phone_burst: Optional[float] = None,
+        max_wait: float = 0.0,
+        sleep: Callable[[float], None] = time.sleep,
+        global_key: str = GLOBAL_KEY,
+    ):
+        self.store = store
+        self.global_key = global_key
+        self.global_rate = global_rate
+        self.global_burst = global_burst or global_rate
+        self.phone_rate = phone_rate
+        self.phone_burst = phone_burst or 1
+        self.max_wait = max_wait
+        self._sleep = sleep
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.global_rate or self.phone_rate)
+
+    def acquire(self, phone: Optional[str] = None, max_wait: Optional[float] = None) -> None:
+        """
+        Block until the send may proceed, or raise RateLimitExceeded.
+        `max_wait` overrides the limiter's own wait budget for this call.
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        if self.phone_rate and phone:
+            wait = self.store.acquire(PHONE_KEY_PREFIX + phone, self.phone_rate, self.phone_burst)
+            if wait > 0:
+                raise RateLimitExceeded("phone", wait)
+
+        if self.global_rate:
+            waited = 0.0
+            while True:
+                wait = self.store.acquire(self.global_key, self.global_rate, self.global_burst)
+                if wait <= 0:
+                    return
+                if waited + wait > max_wait:
+                    raise RateLimitExceeded("global", wait)
+                self._sleep(wait)
+                waited += wait
+
+
+def _env_float(name: str) -> Optional[float]:
+    raw = os.getenv(name)
+    if not raw:
+        return None
+    try:
+        value = float(raw)
+    except ValueError:
+        logger.warning("rate_limit.invalid_setting", extra={"env_var": name, "value": raw})
+        return None
+    return value if value > 0 else None
+
+
+def from_env() -> RateLimiter:
+    """
+    Build a RateLimiter from environment variables:
+
+    RATE_LIMIT_GLOBAL_PER_SECOND: global sends per second (unset = off)
+    RATE_LIMIT_GLOBAL_BURST:      global bucket size (default: the rate)
+    RATE_LIMIT_PHONE_PER_MINUTE:  sends per recipient per minute (unset = off)
+    RATE_LIMIT_PHONE_BURST:       per-recipient bucket size (default 1)
+    RATE_LIMIT_MAX_WAIT_SECONDS:  how long a send may wait for a global token
+    RATE_LIMIT_TABLE:             DynamoDB table for shared state; without it
+                                  buckets are per container
+    RATE_LIMIT_SCOPE:             separate global bucket for this scope (e.g.
+                                  a priority lane); unset = the shared one
+    """
+    phone_per_minute = _env_float("RATE_LIMIT_PHONE_PER_MINUTE")
+    table = os.getenv("RATE_LIMIT_TABLE")
+    scope = os.getenv("RATE_LIMIT_SCOPE")
+    store = DynamoDBTokenBucketStore(table) if table else InMemoryTokenBucketStore()
+
+    return RateLimiter(
+        store,
+        global_rate=_env_float("RATE_LIMIT_GLOBAL_PER_SECOND"),
+        global_burst=_env_float("RATE_LIMIT_GLOBAL_BURST"),
+        phone_rate=phone_per_minute / 60 if phone_per_minute else None,
+        phone_burst=_env_float("RATE_LIMIT_PHONE_BURST"),
+        max_wait=_env_float("RATE_LIMIT_MAX_WAIT_SECONDS") or 0.0,
+        global_key=f"{GLOBAL_KEY}#{scope}" if scope else GLOBAL_KEY,
+    )
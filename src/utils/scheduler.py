@@ -0,0 +1,393 @@
+import math
+import os
+import threading
+import time
+import uuid
+import zlib
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from utils.concurrency import bounded_map
+from utils.logger import get_logger
+from utils.sqs_batch import SQS_MAX_DELAY_SECONDS
+
+logger = get_logger("scheduler")
+
+# Scheduled sends are indexed by time bucket, so the dispatcher only ever
+# reads buckets that are due instead of scanning everything pending.
+#
+# Item layout (ScheduleTable in template.yaml):
+#   bucket       (S) partition key "<bucket start epoch>#<shard>"
+#   sk           (S) sort key "<send_at epoch ms, 13 digits>#<schedule_id>"
+#   schedule_id  (S) event_id of the message (random when it has none)
+#   send_at      (N) epoch seconds
+#   body         (S) Worker message, exactly as it will be enqueued
+#   queue_url    (S) optional target queue (dispatcher default otherwise)
+#   expires_at   (N) TTL, a safety net for items a failed delete left behind
+#
+# Each bucket is split over `shards` partitions so a busy minute is not a
+# hot key. The dispatcher's progress is a single cursor item.
+CURSOR_KEY = "cursor"
+
+DEFAULT_BUCKET_SECONDS = 60
+DEFAULT_SHARDS = 8
+DEFAULT_LOOKAHEAD_SECONDS = 60
+DEFAULT_MAX_BUCKETS_PER_RUN = 60
+DEFAULT_MAX_DELAY_SECONDS = 30 * 86400
+EXPIRE_AFTER_SECONDS = 7 * 86400
+
+# DynamoDB BatchWriteItem accepts at most 25 requests per call
+DELETE_BATCH_LIMIT = 25
+DELETE_MAX_ATTEMPTS = 3
+
+# Sorts after any "#<schedule_id>" suffix, so `sk <= <ms>#END` covers a whole ms
+_SORT_KEY_END = "\uffff"
+
+
+def _sort_key(send_at: float, schedule_id: str) -> str:
+    return f"{int(send_at * 1000):013d}#{schedule_id}"
+
+
+class InMemoryScheduleStore:
+    """
+    Schedule index held in process memory, for tests and local runs. Same
+    interface as DynamoDBScheduleStore.
+    """
+
+    def __init__(self, page_size: int = 100):
+        self.page_size = page_size
+        self._partitions: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._cursor: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def put(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._partitions.setdefault(entry["partition"], {})[entry["sort_key"]] = dict(entry)
+
+    def due(self, partition: str, until_sort_key: str) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Pages of entries in `partition` with sort key <= `until_sort_key`,
+        in send order.
+        """
+        with self._lock:
+            items = self._partitions.get(partition, {})
+            keys = sorted(k for k in items if k <= until_sort_key)
+            entries = [dict(items[k]) for k in keys]
+        for i in range(0, len(entries), self.page_size):
+            yield entries[i:i + self.page_size]
+
+    def delete(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Remove entries; returns the ones that could not be removed.
+        """
+        with self._lock:
+            for entry in entries:
+                self._partitions.get(entry["partition"], {}).pop(entry["sort_key"], None)
+        return []
+
+    def get_cursor(self) -> Optional[int]:
+        return self._cursor
+
+    def set_cursor(self, bucket: int) -> None:
+        self._cursor = bucket
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(len(items) for items in self._partitions.values())
+
+
+class DynamoDBScheduleStore:
+    """
+    Schedule index in a DynamoDB table keyed on (`bucket`, `sk`), with
+    `expires_at` as its TTL attribute.
+    """
+
+    def __init__(self, table: str, client=None):
+        self.table = table
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+
+            self._client = boto3.client("dynamodb")
+        return self._client
+
+    def put(self, entry: Dict[str, Any]) -> None:
+        item = {
+            "bucket": {"S": entry["partition"]},
+            "sk": {"S": entry["sort_key"]},
+            "schedule_id": {"S": entry["schedule_id"]},
+            "send_at": {"N": repr(entry["send_at"])},
+            "body": {"S": entry["body"]},
+            "expires_at": {"N": str(int(entry["send_at"]) + EXPIRE_AFTER_SECONDS)},
+        }
+        if entry.get("queue_url"):
+            item["queue_url"] = {"S": entry["queue_url"]}
+        self.client.put_item(TableName=self.table, Item=item)
+
+    def due(self, partition: str, until_sort_key: str) -> Iterator[List[Dict[str, Any]]]:
+        kwargs: Dict[str, Any] = {
+            "TableName": self.table,
+            # BUCKET is a DynamoDB reserved word
+            "KeyConditionExpression": "#b = :b AND sk <= :until",
+            "ExpressionAttributeNames": {"#b": "bucket"},
+            "ExpressionAttributeValues": {":b": {"S": partition}, ":until": {"S": until_sort_key}},
+            "ConsistentRead": True,
+        }
+        while True:
+            resp = self.client.query(**kwargs)
+            items = resp.get("Items", [])
+            if items:
+                yield [
+                    {
+                        "partition": item["bucket"]["S"],
+                        "sort_key": item["sk"]["S"],
+                        "schedule_id": item["schedule_id"]["S"],
+                        "send_at": float(item["send_at"]["N"]),
+                        "body": item["body"]["S"],
+                        "queue_url": item.get("queue_url", {}).get("S"),
+                    }
+                    for item in items
+                ]
+            if not resp.get("LastEvaluatedKey"):
+                return
+            kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+    def delete(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        by_key = {(e["partition"], e["sort_key"]): e for e in entries}
+        leftover: List[Dict[str, Any]] = []
+        for i in range(0, len(entries), DELETE_BATCH_LIMIT):
+            requests = [
+                {"DeleteRequest": {"Key": {"bucket": {"S": e["partition"]}, "sk": {"S": e["sort_key"]}}}}
+                for e in entries[i:i + DELETE_BATCH_LIMIT]
+            ]
+            for attempt in range(DELETE_MAX_ATTEMPTS):
+                resp = self.client.batch_write_item(RequestItems={self.table: requests})
+                requests = (resp.get("UnprocessedItems") or {}).get(self.table, [])
+                if not requests:
+                    break
+                time.sleep(0.05 * (2 ** attempt))
+            for request in requests:
+                key = request["DeleteRequest"]["Key"]
+                leftover.append(by_key[(key["bucket"]["S"], key["sk"]["S"])])
+        return leftover
+
+    def get_cursor(self) -> Optional[int]:
+        item = self.client.get_item(
+            TableName=self.table,
+            Key={"bucket": {"S": CURSOR_KEY}, "sk": {"S": CURSOR_KEY}},
+            ConsistentRead=True,
+        ).get("Item")
+        return int(item["next_bucket"]["N"]) if item else None
+
+    def set_cursor(self, bucket: int) -> None:
+        self.client.put_item(
+            TableName=self.table,
+            Item={
+                "bucket": {"S": CURSOR_KEY},
+                "sk": {"S": CURSOR_KEY},
+                "next_bucket": {"N": str(bucket)},
+                "updated_at": {"N": str(int(time.time()))},
+            },
+        )
+
+
+class Scheduler:
+    """
+    Future sends beyond SQS's 15-minute DelaySeconds cap.
+
+      - schedule(): ingest stores the message under the bucket of its send
+        time (`bucket_seconds` wide, spread over `shards` partitions).
+      - dispatch(): run periodically. Starting at the cursor, it reads
+        every bucket that is due within `lookahead_seconds`, hands the due
+        messages to `enqueue` with the DelaySeconds still left before their
+        send time, and deletes what was enqueued. The cursor only moves past
+        a bucket once that bucket is fully due and fully drained, so a
+        failed enqueue is picked up again on the next run.
+
+    A message may be enqueued twice if a run fails between enqueue and
+    delete; the Worker's idempotency claim on event_id covers that.
+    """
+
+    def __init__(
+        self,
+        store,
+        bucket_seconds: int = DEFAULT_BUCKET_SECONDS,
+        shards: int = DEFAULT_SHARDS,
+        lookahead_seconds: int = DEFAULT_LOOKAHEAD_SECONDS,
+        max_buckets_per_run: int = DEFAULT_MAX_BUCKETS_PER_RUN,
+        max_delay_seconds: int = DEFAULT_MAX_DELAY_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.store = store
+        self.bucket_seconds = max(1, int(bucket_seconds))
+        self.shards = max(1, int(shards))
+        # Anything inside the lookahead must still fit in one SQS delay
+        self.lookahead_seconds = min(max(0, int(lookahead_seconds)), SQS_MAX_DELAY_SECONDS)
+        self.max_buckets_per_run = max(1, int(max_buckets_per_run))
+        self.max_delay_seconds = max_delay_seconds
+        self._clock = clock
+
+    def bucket_for(self, send_at: float) -> int:
+        return int(send_at // self.bucket_seconds) * self.bucket_seconds
+
+    def partition(self, bucket: int, shard: int) -> str:
+        return f"{bucket}#{shard}"
+
+    def schedule(
+        self,
+        body: str,
+        send_at: float,
+        schedule_id: Optional[str] = None,
+        queue_url: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Store a message to be enqueued at `send_at` (epoch seconds).
+
+        Re-scheduling the same `schedule_id` for the same time overwrites the
+        earlier entry, so client retries don't pile up. Raises ValueError for
+        send times more than `max_delay_seconds` away, and for ones so close
+        that their bucket may already be behind the dispatcher's cursor
+        (those fit in an SQS delay anyway).
+        """
+        delay = send_at - self._clock()
+        if delay > self.max_delay_seconds:
+            raise ValueError(f"send_at is more than {self.max_delay_seconds}s in the future")
+        if delay <= self.lookahead_seconds + self.bucket_seconds:
+            raise ValueError("send_at is too close to schedule; enqueue it with DelaySeconds")
+
+        schedule_id = schedule_id or uuid.uuid4().hex
+        # crc32 rather than hash(): shards must agree across processes
+        shard = zlib.crc32(schedule_id.encode("utf-8")) % self.shards
+        entry = {
+            "partition": self.partition(self.bucket_for(send_at), shard),
+            "sort_key": _sort_key(send_at, schedule_id),
+            "schedule_id": schedule_id,
+            "send_at": send_at,
+            "body": body,
+            "queue_url": queue_url,
+        }
+        self.store.put(entry)
+        return entry
+
+    def _drain(
+        self,
+        partition: str,
+        until_sort_key: str,
+        now: float,
+        enqueue: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        stats = {"due": 0, "dispatched": 0, "failed": 0, "undeleted": 0, "max_lag_seconds": 0.0}
+        for page in self.store.due(partition, until_sort_key):
+            for entry in page:
+                entry["delay_seconds"] = min(SQS_MAX_DELAY_SECONDS, max(0, math.ceil(entry["send_at"] - now)))
+                stats["max_lag_seconds"] = max(stats["max_lag_seconds"], now - entry["send_at"])
+            failed = enqueue(page)
+            failed_keys = {e["sort_key"] for e in failed}
+            sent = [e for e in page if e["sort_key"] not in failed_keys]
+            undeleted = self.store.delete(sent) if sent else []
+
+            stats["due"] += len(page)
+            stats["dispatched"] += len(sent)
+            stats["failed"] += len(failed)
+            stats["undeleted"] += len(undeleted)
+        return stats
+
+    def dispatch(
+        self,
+        enqueue: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]],
+        deadline: Optional[float] = None,
+        max_workers: int = DEFAULT_SHARDS,
+    ) -> Dict[str, Any]:
+        """
+        Enqueue everything due within the lookahead window.
+
+        `enqueue(entries)` receives a page of due entries (each with a
+        `delay_seconds`) and returns the entries it could not enqueue.
+        Shards of a bucket are drained in parallel; no new bucket is started
+        after `deadline` (epoch seconds).
+        """
+        now = self._clock()
+        horizon = now + self.lookahead_seconds
+        until_sort_key = f"{int(horizon * 1000):013d}#{_SORT_KEY_END}"
+
+        cursor = self.store.get_cursor()
+        bucket = cursor if cursor is not None else self.bucket_for(now)
+        last_bucket = self.bucket_for(horizon)
+
+        totals: Dict[str, Any] = {
+            "buckets": 0, "due": 0, "dispatched": 0, "failed": 0, "undeleted": 0, "max_lag_seconds": 0.0,
+        }
+        next_cursor = bucket
+        advancing = True
+
+        while bucket <= last_bucket and totals["buckets"] < self.max_buckets_per_run:
+            if deadline is not None and self._clock() >= deadline:
+                break
+            partitions = [self.partition(bucket, shard) for shard in range(self.shards)]
+            results = bounded_map(
+                lambda p: self._drain(p, until_sort_key, now, enqueue),
+                partitions,
+                min(max_workers, self.shards),
+            )
+            for stats in results:
+                for key, value in stats.items():
+                    totals[key] = max(totals[key], value) if key == "max_lag_seconds" else totals[key] + value
+            totals["buckets"] += 1
+
+            drained = all(stats["failed"] == 0 and stats["undeleted"] == 0 for stats in results)
+            fully_due = bucket + self.bucket_seconds <= horizon
+            if advancing and drained and fully_due:
+                next_cursor = bucket + self.bucket_seconds
+            else:
+                advancing = False
+            bucket += self.bucket_seconds
+
+        if next_cursor != cursor:
+            self.store.set_cursor(next_cursor)
+
+        totals["cursor"] = next_cursor
+        totals["behind_seconds"] = max(0.0, now - next_cursor)
+        totals["max_lag_seconds"] = round(totals["max_lag_seconds"], 3)
+        return totals
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name)
+    if not raw:
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        logger.warning("scheduler.invalid_setting", extra={"env_var": name, "value": raw})
+        return default
+    return value if value > 0 else default
+
+
+def from_env() -> Optional[Scheduler]:
+    """
+    Build a Scheduler backed by DynamoDB from environment variables, or
+    None when SCHEDULE_TABLE is unset (scheduling beyond SQS's 15-minute
+    delay is then unavailable):
+
+    SCHEDULE_TABLE:                     DynamoDB table for the schedule index
+    SCHEDULE_BUCKET_SECONDS:            time bucket width (default 60)
+    SCHEDULE_SHARDS:                    partitions per bucket (default 8)
+    SCHEDULE_LOOKAHEAD_SECONDS:         how far ahead the dispatcher enqueues (default 60)
+    SCHEDULE_MAX_BUCKETS_PER_RUN:       catch-up limit per dispatcher run (default 60)
+    SCHEDULE_MAX_DELAY_SECONDS:         furthest accepted send time (default 30 days)
+
+    Ingest and the dispatcher must agree on the bucket width and shards.
+    """
+    table = os.getenv("SCHEDULE_TABLE")
+    if not table:
+        return None
+    return Scheduler(
+        DynamoDBScheduleStore(table),
+        bucket_seconds=_env_int("SCHEDULE_BUCKET_SECONDS", DEFAULT_BUCKET_SECONDS),
+        shards=_env_int("SCHEDULE_SHARDS", DEFAULT_SHARDS),
+        lookahead_seconds=_env_int("SCHEDULE_LOOKAHEAD_SECONDS", DEFAULT_LOOKAHEAD_SECONDS),
+        max_buckets_per_run=_env_int("SCHEDULE_MAX_BUCKETS_PER_RUN", DEFAULT_MAX_BUCKETS_PER_RUN),
+        max_delay_seconds=_env_int("SCHEDULE_MAX_DELAY_SECONDS", DEFAULT_MAX_DELAY_SECONDS),
+    )
@@ -0,0 +1,296 @@
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from utils.phone import UNSUPPORTED_LINE_TYPE, InvalidPhone, get_validator as phone_validator
+
+try:  # Optional fast JSON codec; the stdlib one is the fallback
+    import orjson  # type: ignore[import-not-found]
+except ImportError:  # pragma: no cover - depends on the deployment package
+    orjson = None
+
+# ---------------------------------------------------------------------------
+# Message contract
+# ---------------------------------------------------------------------------
+# SmsEvent       what clients POST to /sms (one event, or one item of a batch)
+# WorkerMessage  what ingest (and the dispatcher / DLQ replay) put on the lane
+#                queues and the Worker consumes:
+#
+#   {"event_id": str|null, "event": str, "user": {"phone": str},
+#    "amount": number|null, "advance_id"?: str, "due_at_ms"?: int}
+#
+# Each side is checked once, up front, by a validator compiled from the field
+# table below, so malformed messages are rejected before any network I/O.
+
+IN_TRANSIT_EVENT = "advance_in_transit"
+
+# Event types clients may send (the Worker also renders internal ones, e.g.
+# coalesced events)
+EVENT_TYPES = frozenset({IN_TRANSIT_EVENT, "advance_approved"})
+
+# InvalidMessage.error codes
+ERROR_INVALID_JSON = "invalid_json"
+ERROR_MISSING_FIELDS = "missing_required_fields"
+ERROR_INVALID_FIELDS = "invalid_fields"
+ERROR_UNSUPPORTED_EVENT = "unsupported_event"
+ERROR_INVALID_SEND_AT = "invalid_send_at"
+ERROR_INVALID_PHONE = "invalid_phone"
+ERROR_UNSUPPORTED_LINE_TYPE = UNSUPPORTED_LINE_TYPE
+
+_NUMBER = (int, float)
+
+
+if orjson is not None:
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers
+    # catch the same exception either way
+    loads = orjson.loads
+
+    def dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode()
+else:
+    loads = json.loads
+    # One reusable encoder instead of json.dumps() building one per call
+    dumps = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False).encode
+
+
+class InvalidMessage(ValueError):
+    """
+    A payload that breaks the message contract. `error` is the code reported
+    to clients and logged; `fields` names the offending fields.
+    """
+
+    def __init__(self, error: str, fields: Sequence[str] = (), event_id: Optional[str] = None):
+        super().__init__(f"{error}: {', '.join(fields)}" if fields else error)
+        self.error = error
+        self.fields = list(fields)
+        self.event_id = event_id
+
+
+# (field, path, accepted types, required). bool is an int subclass and is
+# never a valid number or string here.
+_Field = Tuple[str, Tuple[str, ...], tuple, bool]
+
+
+def _compile(fields: Sequence[Tuple[str, tuple, bool]]):
+    """
+    Build a validator for a field table. Returns a function mapping a payload
+    dict to (values, missing, invalid), with dotted names ("user.phone")
+    looked up through nested objects.
+    """
+    table: List[_Field] = [(name, tuple(name.split(".")), types, required) for name, types, required in fields]
+
+    def validate(payload: Dict[str, Any]):
+        values: Dict[str, Any] = {}
+        missing: List[str] = []
+        invalid: List[str] = []
+        for name, path, types, required in table:
+            value: Any = payload
+            for part in path:
+                value = value.get(part) if isinstance(value, dict) else None
+            if value is None or value == "":
+                if required:
+                    missing.append(name)
+                values[name] = None
+            elif isinstance(value, bool) or not isinstance(value, types):
+                invalid.append(name)
+                values[name] = None
+            else:
+                values[name] = value
+        return values, missing, invalid
+
+    return validate
+
+
+_validate_worker_message = _compile(
+    [
+        ("event_id", (str,), False),
+        ("event", (str,), True),
+        ("user.phone", (str,), True),
+        ("amount", _NUMBER, False),
+        ("advance_id", (str,), False),
+        ("due_at_ms", (int,), False),
+    ]
+)
+
+_validate_event = _compile(
+    [
+        ("event_id", (str,), False),
+        ("event", (str,), True),
+        ("user.phone", (str,), True),
+        ("amount", _NUMBER, False),
+        ("advance_id", (str,), False),
+        ("send_at", (str, int, float), False),
+    ]
+)
+
+
+class WorkerMessage:
+    """
+    One SMS for the Worker to send.
+    """
+
+    __slots__ = ("event_id", "event", "phone", "amount", "advance_id", "due_at_ms")
+
+    def __init__(
+        self,
+        event_id: Optional[str],
+        event: str,
+        phone: str,
+        amount: Optional[float] = None,
+        advance_id: Optional[str] = None,
+        due_at_ms: Optional[int] = None,
+    ):
+        self.event_id = event_id
+        self.event = event
+        self.phone = phone
+        self.amount = amount
+        self.advance_id = advance_id
+        self.due_at_ms = due_at_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Wire format (also what templates and coalescing work on).
+        """
+        msg: Dict[str, Any] = {
+            "event_id": self.event_id,
+            "event": self.event,
+            "user": {"phone": self.phone},
+            "amount": self.amount,
+        }
+        if self.advance_id:
+            msg["advance_id"] = self.advance_id
+        if self.due_at_ms is not None:
+            msg["due_at_ms"] = self.due_at_ms
+        return msg
+
+    def encode(self) -> str:
+        return dumps(self.to_dict())
+
+
+class SmsEvent:
+    """
+    One validated client event.
+    """
+
+    __slots__ = ("event_id", "event", "phone", "amount", "advance_id", "send_at", "send_in_transit_now", "line_type")
+
+    def __init__(
+        self,
+        event_id: Optional[str],
+        event: str,
+        phone: str,
+        amount: Optional[float] = None,
+        advance_id: Optional[str] = None,
+        send_at: Optional[float] = None,
+        send_in_transit_now: bool = False,
+        line_type: Optional[str] = None,
+    ):
+        self.event_id = event_id
+        self.event = event
+        self.phone = phone
+        self.amount = amount
+        self.advance_id = advance_id
+        self.send_at = send_at
+        self.send_in_transit_now = send_in_transit_now
+        # From the offline line-type table (utils.phone), None if unknown
+        self.line_type = line_type
+
+    def worker_message(self) -> WorkerMessage:
+        return WorkerMessage(self.event_id, self.event, self.phone, self.amount, self.advance_id)
+
+
+def parse_send_at(raw: Any) -> Optional[float]:
+    """
+    `send_at` as epoch seconds.
+
+    Accepts epoch seconds or an ISO-8601 timestamp with a UTC offset, so
+    callers can ask for e.g. 9am recipient local time
+    ("2026-03-02T09:00:00-05:00"). Raises ValueError if it is malformed.
+    """
+    if raw is None:
+        return None
+    if isinstance(raw, _NUMBER) and not isinstance(raw, bool):
+        return float(raw)
+    if isinstance(raw, str):
+        parsed = datetime.fromisoformat(raw)
+        if parsed.tzinfo is None:
+            raise ValueError("send_at needs a UTC offset")
+        return parsed.timestamp()
+    raise ValueError("send_at must be epoch seconds or an ISO-8601 timestamp")
+
+
+def parse_event(payload: Any) -> SmsEvent:
+    """
+    Validate a client event. Raises InvalidMessage, checking (in order)
+    missing fields, field types, the event type, the phone number and
+    `send_at`. `phone` comes back normalized to E.164.
+
+    `amount` is required for everything but the in-transit SMS, which has an
+    amount-less variant.
+    """
+    if not isinstance(payload, dict):
+        raise InvalidMessage(ERROR_MISSING_FIELDS, ["event", "user.phone", "amount"])
+
+    values, missing, invalid = _validate_event(payload)
+    event_id = values["event_id"]
+    if values["amount"] is None and "amount" not in invalid and values["event"] != IN_TRANSIT_EVENT:
+        missing.append("amount")
+    if missing:
+        raise InvalidMessage(ERROR_MISSING_FIELDS, missing, event_id)
+    if invalid:
+        raise InvalidMessage(ERROR_INVALID_FIELDS, invalid, event_id)
+    if values["event"] not in EVENT_TYPES:
+        raise InvalidMessage(ERROR_UNSUPPORTED_EVENT, ["event"], event_id)
+    try:
+        phone, line_type = phone_validator().check(values["user.phone"])
+    except InvalidPhone as e:
+        error = ERROR_UNSUPPORTED_LINE_TYPE if e.reason == UNSUPPORTED_LINE_TYPE else ERROR_INVALID_PHONE
+        raise InvalidMessage(error, ["user.phone"], event_id) from None
+    try:
+        send_at = parse_send_at(values["send_at"])
+    except ValueError:
+        raise InvalidMessage(ERROR_INVALID_SEND_AT, ["send_at"], event_id) from None
+
+    return SmsEvent(
+        event_id,
+        values["event"],
+        phone,
+        values["amount"],
+        values["advance_id"],
+        send_at,
+        bool(payload.get("send_in_transit_now")),
+        line_type,
+    )
+
+
+def worker_message_from_dict(msg: Any) -> WorkerMessage:
+    """
+    Validate a decoded Worker message. Raises InvalidMessage.
+    """
+    if not isinstance(msg, dict):
+        raise InvalidMessage(ERROR_INVALID_FIELDS, ["<root>"])
+    values, missing, invalid = _validate_worker_message(msg)
+    if missing:
+        raise InvalidMessage(ERROR_MISSING_FIELDS, missing, values["event_id"])
+    if invalid:
+        raise InvalidMessage(ERROR_INVALID_FIELDS, invalid, values["event_id"])
+    return WorkerMessage(
+        values["event_id"],
+        values["event"],
+        values["user.phone"],
+        values["amount"],
+        values["advance_id"],
+        values["due_at_ms"],
+    )
+
+
+def decode_worker_message(raw: Union[str, bytes]) -> WorkerMessage:
+    """
+    Parse and validate an SQS message body. Raises InvalidMessage (with
+    ERROR_INVALID_JSON for bodies that are not JSON).
+    """
+    try:
+        msg = loads(raw)
+    except (json.JSONDecodeError, TypeError):
+        raise InvalidMessage(ERROR_INVALID_JSON) from None
+    return worker_message_from_dict(msg)
@@ -1,12 +1,24 @@
 import os
 import json
 
-import boto3
-
 from utils.logger import get_logger
 
 logger = get_logger("secrets")
 
+# Secrets Manager client, created on first use and reused across invocations
+_client = None
+_client_region = None
+
+
+def _get_client(region_name: str):
+    global _client, _client_region
+    if _client is None or _client_region != region_name:
+        import boto3  # deferred: only the Twilio send path reads secrets
+
+        _client = boto3.client("secretsmanager", region_name=region_name)
+        _client_region = region_name
+    return _client
+
 
 def _get_secret_name_and_region() -> tuple[str, str]:
     """
@@ -51,7 +63,7 @@ def get_twilio_secrets() -> dict:
     )
 
     # Ensure client is created for the correct region
-    client = boto3.client("secretsmanager", region_name=region_name)
+    client = _get_client(region_name)
 
     resp = client.get_secret_value(SecretId=secret_name)
     secret_str = resp.get("SecretString")
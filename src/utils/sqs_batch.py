@@ -0,0 +1,86 @@
+import random
+import time
+from typing import Dict, List
+
+from utils.logger import get_logger
+
+logger = get_logger("sqs_batch")
+
+# SQS SendMessageBatch accepts at most 10 entries per call
+SQS_BATCH_LIMIT = 10
+
+# SQS caps DelaySeconds at 15 minutes; later sends need the scheduler
+SQS_MAX_DELAY_SECONDS = 900
+
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_BASE_SECONDS = 0.05
+
+
+def chunks(entries: List[dict], size: int = SQS_BATCH_LIMIT) -> List[List[dict]]:
+    return [entries[i:i + size] for i in range(0, len(entries), size)]
+
+
+def send_message_batch(
+    client,
+    queue_url: str,
+    entries: List[dict],
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    retry_base_seconds: float = DEFAULT_RETRY_BASE_SECONDS,
+    metrics=None,
+) -> Dict[str, dict]:
+    """
+    Enqueue up to SQS_BATCH_LIMIT entries (each with an "Id") with
+    SendMessageBatch.
+
+    Entries that fail on the SQS side (SenderFault=false) or because the call
+    itself raised are retried with jittered exponential backoff, up to
+    `max_attempts`. Sender faults are not retried.
+
+    Returns a mapping of entry Id -> {"status": "queued", "message_id": ...}
+    or {"status": "failed", "error": ...}.
+    """
+    outcomes: Dict[str, dict] = {}
+    pending = entries
+    last_error = "queue_failure"
+
+    for attempt in range(1, max_attempts + 1):
+        if attempt > 1 and metrics is not None:
+            metrics.count("SqsEnqueueRetries", len(pending))
+        try:
+            if metrics is not None:
+                with metrics.timer("SqsEnqueueLatency"):
+                    resp = client.send_message_batch(QueueUrl=queue_url, Entries=pending)
+            else:
+                resp = client.send_message_batch(QueueUrl=queue_url, Entries=pending)
+        except Exception as e:
+            logger.warning(
+                "sqs.batch_enqueue_error",
+                extra={"error": str(e), "attempt": attempt, "entries": len(pending), "queue_url": queue_url},
+            )
+            last_error = "queue_failure"
+            retry_ids = {entry["Id"] for entry in pending}
+        else:
+            for ok in resp.get("Successful", []):
+                outcomes[ok["Id"]] = {"status": "queued", "message_id": ok.get("MessageId")}
+
+            retry_ids = set()
+            for failed in resp.get("Failed", []):
+                if failed.get("SenderFault"):
+                    outcomes[failed["Id"]] = {"status": "failed", "error": failed.get("Code")}
+                else:
+                    retry_ids.add(failed["Id"])
+                    last_error = failed.get("Code") or "queue_failure"
+
+        pending = [entry for entry in pending if entry["Id"] in retry_ids]
+        if not pending:
+            break
+
+        if attempt < max_attempts:
+            backoff = retry_base_seconds * (2 ** (attempt - 1))
+            time.sleep(backoff + random.uniform(0, backoff))
+
+    for entry in pending:
+        outcomes[entry["Id"]] = {"status": "failed", "error": last_error}
+
+    return outcomes
+
@@ -0,0 +1,169 @@
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from utils.logger import get_logger
+
+logger = get_logger("status_store")
+
+# Item layout (DeliveryStatusTable in template.yaml):
+#   message_sid  (S) partition key
+#   event_id     (S) our envelope id; indexed by EVENT_ID_INDEX
+#   status       (S) latest Twilio MessageStatus
+#   status_rank  (N) position of `status` in the delivery lifecycle
+#   <status>_at  (N) epoch seconds the callback for that status arrived
+#   error_code   (S) Twilio ErrorCode, when present
+#   updated_at   (N), expires_at (N, TTL)
+EVENT_ID_INDEX = "event_id-index"
+DEFAULT_TTL_SECONDS = 30 * 86400
+
+# Twilio statuses in lifecycle order. Writes are conditional on moving
+# forward, so a late "sent" never overwrites "delivered".
+STATUS_RANK = {
+    "accepted": 0,
+    "scheduled": 0,
+    "queued": 1,
+    "sending": 2,
+    "sent": 3,
+    "undelivered": 4,
+    "failed": 4,
+    "delivered": 5,
+    "read": 6,
+    "canceled": 6,
+}
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _table() -> Optional[str]:
+    return os.getenv("STATUS_TABLE")
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                # Deferred so /status (which imports this module for its GET
+                # route) doesn't load boto3 on the callback path.
+                import boto3
+
+                _client = boto3.client("dynamodb")
+    return _client
+
+
+def _is_conditional_failure(error: Exception) -> bool:
+    # Duck-typed botocore ClientError check; avoids importing botocore here
+    code = (getattr(error, "response", None) or {}).get("Error", {}).get("Code")
+    return code == "ConditionalCheckFailedException"
+
+
+def rank(status: Optional[str]) -> Optional[int]:
+    return STATUS_RANK.get((status or "").lower())
+
+
+def apply_transition(
+    message_sid: str,
+    status: str,
+    event_id: Optional[str] = None,
+    error_code: Optional[str] = None,
+    received_at: Optional[float] = None,
+    ttl_secs: int = DEFAULT_TTL_SECONDS,
+) -> bool:
+    """
+    Record that `message_sid` reached `status`.
+
+    The write only succeeds if it moves the message forward in the
+    lifecycle; returns False when it was ignored as stale or unknown.
+    DynamoDB errors other than the condition failure propagate.
+    """
+    table = _table()
+    status = (status or "").lower()
+    status_rank = STATUS_RANK.get(status)
+    if not table or status_rank is None:
+        return False
+
+    now = int(received_at if received_at is not None else time.time())
+    names = {"#s": "status", "#at": f"{status}_at"}
+    values: Dict[str, Any] = {
+        ":s": {"S": status},
+        ":r": {"N": str(status_rank)},
+        ":now": {"N": str(now)},
+        ":exp": {"N": str(now + ttl_secs)},
+    }
+    sets = ["#s = :s", "status_rank = :r", "#at = :now", "updated_at = :now", "expires_at = :exp"]
+    if event_id:
+        values[":eid"] = {"S": event_id}
+        sets.append("event_id = if_not_exists(event_id, :eid)")
+    if error_code:
+        values[":err"] = {"S": str(error_code)}
+        sets.append("error_code = :err")
+
+    try:
+        _get_client().update_item(
+            TableName=table,
+            Key={"message_sid": {"S": message_sid}},
+            UpdateExpression="SET " + ", ".join(sets),
+            ConditionExpression="attribute_not_exists(message_sid) OR status_rank < :r",
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+        )
+        return True
+    except Exception as e:
+        if _is_conditional_failure(e):
+            return False
+        raise
+
+
+def _from_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for key, value in item.items():
+        if "N" in value:
+            out[key] = int(value["N"])
+        elif "S" in value:
+            out[key] = value["S"]
+    return out
+
+
+def get_status(message_sid: str) -> Optional[Dict[str, Any]]:
+    """
+    Latest known status for a Twilio MessageSid, or None.
+    """
+    table = _table()
+    if not table:
+        return None
+    item = _get_client().get_item(
+        TableName=table,
+        Key={"message_sid": {"S": message_sid}},
+    ).get("Item")
+    return _from_item(item) if item else None
+
+
+def latest_for_event(event_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Latest status across every message sent for `event_id` (normally one),
+    picking the furthest along in the lifecycle.
+    """
+    table = _table()
+    if not table:
+        return None
+
+    items: List[Dict[str, Any]] = []
+    kwargs: Dict[str, Any] = {
+        "TableName": table,
+        "IndexName": EVENT_ID_INDEX,
+        "KeyConditionExpression": "event_id = :eid",
+        "ExpressionAttributeValues": {":eid": {"S": event_id}},
+    }
+    while True:
+        resp = _get_client().query(**kwargs)
+        items.extend(_from_item(item) for item in resp.get("Items", []))
+        if not resp.get("LastEvaluatedKey"):
+            break
+        kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+    if not items:
+        return None
+    return max(items, key=lambda i: (i.get("status_rank", -1), i.get("updated_at", 0)))
@@ -0,0 +1,232 @@
+import math
+import os
+import string
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+# ---------------------------------------------------------------------------
+# SMS template registry
+# ---------------------------------------------------------------------------
+# Every SMS body is rendered from here (Worker and the inline ingest path),
+# so copy changes happen in one place. Bump "version" whenever the copy
+# changes; it is reported with every rendered body.
+#
+# Each event has:
+#   text          → primary copy (may need UCS-2 because of emoji)
+#   text_no_amount→ optional copy for payloads without an amount
+#   gsm7 / gsm7_no_amount → GSM-7-only fallbacks used when
+#                   SMS_GSM7_FALLBACK is on and the primary copy would
+#                   need more than one segment
+#
+# Placeholders use str.format syntax (named fields with a format spec, no
+# conversions or nested fields); {amount} is a float.
+
+TEMPLATES: Dict[str, Dict[str, Any]] = {
+    "advance_in_transit": {
+        "version": 1,
+        "text": "Ta-dah! Your advance of ${amount:.2f} is being sent!. 💸 – PaySlice",
+        "text_no_amount": "Ta-dah! Your advance is being sent!. 💸 – PaySlice",
+        "gsm7": "Ta-dah! Your advance of ${amount:.2f} is being sent! - PaySlice",
+        "gsm7_no_amount": "Ta-dah! Your advance is being sent! - PaySlice",
+    },
+    "advance_approved": {
+        "version": 1,
+        "text": (
+            "🎉 Your ${amount:.2f} advance has been approved. "
+            "Funds are now moving to your bank. – PaySlice."
+        ),
+        "gsm7": (
+            "Your ${amount:.2f} advance has been approved. "
+            "Funds are now moving to your bank. - PaySlice"
+        ),
+    },
+    # Sent instead of approved + in_transit when both are pending for the
+    # same advance (see utils/coalesce.py)
+    "advance_approved_in_transit": {
+        "version": 1,
+        "text": "🎉 Your ${amount:.2f} advance has been approved and is being sent to your bank! 💸 – PaySlice",
+        "text_no_amount": "🎉 Your advance has been approved and is being sent to your bank! 💸 – PaySlice",
+        "gsm7": "Your ${amount:.2f} advance has been approved and is being sent to your bank! - PaySlice",
+        "gsm7_no_amount": "Your advance has been approved and is being sent to your bank! - PaySlice",
+    },
+}
+
+# GSM 03.38 default alphabet (one septet each) and extension table (two
+# septets each: escape + char). Anything else forces UCS-2.
+GSM7_BASIC = frozenset(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+GSM7_EXTENDED = frozenset("^{}\\[~]|€\f")
+
+GSM7 = "GSM-7"
+UCS2 = "UCS-2"
+
+# Single-segment limits and per-segment limits once a message is split
+# (the User Data Header takes the difference).
+SEGMENT_LIMITS = {GSM7: (160, 153), UCS2: (70, 67)}
+
+
+def encoding_info(body: str):
+    """
+    Return (encoding, units, segments) for an SMS body.
+
+    `units` are GSM-7 septets or UTF-16 code units, whichever encoding the
+    body needs; that is what Twilio bills segments on.
+    """
+    septets = 0
+    for ch in body:
+        if ch in GSM7_BASIC:
+            septets += 1
+        elif ch in GSM7_EXTENDED:
+            septets += 2
+        else:
+            units = len(body.encode("utf-16-le")) // 2
+            return UCS2, units, _segments(UCS2, units)
+    return GSM7, septets, _segments(GSM7, septets)
+
+
+def _segments(encoding: str, units: int) -> int:
+    single, multi = SEGMENT_LIMITS[encoding]
+    if units <= single:
+        return 1
+    return math.ceil(units / multi)
+
+
+class RenderedSms:
+    """
+    A rendered body plus the accounting Twilio will bill it on.
+    """
+
+    __slots__ = ("body", "event", "template_version", "variant", "encoding", "units", "segments")
+
+    def __init__(self, body, event, template_version, variant, encoding, units, segments):
+        self.body = body
+        self.event = event
+        self.template_version = template_version
+        self.variant = variant
+        self.encoding = encoding
+        self.units = units
+        self.segments = segments
+
+    def as_fields(self) -> Dict[str, Any]:
+        return {
+            "template": f"{self.event}@v{self.template_version}",
+            "variant": self.variant,
+            "encoding": self.encoding,
+            "segments": self.segments,
+        }
+
+
+def _compile(template: str) -> Callable[..., str]:
+    """
+    Parse a template once into literal text and (field, format spec) pairs;
+    rendering then only formats the values and joins the pieces.
+    """
+    parts: List[Union[str, Tuple[str, str]]] = []
+    for literal, field, spec, conversion in string.Formatter().parse(template):
+        if literal:
+            parts.append(literal)
+        if field is None:
+            continue
+        if not field.isidentifier() or conversion or "{" in (spec or ""):
+            raise ValueError(f"Unsupported template field: {field!r} in {template!r}")
+        parts.append((field, spec or ""))
+
+    def render(**values: Any) -> str:
+        return "".join([p if isinstance(p, str) else format(values[p[0]], p[1]) for p in parts])
+
+    return render
+
+
+class TemplateRegistry:
+    """
+    Templates compiled once per container.
+
+    render() picks the variant for the payload, computes encoding and
+    segment count, optionally swaps in the GSM-7 copy, and keeps running
+    counters (`stats`) of what was rendered for metrics.
+    """
+
+    def __init__(self, templates: Dict[str, Dict[str, Any]], gsm7_fallback: bool = False):
+        self.gsm7_fallback = gsm7_fallback
+        self._compiled: Dict[str, Dict[str, Any]] = {}
+        for event, spec in templates.items():
+            compiled: Dict[str, Any] = {"version": spec["version"]}
+            for variant in ("text", "text_no_amount", "gsm7", "gsm7_no_amount"):
+                if variant in spec:
+                    compiled[variant] = _compile(spec[variant])
+            self._compiled[event] = compiled
+
+        self.stats: Counter = Counter()
+        self._stats_lock = threading.Lock()
+
+    def events(self):
+        return tuple(self._compiled)
+
+    def drain_stats(self) -> Counter:
+        """
+        Return the counters accumulated since the last drain and reset them,
+        for per-invocation metrics.
+        """
+        with self._stats_lock:
+            stats, self.stats = self.stats, Counter()
+        return stats
+
+    def version(self, event: str) -> int:
+        return self._compiled[event]["version"]
+
+    def render(self, msg: Dict[str, Any]) -> RenderedSms:
+        """
+        Render the SMS for a Worker message.
+
+        Raises ValueError for unsupported events and KeyError("amount") when
+        the event has no amount-less copy and the amount is missing.
+        """
+        event = msg.get("event")
+        compiled = self._compiled.get(event)
+        if compiled is None:
+            raise ValueError(f"Unsupported event type: {event}")
+
+        amount = msg.get("amount")
+        if amount is None:
+            if "text_no_amount" not in compiled:
+                raise KeyError("amount")
+            variant, fmt_args = "text_no_amount", {}
+        else:
+            variant, fmt_args = "text", {"amount": float(amount)}
+
+        body = compiled[variant](**fmt_args)
+        encoding, units, segments = encoding_info(body)
+
+        fallback = variant.replace("text", "gsm7")
+        if segments > 1 and self.gsm7_fallback and fallback in compiled:
+            variant = fallback
+            body = compiled[variant](**fmt_args)
+            encoding, units, segments = encoding_info(body)
+
+        with self._stats_lock:
+            self.stats[f"rendered.{event}"] += 1
+            self.stats[f"encoding.{encoding}"] += 1
+            self.stats["segments"] += segments
+
+        return RenderedSms(body, event, compiled["version"], variant, encoding, units, segments)
+
+
+def _env_flag(name: str, default: bool = False) -> bool:
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    return raw.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Shared registry, compiled at import (cheap: a handful of bound methods)
+registry = TemplateRegistry(TEMPLATES, gsm7_fallback=_env_flag("SMS_GSM7_FALLBACK"))
+
+
+def render(msg: Dict[str, Any]) -> RenderedSms:
+    """
+    Render `msg` with the shared registry.
+    """
+    return registry.render(msg)
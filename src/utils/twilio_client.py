@@ -1,12 +1,35 @@
 # utils/twilio_client.py
 
-from twilio.rest import Client as TwilioClient
+import os
+import threading
+import time
+from typing import Any, Callable, Optional, Tuple, TypeVar
 
 from utils.logger import get_logger
 from utils.secrets import get_twilio_secrets
 
 logger = get_logger("twilio_client")
 
+# twilio.rest (and the requests/aiohttp stack under it) is imported on the
+# first build_client() rather than at module load, so handlers that never
+# send an SMS don't pay for it on cold start. Assign a class here to swap
+# the SDK client out (tests, benchmarks).
+TwilioClient: Optional[Callable[..., Any]] = None
+
+T = TypeVar("T")
+
+DEFAULT_TTL_SECONDS = 900
+DEFAULT_REFRESH_AHEAD_SECONDS = 60
+
+
+def _twilio_client_class() -> Callable[..., Any]:
+    global TwilioClient
+    if TwilioClient is None:
+        from twilio.rest import Client
+
+        TwilioClient = Client
+    return TwilioClient
+
 
 def build_client():
     """
@@ -24,7 +47,7 @@ def build_client():
     #   "account_sid": "...",
     #   "auth_token": "...",
     #   "msid": "MGxxx",   # legacy name
-    #   "bearer": "..."    # optional
+    #   "bearer": "..."    # optional; /sms bearer token (utils/auth.py)
     # }
     # or possibly with "messaging_service_sid" instead of "msid".
     if isinstance(secrets, dict):
@@ -36,7 +59,7 @@ def build_client():
             secrets.get("messaging_service_sid") or secrets.get("msid")
         )
 
-        bearer_token = secrets.get("bearer")  # optional, for future use
+        bearer_token = secrets.get("bearer")  # optional; checked by utils/auth.py
     else:
         # Attribute-style fallback (not expected with your current JSON)
         account_sid = getattr(secrets, "account_sid", None)
@@ -61,7 +84,10 @@ def build_client():
         logger.error("Missing Twilio secrets", extra={"missing": missing})
         raise RuntimeError(f"Missing Twilio secrets: {', '.join(missing)}")
 
-    client = TwilioClient(account_sid, auth_token)
+    # Imported here for the same cold-start reason as twilio.rest
+    from utils.http_transport import get_http_client
+
+    client = _twilio_client_class()(account_sid, auth_token, http_client=get_http_client())
     logger.info("Twilio client initialized successfully")
 
     conf = {
@@ -71,3 +97,125 @@ def build_client():
     }
 
     return client, conf
+
+
+def _is_auth_error(error: Exception) -> bool:
+    return getattr(error, "status", None) == 401
+
+
+class TwilioClientProvider:
+    """
+    Lazily built, TTL-cached Twilio client + config.
+
+    Nothing is fetched until the first get()/call(), so cold starts that
+    never send an SMS skip Secrets Manager entirely. After that:
+
+      - within `refresh_ahead` seconds of expiry, get() returns the cached
+        client and rebuilds it on a background thread;
+      - past expiry, get() rebuilds synchronously;
+      - call() forces a single rebuild and retry on a Twilio 401, which is
+        how a rotated auth token is picked up mid-TTL.
+
+    TTLs come from TWILIO_SECRET_TTL_SECONDS and
+    TWILIO_SECRET_REFRESH_AHEAD_SECONDS unless passed explicitly.
+    Thread-safe, so concurrent worker sends can share one provider.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: Optional[float] = None,
+        refresh_ahead_seconds: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if ttl_seconds is None:
+            ttl_seconds = float(os.getenv("TWILIO_SECRET_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+        if refresh_ahead_seconds is None:
+            refresh_ahead_seconds = float(
+                os.getenv("TWILIO_SECRET_REFRESH_AHEAD_SECONDS", DEFAULT_REFRESH_AHEAD_SECONDS)
+            )
+
+        self.ttl_seconds = ttl_seconds
+        self.refresh_ahead_seconds = min(refresh_ahead_seconds, ttl_seconds)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._value: Optional[Tuple[Any, dict]] = None
+        self._loaded_at = 0.0
+        self._refreshing = False
+
+    def _build(self) -> Tuple[Any, dict]:
+        # Look build_client up at call time so it can be swapped in tests.
+        value = build_client()
+        self._value = value
+        self._loaded_at = self._clock()
+        return value
+
+    def get(self) -> Tuple[Any, dict]:
+        """
+        Return (client, conf), building or refreshing as needed.
+        """
+        value = self._value
+        age = self._clock() - self._loaded_at
+
+        if value is not None and age < self.ttl_seconds - self.refresh_ahead_seconds:
+            return value
+
+        if value is not None and age < self.ttl_seconds:
+            self._refresh_in_background()
+            return value
+
+        with self._lock:
+            # Another thread may have refreshed while we waited on the lock
+            if self._value is not None and self._clock() - self._loaded_at < self.ttl_seconds:
+                return self._value
+            return self._build()
+
+    def refresh(self) -> Tuple[Any, dict]:
+        """
+        Rebuild the client now, regardless of TTL.
+        """
+        with self._lock:
+            return self._build()
+
+    def _refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def _run():
+            try:
+                self.refresh()
+                logger.info("Twilio client refreshed ahead of expiry")
+            except Exception as e:
+                # Keep serving the cached client; get() retries at expiry.
+                logger.warning("Background Twilio refresh failed", extra={"error": str(e)})
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=_run, name="twilio-refresh", daemon=True).start()
+
+    def transport_stats(self, reset: bool = False) -> Optional[dict]:
+        """
+        Connection-pool counters for the shared Twilio HTTP transport
+        (utils.http_transport), or None before the first client was built.
+        """
+        if self._value is None:
+            return None
+        from utils.http_transport import stats
+
+        return stats.snapshot(reset=reset)
+
+    def call(self, fn: Callable[[Any, dict], T]) -> T:
+        """
+        Run fn(client, conf). On a Twilio 401, refresh credentials once and
+        retry; any other error (or a second 401) propagates.
+        """
+        client, conf = self.get()
+        try:
+            return fn(client, conf)
+        except Exception as e:
+            if not _is_auth_error(e):
+                raise
+            logger.warning("Twilio rejected credentials; refreshing secrets and retrying")
+            client, conf = self.refresh()
+            return fn(client, conf)
@@ -0,0 +1,112 @@
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from typing import Callable, Iterable, Optional, Tuple
+
+from utils import secrets
+from utils.logger import get_logger
+
+logger = get_logger("twilio_signature")
+
+# Twilio signs every webhook with X-Twilio-Signature:
+#
+#   base64(HMAC-SHA1(auth_token, url + key1 + value1 + key2 + value2 ...))
+#
+# where `url` is the exact URL Twilio requested (query string included) and
+# the POST parameters are sorted by name.
+# https://www.twilio.com/docs/usage/security#validating-requests
+
+DEFAULT_TTL_SECONDS = 900
+# A signature that fails with the cached token triggers at most one token
+# reload per this many seconds, so forged requests can't hammer Secrets
+# Manager while a rotated token is still picked up promptly.
+DEFAULT_MIN_RELOAD_SECONDS = 60
+
+
+def compute_signature(url: str, params: Iterable[Tuple[str, str]], auth_token: str) -> str:
+    """
+    The X-Twilio-Signature Twilio would send for `url` and form `params`.
+    """
+    payload = url + "".join(key + value for key, value in sorted(params))
+    digest = hmac.new(auth_token.encode(), payload.encode(), hashlib.sha1).digest()
+    return base64.b64encode(digest).decode()
+
+
+def is_valid(url: str, params: Iterable[Tuple[str, str]], signature: str, auth_token: str) -> bool:
+    """
+    Constant-time check of `signature` against the expected one.
+    """
+    expected = compute_signature(url, params, auth_token)
+    return hmac.compare_digest(expected.encode(), signature.encode())
+
+
+def _load_auth_token() -> str:
+    # Looked up at call time so tests can swap get_twilio_secrets
+    token = (secrets.get_twilio_secrets() or {}).get("auth_token")
+    if not token:
+        raise RuntimeError("Missing Twilio secrets: auth_token")
+    return token
+
+
+class SignatureValidator:
+    """
+    Validates webhook signatures against a TTL-cached auth token.
+
+    The token is read from Secrets Manager on first use and kept for
+    `ttl_seconds` (TWILIO_SECRET_TTL_SECONDS), so a warm container verifies
+    a callback with one HMAC and no I/O. When a signature fails, the token
+    is reloaded once (at most every `min_reload_seconds`) and the check
+    retried, which is how a rotated token is picked up mid-TTL.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: Optional[float] = None,
+        min_reload_seconds: float = DEFAULT_MIN_RELOAD_SECONDS,
+        loader: Callable[[], str] = _load_auth_token,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if ttl_seconds is None:
+            ttl_seconds = float(os.getenv("TWILIO_SECRET_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+        self.ttl_seconds = ttl_seconds
+        self.min_reload_seconds = min_reload_seconds
+        self._loader = loader
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._token: Optional[str] = None
+        self._loaded_at = 0.0
+
+    def _load(self) -> str:
+        with self._lock:
+            self._token = self._loader()
+            self._loaded_at = self._clock()
+            return self._token
+
+    def _cached_token(self) -> str:
+        if self._token is not None and self._clock() - self._loaded_at < self.ttl_seconds:
+            return self._token
+        return self._load()
+
+    def validate(self, url: str, params: Iterable[Tuple[str, str]], signature: Optional[str]) -> bool:
+        """
+        True if `signature` was produced by the current (or just rotated)
+        auth token. Secrets Manager errors propagate.
+        """
+        if not signature:
+            return False
+        params = list(params)
+        if is_valid(url, params, signature, self._cached_token()):
+            return True
+        if self._clock() - self._loaded_at < self.min_reload_seconds:
+            return False
+
+        logger.info("twilio.signature_token_reload")
+        return is_valid(url, params, signature, self._load())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._token = None
+            self._loaded_at = 0.0
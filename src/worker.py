@@ -1,103 +1,540 @@
-import json
-from typing import Any, Dict
+import os
+from typing import AbstractSet, Any, Dict, List, Optional
+from urllib.parse import urlencode
 
-from utils.logger import get_logger
-from utils.twilio_client import build_client
+from utils import idempotency, lanes, schema, templates
+from utils.circuit_breaker import CircuitOpenError, from_env as circuit_breaker_from_env
+from utils.coalesce import from_env as coalescer_from_env, recipient_key
+from utils.concurrency import bounded_map, resolve_max_workers
+from utils.dedup import from_env as deduper_from_env
+from utils.logger import flush_logs, get_logger
+from utils.metrics import UNIT_COUNT, flush_metrics, get_metrics
+from utils.rate_limit import RateLimitExceeded, from_env as rate_limiter_from_env
+from utils.twilio_client import TwilioClientProvider
 
 logger = get_logger("worker")
 
-# Twilio client + config (from Secrets Manager)
-client, conf = build_client()
+# EMF metrics, flushed once per invocation (POWERTOOLS_METRICS_NAMESPACE)
+metrics = get_metrics("worker")
 
-# Supported SMS templates by event type
-EVENT_TEMPLATES = {
-    "advance_in_transit": lambda msg: (
-        f"Ta-dah! Your advance of ${msg['amount']:.2f} is being sent!. 💸 – PaySlice"
-    ),
-    "advance_approved": lambda msg: (
-        f"🎉 Your ${msg['amount']:.2f} advance has been approved. "
-        "Funds are now moving to your bank. – PaySlice."
-    ),
-}
+# Twilio client + config (from Secrets Manager), built on first send and
+# refreshed on TTL expiry or a 401
+twilio = TwilioClientProvider()
+
+# Global MPS + per-recipient throttling in front of Twilio (RATE_LIMIT_*)
+limiter = rate_limiter_from_env()
+
+# Priority lane this function consumes (WORKER_LANE) and its dwell SLO
+LANE = lanes.worker_lane()
+DWELL_SLO_MS = lanes.dwell_slo_ms(LANE)
+
+# Collapse SMS about the same advance for the same recipient (COALESCE_*)
+coalescer = coalescer_from_env()
+
+# Drop SMS whose content was just sent under another event_id (DEDUP_*)
+deduper = deduper_from_env()
+
+# Per-record outcomes. Only transient failures are reported back to SQS for
+# redelivery; permanent ones would fail the same way on every attempt.
+STATUS_SENT = "sent"
+STATUS_TRANSIENT = "transient_error"
+STATUS_PERMANENT = "permanent_error"
+STATUS_DUPLICATE = "duplicate"
+STATUS_COALESCED = "coalesced"
+STATUS_CONTENT_DUPLICATE = "content_duplicate"
+
+# Matches maxReceiveCount in the queues' RedrivePolicy: a transient failure
+# on this receive sends the record to the DLQ
+MAX_RECEIVE_COUNT = int(os.getenv("MAX_RECEIVE_COUNT", "3"))
+
+# Error recorded on records shed by an open circuit breaker
+ERROR_CIRCUIT_OPEN = "circuit_open"
+
+# Twilio 4xx responses are permanent (bad number, opted out, ...) except for
+# auth, timeout and throttling errors, which are worth another attempt.
+_RETRYABLE_CLIENT_STATUSES = {401, 408, 429}
+
+
+def classify_twilio_error(error: Exception) -> str:
+    """
+    Classify a Twilio send error as transient or permanent.
+
+    Anything without an HTTP status (timeouts, connection resets, ...) and
+    every 5xx is treated as transient.
+    """
+    status = getattr(error, "status", None)
+    if isinstance(status, int) and 400 <= status < 500 and status not in _RETRYABLE_CLIENT_STATUSES:
+        return STATUS_PERMANENT
+    return STATUS_TRANSIENT
+
+
+def _is_twilio_outage(error: Exception) -> bool:
+    # Only transient errors say anything about Twilio's health; a 400 for a
+    # bad number must not trip the breaker.
+    return classify_twilio_error(error) == STATUS_TRANSIENT
+
+
+# Fail fast while Twilio is erroring or slow instead of waiting out the HTTP
+# timeout on every record (CIRCUIT_BREAKER_*)
+breaker = circuit_breaker_from_env("twilio", is_failure=_is_twilio_outage)
+
+
+def status_callback_url(event_id: Optional[str]) -> Optional[str]:
+    """
+    Per-message StatusCallback URL (STATUS_CALLBACK_URL + ?event_id=...), so
+    delivery callbacks can be tied back to our event_id.
+    """
+    base = os.getenv("STATUS_CALLBACK_URL")
+    if not base:
+        return None
+    if not event_id:
+        return base
+    return f"{base}{'&' if '?' in base else '?'}{urlencode({'event_id': event_id})}"
 
 
 def build_body(msg: Dict[str, Any]) -> str:
     """
     Build the SMS body based on the event type and payload.
     """
-    event = msg.get("event")
-    if event not in EVENT_TEMPLATES:
-        raise ValueError(f"Unsupported event type: {event}")
+    return templates.render(msg).body
 
-    if "amount" not in msg:
-        raise KeyError("amount")
 
-    return EVENT_TEMPLATES[event](msg)
+def _decode_record(rec: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Parse and render a single SQS record without any network I/O.
 
+    Returns a result dict. On success it carries the decoded "msg", "phone"
+    and "body" for _send_record; otherwise its status is STATUS_PERMANENT.
+    """
+    message_id = rec.get("messageId")
+    raw_body = rec.get("body") or ""
+    receipt_handle = rec.get("receiptHandle", "<no-handle>")
+    result: Dict[str, Any] = {
+        "message_id": message_id,
+        "status": STATUS_PERMANENT,
+        "receive_count": int((rec.get("attributes") or {}).get("ApproximateReceiveCount") or 1),
+    }
 
-def lambda_handler(event, context):
-    records = event.get("Records", [])
-    logger.info("worker.lambda_start: received %d records", len(records))
+    # 1) Parse and validate against the message contract (utils.schema)
+    try:
+        message = schema.decode_worker_message(raw_body)
+    except schema.InvalidMessage as e:
+        logger.warning(
+            "worker.payload_invalid: error=%s fields=%s preview=%s receipt_handle=%s",
+            e.error,
+            ",".join(e.fields),
+            raw_body[:200],
+            receipt_handle,
+        )
+        # Permanent: redelivering the same bytes cannot fix it
+        result["event_id"] = e.event_id
+        result["error"] = e.error
+        return result
 
-    for rec in records:
-        raw_body = rec.get("body") or ""
-        receipt_handle = rec.get("receiptHandle", "<no-handle>")
+    result["event_id"] = message.event_id
+    msg = message.to_dict()
+    phone = message.phone
 
-        # 1) Parse JSON from SQS
-        try:
-            msg = json.loads(raw_body)
-        except json.JSONDecodeError:
-            logger.warning(
-                "worker.payload_invalid_json: preview=%s receipt_handle=%s",
-                raw_body[:200],
-                receipt_handle,
-            )
-            # Let SQS redrive to DLQ after maxReceiveCount
-            continue
+    # 2) Build SMS body (with encoding / segment accounting)
+    try:
+        rendered = templates.render(msg)
+    except Exception as e:
+        logger.error(
+            "worker.build_body_error: error=%s msg=%s",
+            str(e),
+            msg,
+        )
+        result["error"] = "build_body_error"
+        return result
 
-        # 2) Extract phone
-        try:
-            phone = msg["user"]["phone"]
-        except KeyError:
-            logger.warning(
-                "worker.missing_phone: msg=%s receipt_handle=%s",
-                msg,
-                receipt_handle,
+    result.update({"status": None, "msg": msg, "phone": phone, "body": rendered.body})
+    result.update(rendered.as_fields())
+    return result
+
+
+def _twilio_send(send_kwargs: Dict[str, Any]) -> Any:
+    with metrics.timer("TwilioSendLatency"):
+        return twilio.call(
+            lambda client, conf: client.messages.create(
+                # IMPORTANT: Twilio expects "messaging_service_sid", not "msid"
+                messaging_service_sid=conf["messaging_service_sid"],
+                **send_kwargs,
             )
-            continue
+        )
+
+
+def _release(result: Dict[str, Any]) -> None:
+    """
+    Undo the claims taken for a record whose send did not happen, so its
+    retry (or a content duplicate's) can send.
+    """
+    if result.get("event_id"):
+        idempotency.release(result["event_id"])
+    deduper.release(result.pop("content_claim", None))
+
+
+def _send_record(result: Dict[str, Any], completed: AbstractSet[str] = frozenset()) -> Dict[str, Any]:
+    """
+    Send a decoded record via Twilio, guarded by the idempotency table.
+
+    Never raises: every outcome is reported in the returned result dict so a
+    batch can be dispatched concurrently and summarised afterwards.
+    """
+    if result["status"] is not None:
+        return result
+
+    msg, phone, body = result["msg"], result["phone"], result["body"]
+    event_id = result.get("event_id")
+
+    # 3) Shed load while the breaker is open: no claim, no rate-limit token,
+    #    no HTTP timeout. SQS redelivers the record after its visibility
+    #    timeout, by which point the breaker will have probed Twilio again.
+    if not breaker.allow():
+        result["status"] = STATUS_TRANSIENT
+        result["error"] = ERROR_CIRCUIT_OPEN
+        return result
+
+    # 4) Idempotency: never send the same event_id twice
+    if event_id:
+        if event_id in completed:
+            claim = idempotency.ALREADY_COMPLETED
+        else:
+            try:
+                claim = idempotency.claim(event_id)
+            except Exception as e:
+                logger.error("worker.idempotency_error: error=%s event_id=%s", str(e), event_id)
+                result["status"] = STATUS_TRANSIENT
+                result["error"] = "idempotency_error"
+                return result
+
+        if claim == idempotency.ALREADY_COMPLETED:
+            logger.info("worker.duplicate_skipped: event_id=%s", event_id)
+            result["status"] = STATUS_DUPLICATE
+            return result
+        if claim == idempotency.IN_FLIGHT:
+            # Another invocation is sending it right now; check back later
+            logger.info("worker.duplicate_in_flight: event_id=%s", event_id)
+            result["status"] = STATUS_TRANSIENT
+            result["error"] = "in_flight"
+            return result
+
+    # 5) Content dedup: the same SMS emitted upstream under another event_id
+    content = deduper.claim(msg)
+    if content is not None and content.duplicate:
+        logger.info(
+            "worker.content_duplicate: to=%s event=%s event_id=%s duplicate_of=%s",
+            phone,
+            msg.get("event"),
+            event_id,
+            content.duplicate_of,
+        )
+        if event_id:
+            idempotency.complete(event_id, duplicate_of=content.duplicate_of)
+        result["status"] = STATUS_CONTENT_DUPLICATE
+        return result
+    result["content_claim"] = content
+
+    # 6) Throughput control: wait briefly for a global token, defer
+    #    recipients that are being sent to too often
+    try:
+        limiter.acquire(phone)
+    except RateLimitExceeded as e:
+        logger.warning(
+            "worker.rate_limited: scope=%s retry_after=%.2f event_id=%s",
+            e.scope,
+            e.retry_after,
+            event_id,
+        )
+        _release(result)
+        result["status"] = STATUS_TRANSIENT
+        result["error"] = "rate_limited"
+        return result
+    except Exception as e:
+        # Bucket store errors (DynamoDB throttling, timeouts) retry just this
+        # record instead of failing the whole batch
+        logger.error("worker.rate_limit_error: error=%s event_id=%s", str(e), event_id)
+        _release(result)
+        result["status"] = STATUS_TRANSIENT
+        result["error"] = "rate_limit_error"
+        return result
 
-        # 3) Build SMS body
+    # 7) Send via Twilio (through the breaker)
+    send_kwargs = {"to": phone, "body": body}
+    callback = status_callback_url(event_id)
+    if callback:
+        send_kwargs["status_callback"] = callback
+
+    try:
+        resp = breaker.call(lambda: _twilio_send(send_kwargs))
+        logger.info(
+            "worker.twilio_sent: sid=%s to=%s event=%s event_id=%s template=%s encoding=%s segments=%d",
+            getattr(resp, "sid", "<no-sid>"),
+            phone,
+            msg.get("event"),
+            event_id,
+            result["template"],
+            result["encoding"],
+            result["segments"],
+        )
+    except CircuitOpenError:
+        # Opened (or ran out of half-open probes) since the check above
+        _release(result)
+        result["status"] = STATUS_TRANSIENT
+        result["error"] = ERROR_CIRCUIT_OPEN
+        return result
+    except Exception as e:
+        status = classify_twilio_error(e)
+        logger.error(
+            "worker.twilio_error: error=%s to=%s event=%s classification=%s",
+            str(e),
+            phone,
+            msg.get("event"),
+            status,
+        )
+        _release(result)
+        # Transient errors are reported in batchItemFailures so SQS retries
+        # only this record (and eventually moves it to the DLQ).
+        result["status"] = status
+        result["error"] = "twilio_error"
+        return result
+
+    result["status"] = STATUS_SENT
+    result["sid"] = getattr(resp, "sid", None)
+    result.pop("content_claim", None)
+    if event_id:
+        idempotency.complete(event_id, sid=result["sid"])
+    coalescer.record_sent(msg)
+    return result
+
+
+def _process_record(rec: Dict[str, Any], completed: AbstractSet[str] = frozenset()) -> Dict[str, Any]:
+    """
+    Decode and send a single SQS record.
+    """
+    return _send_record(_decode_record(rec), completed)
+
+
+def _coalesce(decoded: List[Dict[str, Any]], completed: AbstractSet[str]) -> None:
+    """
+    Collapse records about the same advance for the same recipient before
+    anything is sent.
+
+    Within the batch, the last record of each group is re-rendered as the
+    merged message and the others are marked STATUS_COALESCED with
+    "coalesced_into" pointing at it; _resolve_coalesced settles them once it
+    has been sent. Records already covered by a recent send
+    (COALESCE_WINDOW_SECONDS) are marked STATUS_COALESCED straight away.
+    """
+    pending = [r for r in decoded if r["status"] is None and r.get("event_id") not in completed]
+    if not coalescer.enabled or not pending:
+        return
+
+    for index, merged, suppressed in coalescer.plan([r["msg"] for r in pending]):
+        primary = pending[index]
         try:
-            body = build_body(msg)
+            rendered = templates.render(merged)
         except Exception as e:
-            logger.error(
-                "worker.build_body_error: error=%s msg=%s",
-                str(e),
-                msg,
-            )
+            # No copy for the merged event: send the records as they are
+            logger.warning("worker.coalesce_render_error: error=%s event=%s", str(e), merged.get("event"))
             continue
+        primary.update({"msg": merged, "body": rendered.body})
+        primary.update(rendered.as_fields())
+        for i in suppressed:
+            pending[i]["status"] = STATUS_COALESCED
+            pending[i]["coalesced_into"] = primary
+        logger.info(
+            "worker.coalesced: to=%s events=%s into=%s event_ids=%s",
+            primary["phone"],
+            ",".join(pending[i]["msg"].get("event") for i in suppressed + [index]),
+            merged["event"],
+            ",".join(str(pending[i].get("event_id")) for i in suppressed + [index]),
+        )
 
-        # 4) Send via Twilio
-        try:
-            resp = client.messages.create(
-                # IMPORTANT: Twilio expects "messaging_service_sid", not "msid"
-                messaging_service_sid=conf["messaging_service_sid"],
-                to=phone,
-                body=body,
-            )
+    live = [r for r in pending if r["status"] is None]
+    recent = coalescer.recently_sent([r["msg"] for r in live])
+    for r in live:
+        sent = recent.get(recipient_key(r["msg"]))
+        if sent and sent.get("event_id") != r.get("event_id") and coalescer.covered_by(sent, r["msg"]):
+            r["status"] = STATUS_COALESCED
+            r["coalesced_into"] = sent.get("event_id")
             logger.info(
-                "worker.twilio_sent: sid=%s to=%s event=%s event_id=%s",
-                getattr(resp, "sid", "<no-sid>"),
-                phone,
-                msg.get("event"),
-                msg.get("event_id"),
-            )
-        except Exception as e:
-            logger.error(
-                "worker.twilio_error: error=%s to=%s event=%s",
-                str(e),
-                phone,
-                msg.get("event"),
+                "worker.coalesced_recent: to=%s event=%s covered_by=%s event_id=%s",
+                r["phone"],
+                r["msg"].get("event"),
+                sent["event"],
+                r.get("event_id"),
             )
-            # Let SQS retry and eventually DLQ
+
+
+def _resolve_coalesced(results: List[Dict[str, Any]]) -> None:
+    """
+    Settle coalesced records: done (and marked completed) if the message
+    that carried them was sent. Otherwise (failed, or dropped as a duplicate
+    without sending the merged copy) they are retried, and go out on their
+    own on redelivery.
+    """
+    for r in results:
+        if r["status"] != STATUS_COALESCED:
+            continue
+        into = r.get("coalesced_into")
+        if isinstance(into, dict):
+            if into["status"] != STATUS_SENT:
+                r["status"] = STATUS_TRANSIENT
+                r["error"] = into.get("error") or f"coalesced_into_{into['status']}"
+                continue
+            into = into.get("event_id")
+            r["coalesced_into"] = into
+        if r.get("event_id"):
+            idempotency.complete(r["event_id"], coalesced_into=into)
+
+
+def _record_queue_metrics(records: List[Dict[str, Any]], decoded: List[Dict[str, Any]]) -> None:
+    """
+    Batch size, queue dwell time (SentTimestamp → ApproximateFirstReceiveTimestamp,
+    which includes any DelaySeconds) and redeliveries for an SQS batch, per lane.
+
+    Lateness is the time from a message's due time (`due_at_ms`, set by
+    ingest) to its first receive; that is what the lane's SLO is held to.
+    Messages without a due time fall back to their dwell time.
+    """
+    dims = {"Lane": LANE}
+    metrics.observe("BatchSize", len(records), unit=UNIT_COUNT, dimensions=dims)
+    redelivered = 0
+    breaches = 0
+    worst = 0
+    for rec, r in zip(records, decoded):
+        attrs = rec.get("attributes") or {}
+        try:
+            sent_at = int(attrs["SentTimestamp"])
+            first_receive = int(attrs["ApproximateFirstReceiveTimestamp"])
+        except (KeyError, TypeError, ValueError):
             continue
+        if int(attrs.get("ApproximateReceiveCount") or 1) > 1:
+            redelivered += 1
+            continue  # a redelivery's dwell includes the visibility timeout
+        due_at = (r.get("msg") or {}).get("due_at_ms")
+        lateness = first_receive - (due_at if isinstance(due_at, int) else sent_at)
+        metrics.observe("QueueDwellTime", first_receive - sent_at, dimensions=dims)
+        metrics.observe("QueueLateness", max(0, lateness), dimensions=dims)
+        worst = max(worst, lateness)
+        if lateness > DWELL_SLO_MS:
+            breaches += 1
+    metrics.count("Redeliveries", redelivered, dimensions=dims)
+    metrics.count("DwellSloBreaches", breaches, dimensions=dims)
+    if breaches:
+        logger.warning(
+            "worker.lane_slo_breached: lane=%s breaches=%d slo_ms=%d worst_ms=%d",
+            LANE,
+            breaches,
+            DWELL_SLO_MS,
+            worst,
+        )
+
+
+def _record_batch_metrics(results: List[Dict[str, Any]], shed: int) -> None:
+    """
+    Per-invocation outcome counters, error classes, template/segment stats,
+    Twilio transport reuse and circuit-breaker state.
+    """
+    for r in results:
+        metrics.count("Records", dimensions={"Outcome": r["status"]})
+        if r.get("error"):
+            metrics.count("RecordErrors", dimensions={"ErrorClass": r["error"]})
+    metrics.count("SmsSegments", sum(r["segments"] for r in results if r["status"] == STATUS_SENT))
+
+    for key, value in templates.registry.drain_stats().items():
+        kind, _, name = key.partition(".")
+        if kind == "rendered":
+            metrics.count("SmsRendered", value, dimensions={"Event": name})
+        elif kind == "encoding":
+            metrics.count("SmsRenderedByEncoding", value, dimensions={"Encoding": name})
+
+    transport = twilio.transport_stats()
+    if transport and transport["requests"]:
+        metrics.count("TwilioNewConnections", transport["new_connections"])
+        metrics.gauge("TwilioConnectionReuseRate", transport["reuse_rate"])
+
+    snap = breaker.snapshot()
+    dims = {"Breaker": snap["breaker"]}
+    metrics.gauge("CircuitBreakerState", snap["state_code"], dimensions=dims)
+    metrics.gauge("CircuitBreakerFailureRate", snap["failure_rate"], dimensions=dims)
+    metrics.count("CircuitBreakerShed", shed, dimensions=dims)
+
+
+@flush_logs
+@flush_metrics(metrics)
+def lambda_handler(event, context):
+    records = event.get("Records", [])
+    logger.info("worker.lambda_start: lane=%s received %d records", LANE, len(records))
+
+    # Dispatch the whole batch in parallel, bounded by WORKER_CONCURRENCY,
+    # so a batch costs roughly one Twilio round-trip instead of N.
+    max_workers = resolve_max_workers("WORKER_CONCURRENCY")
+    decoded = [_decode_record(rec) for rec in records]
+    # Lane SLO breaches are logged even with metrics off
+    _record_queue_metrics(records, decoded)
+
+    # One BatchGetItem (or LRU hit) for the whole batch instead of a
+    # DynamoDB round-trip per record; claim() stays authoritative.
+    completed = idempotency.completed_ids(
+        r["event_id"] for r in decoded if r["status"] is None and r.get("event_id")
+    )
+    _coalesce(decoded, completed)
+    results = bounded_map(lambda r: _send_record(r, completed), decoded, max_workers)
+    _resolve_coalesced(results)
+
+    sent = sum(1 for r in results if r["status"] == STATUS_SENT)
+    duplicates = sum(1 for r in results if r["status"] == STATUS_DUPLICATE)
+    coalesced = sum(1 for r in results if r["status"] == STATUS_COALESCED)
+    content_duplicates = sum(1 for r in results if r["status"] == STATUS_CONTENT_DUPLICATE)
+    segments = sum(r["segments"] for r in results if r["status"] == STATUS_SENT)
+    retry = [r for r in results if r["status"] == STATUS_TRANSIENT]
+    shed = sum(1 for r in retry if r.get("error") == ERROR_CIRCUIT_OPEN)
+    logger.info(
+        "worker.batch_complete: records=%d sent=%d segments=%d duplicate=%d content_duplicate=%d coalesced=%d retry=%d shed=%d dropped=%d concurrency=%d",
+        len(results),
+        sent,
+        segments,
+        duplicates,
+        content_duplicates,
+        coalesced,
+        len(retry),
+        shed,
+        len(results) - sent - duplicates - content_duplicates - coalesced - len(retry),
+        max_workers,
+    )
+    if metrics.enabled:
+        _record_batch_metrics(results, shed)
+    if shed:
+        logger.warning("worker.circuit_open: shed=%d retry_after=%.2f", shed, breaker.retry_after())
+
+    # Per-invocation pool counters: on a warm container new_connections
+    # should be 0, i.e. no TCP+TLS setup on the send path.
+    transport = twilio.transport_stats(reset=True)
+    if transport and transport["requests"]:
+        logger.info(
+            "worker.http_transport: requests=%d new_connections=%d reuse_rate=%s handshake_ms_avg=%s handshake_ms_max=%s",
+            transport["requests"],
+            transport["new_connections"],
+            transport["reuse_rate"],
+            transport["handshake_ms_avg"],
+            transport["handshake_ms_max"],
+        )
+
+    # Records on their last receive go to the DLQ next; keep their error
+    # class for the replay tool
+    dead = [r for r in retry if r.get("event_id") and r["receive_count"] >= MAX_RECEIVE_COUNT]
+    if dead:
+        bounded_map(lambda r: idempotency.record_failure(r["event_id"], r["error"]), dead, max_workers)
+
+    # Partial batch response (FunctionResponseTypes: ReportBatchItemFailures):
+    # SQS deletes every message not listed here, so records that were sent
+    # or failed permanently are never redelivered.
+    failures = []
+    for r in retry:
+        if r["message_id"]:
+            failures.append({"itemIdentifier": r["message_id"]})
+        else:
+            logger.error("worker.retry_without_message_id: event_id=%s", r.get("event_id"))
+
+    return {"batchItemFailures": failures}
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+# Lambda runs handlers with src/ as the working directory, so modules import
+# each other as top-level `utils.*`, `worker`, `ingest`. Mirror that here.
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, "src")
+for path in (SRC_DIR, ROOT_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from bench.fakes import FakeDynamoDB  # noqa: E402  (needs ROOT_DIR on sys.path)
+
+os.environ.setdefault("AWS_REGION", "us-east-1")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("TWILIO_SECRET_NAME", "payslice/twilio/txn")
+os.environ.setdefault("IDEMPOTENCY_TABLE", "payslice-sms-idempotency")
+# Most ingest tests post bare events; the auth tests turn this back on
+os.environ.setdefault("INGEST_AUTH_REQUIRED", "false")
+
+
+@pytest.fixture(autouse=True)
+def fake_dynamodb(monkeypatch):
+    import utils.idempotency as idempotency
+
+    fake = FakeDynamoDB()
+    monkeypatch.setattr(idempotency, "_client", fake)
+    idempotency.recent.clear()
+    return fake
@@ -0,0 +1,52 @@
+import importlib
+import json
+import os
+
+import pytest
+
+from bench import run as bench_run
+
+
+@pytest.fixture
+def restore_handlers(monkeypatch):
+    """
+    The harness sets env vars, patches boto3.client / TwilioClient and
+    reloads the handler modules; undo that so later tests get fresh modules.
+    """
+    import boto3
+    import utils.twilio_client as twilio_client
+
+    monkeypatch.setattr(boto3, "client", boto3.client)
+    monkeypatch.setattr(twilio_client, "TwilioClient", twilio_client.TwilioClient)
+    env = dict(os.environ)
+    yield
+    os.environ.clear()
+    os.environ.update(env)
+    monkeypatch.undo()
+    for name in ("ingest", "worker"):
+        importlib.reload(importlib.import_module(name))
+
+
+def test_small_run_reports_end_to_end(restore_handlers, tmp_path):
+    out = tmp_path / "bench.json"
+    bench_run.main(
+        [
+            "--events", "40",
+            "--ingest-batch", "5",
+            "--twilio-latency-ms", "0",
+            "--twilio-jitter-ms", "0",
+            "--error-rate", "0.1",
+            "--seed", "7",
+            "--cold-start-runs", "0",
+            "--out", str(out),
+        ]
+    )
+    report = json.loads(out.read_text())
+
+    assert report["ingest"]["events"] == 40
+    assert report["ingest"]["status_codes"] == {"202": 8}
+    assert report["aws_calls"]["sqs"]["send_message_batch"] > 0
+    assert report["worker"]["records"] == 40 + report["worker"]["redelivered"]
+    # Every event is sent once; transient errors are redelivered, not lost
+    assert report["twilio"]["sent"] + report["worker"]["dead_lettered"] == 40
+    assert report["worker"]["batch_latency_ms"]["p99"] is not None
@@ -0,0 +1,103 @@
+import pytest
+
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+# Target under test: utils.circuit_breaker.CircuitBreaker (fake clock)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Outage(Exception):
+    pass
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _breaker(clock, **kwargs):
+    kwargs.setdefault("min_calls", 4)
+    kwargs.setdefault("open_seconds", 10)
+    kwargs.setdefault("half_open_probes", 2)
+    return CircuitBreaker("twilio", is_failure=lambda e: isinstance(e, Outage), clock=clock, **kwargs)
+
+
+def _fail():
+    raise Outage()
+
+
+def _trip(breaker):
+    for _ in range(breaker.min_calls):
+        with pytest.raises(Outage):
+            breaker.call(_fail)
+
+
+def test_opens_on_failure_rate_and_fails_fast():
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    _trip(breaker)
+
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    with pytest.raises(CircuitOpenError) as exc:
+        breaker.call(lambda: pytest.fail("must not be called while open"))
+    assert exc.value.retry_after == 10
+    assert breaker.snapshot()["rejected"] == 2
+
+
+def test_non_failures_and_old_calls_do_not_trip():
+    clock = FakeClock()
+    breaker = _breaker(clock)
+
+    for _ in range(10):
+        with pytest.raises(BadRequest):
+            breaker.call(lambda: (_ for _ in ()).throw(BadRequest()))
+    assert breaker.state == "closed"
+
+    # Failures older than the window have aged out
+    breaker = _breaker(clock, window_seconds=30, failure_rate=0.5)
+    for _ in range(3):
+        with pytest.raises(Outage):
+            breaker.call(_fail)
+    clock.now += 31
+    breaker.call(lambda: "ok")
+    assert breaker.snapshot()["window_calls"] == 1
+    assert breaker.state == "closed"
+
+
+def test_opens_on_slow_calls():
+    clock = FakeClock()
+    breaker = _breaker(clock, slow_call_seconds=2, slow_call_rate=0.5)
+
+    def slow():
+        clock.now += 3
+        return "ok"
+
+    for _ in range(4):
+        breaker.call(slow)
+    assert breaker.state == "open"
+
+
+def test_half_open_probes_close_or_reopen():
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    _trip(breaker)
+
+    clock.now += 10
+    assert breaker.state == "half_open"
+    with pytest.raises(Outage):
+        breaker.call(_fail)
+    assert breaker.state == "open"
+    assert breaker.snapshot()["times_opened"] == 2
+
+    clock.now += 10
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == "half_open"
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == "closed"
@@ -0,0 +1,98 @@
+from utils.coalesce import (
+    DEFAULT_RULES,
+    CoalesceRules,
+    Coalescer,
+    DynamoDBRecentStore,
+    InMemoryRecentStore,
+    advance_key,
+    from_env,
+)
+
+PHONE = "+15555550123"
+
+
+def _msg(event_id, event, amount=185.0, phone=PHONE, **extra):
+    return {"event_id": event_id, "event": event, "user": {"phone": phone}, "amount": amount, **extra}
+
+
+def test_rules_parse_merges_and_supersedes():
+    rules = CoalesceRules.parse(DEFAULT_RULES + ";bogus;a+=b")
+
+    assert rules.target({"advance_approved", "advance_in_transit"}) == "advance_approved_in_transit"
+    assert rules.target({"advance_in_transit"}) == "advance_in_transit"
+    assert rules.target({"advance_approved", "advance_cancelled"}) is None
+    assert rules.conveys("advance_approved_in_transit") >= {"advance_approved", "advance_in_transit"}
+    assert "advance_approved" in rules.conveys("advance_in_transit")
+    assert "advance_in_transit" not in rules.conveys("advance_approved")
+
+
+def test_advance_key_strips_derived_event_suffix():
+    assert advance_key(_msg("e-1:advance_in_transit", "advance_in_transit")) == "e-1"
+    assert advance_key(_msg("e-1", "advance_approved")) == "e-1"
+    assert advance_key(_msg("e-2", "advance_approved", advance_id="adv-9")) == "adv-9"
+    assert advance_key({"event": "advance_approved"}) is None
+
+
+def test_plan_merges_same_advance_and_keeps_other_recipients_apart():
+    coalescer = Coalescer(CoalesceRules.parse(DEFAULT_RULES))
+    msgs = [
+        _msg("e-1:advance_in_transit", "advance_in_transit", amount=None),
+        _msg("e-1", "advance_approved"),
+        _msg("e-2", "advance_approved", phone="+15555550999"),
+    ]
+
+    [(primary, merged, suppressed)] = coalescer.plan(msgs)
+
+    assert primary == 1 and suppressed == [0]
+    assert merged["event"] == "advance_approved_in_transit"
+    assert merged["amount"] == 185.0
+    assert merged["coalesced_event_ids"] == ["e-1:advance_in_transit"]
+    assert msgs[1]["event"] == "advance_approved"  # the original is untouched
+
+
+def test_plan_skips_conflicting_amounts_and_respects_disable():
+    msgs = [
+        _msg("e-1", "advance_approved", amount=100.0, advance_id="adv-1"),
+        _msg("e-2", "advance_approved", amount=185.0, advance_id="adv-1"),
+    ]
+
+    assert Coalescer(CoalesceRules.parse(DEFAULT_RULES)).plan(msgs) == []
+    same = [_msg("e-1", "advance_approved"), _msg("e-1:advance_in_transit", "advance_in_transit")]
+    assert Coalescer(CoalesceRules.parse(DEFAULT_RULES), enabled=False).plan(same) == []
+
+
+def test_recent_send_covers_superseded_event():
+    coalescer = Coalescer(CoalesceRules.parse(DEFAULT_RULES), window_seconds=300, store=InMemoryRecentStore())
+    coalescer.record_sent(_msg("e-1:advance_in_transit", "advance_in_transit"))
+
+    approved = _msg("e-1", "advance_approved")
+    [recent] = coalescer.recently_sent([approved]).values()
+    assert coalescer.covered_by(recent, approved)
+    assert not coalescer.covered_by(recent, _msg("e-1", "advance_approved", amount=200.0))
+    assert not coalescer.covered_by(recent, _msg("e-1", "advance_cancelled"))
+
+
+def test_dynamodb_recent_store_round_trip(fake_dynamodb):
+    store = DynamoDBRecentStore("payslice-sms-idempotency", client=fake_dynamodb)
+    store.put("coalesce#+1#e-1", {"event": "advance_in_transit", "event_id": "e-1:t", "amount": 185.0}, 300)
+
+    found = store.get_many(["coalesce#+1#e-1", "coalesce#+1#e-2"])
+
+    assert found == {"coalesce#+1#e-1": {"event": "advance_in_transit", "event_id": "e-1:t", "amount": 185.0}}
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("COALESCE_WINDOW_SECONDS", "120")
+    monkeypatch.setenv("COALESCE_TABLE", "recent-sends")
+    monkeypatch.setenv("COALESCE_RULES", "a>b")
+
+    coalescer = from_env()
+
+    assert coalescer.enabled and coalescer.windowed
+    assert coalescer.store.table == "recent-sends"
+    assert coalescer.rules.describe() == "a>b"
+
+    monkeypatch.setenv("COALESCE_ENABLED", "false")
+    monkeypatch.delenv("COALESCE_WINDOW_SECONDS")
+    coalescer = from_env()
+    assert not coalescer.enabled and coalescer.store is None
@@ -0,0 +1,69 @@
+import pytest
+
+from utils.dedup import ContentDeduper, DynamoDBContentStore, InMemoryContentStore, from_env
+
+PHONE = "+15555550123"
+
+
+def _msg(event_id, event="advance_approved", amount=185.0, phone=PHONE, **extra):
+    return {"event_id": event_id, "event": event, "user": {"phone": phone}, "amount": amount, **extra}
+
+
+def test_key_normalizes_phone_event_and_amount():
+    deduper = ContentDeduper(window_seconds=60, store=InMemoryContentStore())
+
+    key = deduper.key(_msg("e-1"))
+    assert key.startswith("content#")
+    assert deduper.key(_msg("e-2", event="Advance_Approved ", amount=185, phone="+1 (555) 555-0123")) == key
+    assert deduper.key(_msg("e-3", amount=185.01)) != key
+    assert deduper.key(_msg("e-4", event="advance_in_transit")) != key
+
+    # Narrower key: the amount no longer matters
+    by_event = ContentDeduper(("phone", "event"), window_seconds=60, store=InMemoryContentStore())
+    assert by_event.key(_msg("e-1")) == by_event.key(_msg("e-2", amount=50.0))
+
+    with pytest.raises(ValueError):
+        ContentDeduper(("phone", "body"), window_seconds=60, store=InMemoryContentStore())
+
+
+def test_sliding_window_drops_other_event_ids_only():
+    now = [1_000.0]
+    deduper = ContentDeduper(window_seconds=60, store=InMemoryContentStore(), clock=lambda: now[0])
+
+    assert not deduper.claim(_msg("e-1")).duplicate
+    dup = deduper.claim(_msg("e-2"))
+    assert dup.duplicate and dup.duplicate_of == "e-1"
+    # A redelivery of the claiming record is not its own duplicate
+    assert not deduper.claim(_msg("e-1")).duplicate
+
+    now[0] += 61
+    assert not deduper.claim(_msg("e-2")).duplicate
+
+
+def test_release_lets_the_duplicate_send(fake_dynamodb):
+    store = DynamoDBContentStore("payslice-sms-idempotency", client=fake_dynamodb)
+    first = ContentDeduper(window_seconds=60, store=store)
+    # A second container: no shared LRU, so the conditional write decides
+    other = ContentDeduper(window_seconds=60, store=store)
+
+    claim = first.claim(_msg("e-1"))
+    assert other.claim(_msg("e-2")).duplicate_of == "e-1"
+
+    first.release(claim)
+    assert claim.key not in fake_dynamodb.tables["payslice-sms-idempotency"]
+    other.clear()
+    assert not other.claim(_msg("e-2")).duplicate
+
+
+def test_from_env(monkeypatch):
+    assert not from_env().enabled
+
+    monkeypatch.setenv("DEDUP_WINDOW_SECONDS", "120")
+    monkeypatch.setenv("DEDUP_KEY_FIELDS", "phone, advance_id")
+    deduper = from_env()
+    assert deduper.enabled
+    assert deduper.fields == ("phone", "advance_id")
+    assert isinstance(deduper.store, DynamoDBContentStore)
+
+    monkeypatch.setenv("DEDUP_KEY_FIELDS", "phone,nope")
+    assert from_env().fields == ("phone", "event", "amount")
@@ -0,0 +1,75 @@
+import importlib
+import json
+import time
+
+# Target under test: health.lambda_handler. The dependency probes are
+# replaced with in-process fakes; nothing here talks to AWS or Twilio.
+
+
+def _get(deep=False, path="/staging/health"):
+    event = {"rawPath": path, "requestContext": {"http": {"method": "GET", "path": path}}}
+    if deep:
+        event["queryStringParameters"] = {"deep": "true"}
+    return event
+
+
+def _load(monkeypatch, probes):
+    monkeypatch.setenv("HEALTH_PROBE_TIMEOUT_SECONDS", "0.2")
+    monkeypatch.setenv("HEALTH_CACHE_TTL_SECONDS", "60")
+    health = importlib.reload(importlib.import_module("health"))
+    monkeypatch.setattr(health, "PROBES", {name: (probe, None) for name, probe in probes.items()})
+    return health
+
+
+def test_shallow_health_and_version_probe_nothing(monkeypatch):
+    def boom():
+        raise AssertionError("shallow checks must not probe")
+
+    health = _load(monkeypatch, {"sqs": boom})
+
+    resp = health.lambda_handler(_get(), None)
+    assert resp["statusCode"] == 200
+    assert json.loads(resp["body"]) == {"status": "ok", "version": "1.0.0"}
+
+    resp = health.lambda_handler(_get(path="/staging/version"), None)
+    assert json.loads(resp["body"]) == {"version": "1.0.0"}
+
+
+def test_deep_health_reports_each_dependency_and_caches(monkeypatch):
+    calls = []
+
+    def ok():
+        calls.append("ok")
+
+    def down():
+        calls.append("down")
+        raise ConnectionError("unreachable")
+
+    def slow():
+        calls.append("slow")
+        time.sleep(0.5)
+
+    health = _load(monkeypatch, {"dynamodb": ok, "sqs": down, "twilio": slow})
+
+    started = time.perf_counter()
+    resp = health.lambda_handler(_get(deep=True), None)
+    # Probes run concurrently and the slow one is cut off at the timeout
+    assert time.perf_counter() - started < 0.45
+
+    body = json.loads(resp["body"])
+    assert resp["statusCode"] == 503
+    assert body["status"] == "degraded"
+    assert body["version"] == "1.0.0"
+    assert body["checks"]["dynamodb"]["status"] == "ok"
+    assert body["checks"]["sqs"] == {
+        "status": "error",
+        "error": "ConnectionError: unreachable",
+        "latency_ms": body["checks"]["sqs"]["latency_ms"],
+        "cached": False,
+    }
+    assert body["checks"]["twilio"]["status"] == "timeout"
+
+    # Within the TTL, polling doesn't probe again
+    body = json.loads(health.lambda_handler(_get(deep=True), None)["body"])
+    assert sorted(calls) == ["down", "ok", "slow"]
+    assert all(check["cached"] for check in body["checks"].values())
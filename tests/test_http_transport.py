@@ -0,0 +1,82 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import utils.http_transport as http_transport
+import utils.twilio_client as twilio_client
+
+# Target under test: utils.http_transport (pooled Twilio HTTP client)
+# A local keep-alive HTTP server stands in for api.twilio.com.
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({"sid": "SM123"}).encode()
+        self.send_response(201)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/2010-04-01/Messages.json"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_warm_requests_reuse_pooled_connection(server):
+    client = http_transport.build_http_client(pool_size=2)
+    http_transport.stats.reset()
+
+    for _ in range(5):
+        resp = client.request("POST", server, data={"To": "+15555550123", "Body": "hi"})
+        assert resp.status_code == 201
+
+    snap = http_transport.stats.snapshot(reset=True)
+    assert snap["requests"] == 5
+    assert snap["new_connections"] == 1
+    assert snap["reuse_rate"] == 0.8
+    assert http_transport.stats.snapshot()["requests"] == 0
+
+
+def test_settings_come_from_env(monkeypatch):
+    monkeypatch.setenv("WORKER_CONCURRENCY", "25")
+    monkeypatch.setenv("TWILIO_HTTP_READ_TIMEOUT_SECONDS", "4")
+    monkeypatch.setenv("TWILIO_HTTP_MAX_RETRIES", "3")
+    client = http_transport.build_http_client()
+
+    adapter = client.session.get_adapter("https://api.twilio.com")
+    assert isinstance(adapter, http_transport.PooledHTTPAdapter)
+    assert adapter._pool_maxsize == 25
+    assert client.timeout == (http_transport.DEFAULT_CONNECT_TIMEOUT_SECONDS, 4.0)
+    # Connection failures retry; a sent message create is never replayed
+    assert adapter.max_retries.connect == 3
+    assert "POST" not in adapter.max_retries.allowed_methods
+
+
+def test_credential_refresh_keeps_the_shared_transport(monkeypatch):
+    monkeypatch.setattr(
+        twilio_client,
+        "get_twilio_secrets",
+        lambda: {"account_sid": "ACxxx", "auth_token": "token", "msid": "MGxxx"},
+    )
+    monkeypatch.setattr(http_transport, "_http_client", None)
+
+    first, _ = twilio_client.build_client()
+    second, _ = twilio_client.build_client()
+
+    assert first is not second
+    assert first.http_client is second.http_client is http_transport.get_http_client()
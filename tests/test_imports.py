@@ -0,0 +1,53 @@
+import subprocess
+import sys
+
+import pytest
+
+from bench import imports
+
+HEAVY = ("boto3", "botocore", "twilio")
+
+_LOADED = (
+    "import sys, {handler}; "
+    "print(' '.join(sorted({{m.split('.')[0] for m in sys.modules}} & set(sys.argv[1:]))))"
+)
+
+
+def _heavy_modules_loaded_by(handler):
+    proc = subprocess.run(
+        [sys.executable, "-c", _LOADED.format(handler=handler), *HEAVY],
+        cwd=imports.SRC_DIR,
+        env=dict(imports.IMPORT_ENV, PYTHONPATH=imports.SRC_DIR),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return set(proc.stdout.split())
+
+
+@pytest.mark.parametrize("handler", ["health", "status", "status_consumer"])
+def test_light_handlers_import_no_sdks(handler):
+    assert _heavy_modules_loaded_by(handler) == set()
+
+
+@pytest.mark.parametrize("handler", ["ingest", "worker"])
+def test_twilio_sdk_loads_on_first_send_not_import(handler):
+    assert "twilio" not in _heavy_modules_loaded_by(handler)
+
+
+def test_parse_importtime_keeps_only_the_handler_tree():
+    stderr = "\n".join(
+        [
+            "import time: self [us] | cumulative | imported package",
+            "import time:       900 |        900 | site",
+            "import time:       100 |        100 |     utils.logger",
+            "import time:        50 |        150 |   utils",
+            "import time:        20 |        170 | health",
+        ]
+    )
+    rows = imports.parse_importtime(stderr)
+    assert rows[1] == (100, 100, 2, "utils.logger")
+
+    summary = imports.summarize(rows[1:])
+    assert summary["total_ms"] == 0.17
+    assert summary["by_package_ms"] == {"utils": 0.15, "health": 0.02}
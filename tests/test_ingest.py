@@ -1,9 +1,8 @@
 import json
 import os
-import types
 import importlib
 
-# Target under test: src/ingest.lambda_handler
+# Target under test: ingest.lambda_handler
 # We will monkeypatch:
 #  - utils.secrets.get_twilio_secrets
 #  - utils.twilio_client.build_client
@@ -16,9 +15,7 @@ class StubTwilioMsg:
 class StubTwilioClient:
     def __init__(self):
         self._sent = []
-
-    def messages(self):
-        return self
+        self.messages = self
 
     # Twilio SDK uses .messages.create(...). We implement create directly.
     def create(self, to, messaging_service_sid, body):
@@ -27,8 +24,11 @@ class StubTwilioClient:
         return StubTwilioMsg()
 
 class StubSQS:
-    def __init__(self):
+    def __init__(self, fail_once=(), sender_fault=()):
         self.sent = []
+        self.batch_calls = []
+        self.fail_once = set(fail_once)
+        self.sender_fault = set(sender_fault)
 
     def send_message(self, QueueUrl, MessageBody, DelaySeconds):
         self.sent.append({
@@ -38,6 +38,25 @@ class StubSQS:
         })
         return {"MessageId": "123"}
 
+    def send_message_batch(self, QueueUrl, Entries):
+        self.batch_calls.append([e["Id"] for e in Entries])
+        ok, failed = [], []
+        for e in Entries:
+            body = json.loads(e["MessageBody"])
+            if body["event_id"] in self.sender_fault:
+                failed.append({"Id": e["Id"], "SenderFault": True, "Code": "InvalidParameterValue"})
+            elif body["event_id"] in self.fail_once:
+                self.fail_once.discard(body["event_id"])
+                failed.append({"Id": e["Id"], "SenderFault": False, "Code": "InternalError"})
+            else:
+                self.sent.append({
+                    "QueueUrl": QueueUrl,
+                    "MessageBody": e["MessageBody"],
+                    "DelaySeconds": e["DelaySeconds"],
+                })
+                ok.append({"Id": e["Id"], "MessageId": f"mid-{e['Id']}"})
+        return {"Successful": ok, "Failed": failed}
+
 def _load_event(path):
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
@@ -57,43 +76,40 @@ def test_ingest_in_transit(monkeypatch, tmp_path):
             "msid": "MGxxxxxxxxxxxxxxxxxxxxx",
             "bearer": "test-bearer"
         }
-    monkeypatch.setattr("src.utils.secrets.get_twilio_secrets", fake_get_twilio_secrets, raising=True)
+    monkeypatch.setattr("utils.secrets.get_twilio_secrets", fake_get_twilio_secrets, raising=True)
 
     # Monkeypatch Twilio client builder
     stub_twilio = StubTwilioClient()
     def fake_build_client():
         return stub_twilio, {"TWILIO_MSID": "MGxxxxxxxxxxxxxxxxxxxxx", "msid": "MGxxxxxxxxxxxxxxxxxxxxx"}
-    monkeypatch.setattr("src.utils.twilio_client.build_client", fake_build_client, raising=True)
+    monkeypatch.setattr("utils.twilio_client.build_client", fake_build_client, raising=True)
 
     # Monkeypatch boto3 SQS client used inside ingest
     stub_sqs = StubSQS()
-    class FakeBoto3:
-        def client(self, name):
-            assert name == "sqs"
-            return stub_sqs
-    monkeypatch.setattr("src.ingest.boto3", FakeBoto3(), raising=True)
+    def fake_client(name, **kwargs):
+        assert name == "sqs"
+        return stub_sqs
+    monkeypatch.setattr("boto3.client", fake_client, raising=True)
 
     # Import (or reload) target
-    ingest = importlib.reload(importlib.import_module("src.ingest"))
+    ingest = importlib.reload(importlib.import_module("ingest"))
 
-    # Load sample API Gateway event (in-transit → immediate send)
+    # Load sample API Gateway event (in-transit → instant, via the queue)
     event = _load_event("tests/events/api_ingest_in_transit.json")
 
     # Act
     resp = ingest.lambda_handler(event, None)
 
     # Assert
-    assert resp["statusCode"] == 200
-    body = json.loads(resp["body"])
-    assert "sid" in body
-    # Ensure Twilio send happened exactly once
-    assert len(stub_twilio._sent) == 1
-    sent = stub_twilio._sent[0]
-    assert sent["to"] == "+15555550123"
-    assert sent["msid"].startswith("MG")
-    assert "Ta-dah! Your advance is being sent" in sent["body"]
-    # Ensure no SQS usage for in_transit
-    assert len(stub_sqs.sent) == 0
+    assert resp["statusCode"] == 202
+    # Ingest never waits on Twilio; the Worker sends the SMS
+    assert len(stub_twilio._sent) == 0
+    assert len(stub_sqs.sent) == 1
+    m = stub_sqs.sent[0]
+    assert m["DelaySeconds"] == 0
+    body = json.loads(m["MessageBody"])
+    assert body["event"] == "advance_in_transit"
+    assert body["user"]["phone"] == "+15555550123"
 
 def test_ingest_approved_enqueues(monkeypatch):
     # Arrange env
@@ -110,24 +126,23 @@ def test_ingest_approved_enqueues(monkeypatch):
             "msid": "MGxxxxxxxxxxxxxxxxxxxxx",
             "bearer": "test-bearer"
         }
-    monkeypatch.setattr("src.utils.secrets.get_twilio_secrets", fake_get_twilio_secrets, raising=True)
+    monkeypatch.setattr("utils.secrets.get_twilio_secrets", fake_get_twilio_secrets, raising=True)
 
     # Monkeypatch Twilio client builder
     stub_twilio = StubTwilioClient()
     def fake_build_client():
         return stub_twilio, {"TWILIO_MSID": "MGxxxxxxxxxxxxxxxxxxxxx", "msid": "MGxxxxxxxxxxxxxxxxxxxxx"}
-    monkeypatch.setattr("src.utils.twilio_client.build_client", fake_build_client, raising=True)
+    monkeypatch.setattr("utils.twilio_client.build_client", fake_build_client, raising=True)
 
     # Monkeypatch boto3 SQS client used inside ingest
     stub_sqs = StubSQS()
-    class FakeBoto3:
-        def client(self, name):
-            assert name == "sqs"
-            return stub_sqs
-    monkeypatch.setattr("src.ingest.boto3", FakeBoto3(), raising=True)
+    def fake_client(name, **kwargs):
+        assert name == "sqs"
+        return stub_sqs
+    monkeypatch.setattr("boto3.client", fake_client, raising=True)
 
     # Reload target
-    ingest = importlib.reload(importlib.import_module("src.ingest"))
+    ingest = importlib.reload(importlib.import_module("ingest"))
 
     # Load sample API Gateway event (approved → enqueue)
     event = _load_event("tests/events/api_ingest_approved.json")
@@ -144,5 +159,274 @@ def test_ingest_approved_enqueues(monkeypatch):
     m = stub_sqs.sent[0]
     assert m["DelaySeconds"] == 120
     body = json.loads(m["MessageBody"])
-    assert body["phone"] == "+15555550123"
+    assert body["user"]["phone"] == "+15555550123"
     assert body["amount"] == 185.0
+
+def _load_ingest(monkeypatch, stub_sqs, stub_twilio=None):
+    os.environ["APPROVED_QUEUE_URL"] = "https://sqs.us-east-1.amazonaws.com/471448382674/payslice-approved-queue"
+    os.environ["APPROVED_DELAY_SECONDS"] = "120"
+    os.environ["IDEMPOTENCY_TABLE"] = "payslice-sms-idempotency"
+
+    stub_twilio = stub_twilio or StubTwilioClient()
+    monkeypatch.setattr(
+        "utils.twilio_client.build_client",
+        lambda: (stub_twilio, {"messaging_service_sid": "MGxxxxxxxxxxxxxxxxxxxxx"}),
+        raising=True,
+    )
+    monkeypatch.setattr("boto3.client", lambda name, **kwargs: stub_sqs, raising=True)
+    return importlib.reload(importlib.import_module("ingest"))
+
+def _batch_event(events):
+    return {"body": json.dumps(events)}
+
+def test_ingest_batch_enqueues_in_chunks(monkeypatch):
+    stub_sqs = StubSQS()
+    ingest = _load_ingest(monkeypatch, stub_sqs)
+    monkeypatch.setattr(ingest, "ENQUEUE_RETRY_BASE_SECONDS", 0)
+
+    events = [
+        {"event_id": f"e-{i}", "event": "advance_approved", "user": {"phone": "+15555550123"}, "amount": 10 + i}
+        for i in range(23)
+    ]
+    events.append({"event_id": "e-bad", "event": "advance_approved", "user": {}})
+
+    resp = ingest.lambda_handler(_batch_event({"events": events}), None)
+
+    assert resp["statusCode"] == 207
+    body = json.loads(resp["body"])
+    assert body["queued"] == 23
+    assert body["rejected"] == 1
+    assert body["results"][23]["error"] == "missing_required_fields"
+    assert sorted(len(call) for call in stub_sqs.batch_calls) == [3, 10, 10]
+    assert all(m["DelaySeconds"] == 120 for m in stub_sqs.sent)
+
+def test_ingest_batch_retries_transient_failures(monkeypatch):
+    stub_sqs = StubSQS(fail_once={"e-1"}, sender_fault={"e-2"})
+    ingest = _load_ingest(monkeypatch, stub_sqs)
+    monkeypatch.setattr(ingest, "ENQUEUE_RETRY_BASE_SECONDS", 0)
+
+    events = [
+        {"event_id": f"e-{i}", "event": "advance_in_transit", "user": {"phone": "+15555550123"}, "amount": 5}
+        for i in range(3)
+    ]
+    resp = ingest.lambda_handler(_batch_event(events), None)
+
+    body = json.loads(resp["body"])
+    assert [r["status"] for r in body["results"]] == ["queued", "queued", "failed"]
+    assert body["results"][2]["error"] == "InvalidParameterValue"
+    assert stub_sqs.batch_calls == [["0-0", "1-0", "2-0"], ["1-0"]]
+    assert all(m["DelaySeconds"] == 0 for m in stub_sqs.sent)
+
+def test_ingest_send_in_transit_now_is_enqueued_with_event(monkeypatch):
+    stub_sqs = StubSQS()
+    stub_twilio = StubTwilioClient()
+    ingest = _load_ingest(monkeypatch, stub_sqs, stub_twilio)
+
+    payload = {
+        "event_id": "e-9",
+        "event": "advance_approved",
+        "user": {"phone": "+15555550123"},
+        "amount": 50,
+        "send_in_transit_now": True,
+    }
+    resp = ingest.lambda_handler({"body": json.dumps(payload)}, None)
+
+    assert resp["statusCode"] == 202
+    assert stub_twilio._sent == []
+    # One SendMessageBatch call carrying both the instant and delayed SMS
+    assert len(stub_sqs.batch_calls) == 1
+    sent = [(json.loads(m["MessageBody"]), m["DelaySeconds"]) for m in stub_sqs.sent]
+    assert [(b["event"], b["event_id"], d) for b, d in sent] == [
+        ("advance_in_transit", "e-9:advance_in_transit", 0),
+        ("advance_approved", "e-9", 120),
+    ]
+
+def test_ingest_inline_mode_sends_in_transit_directly(monkeypatch):
+    monkeypatch.setenv("INSTANT_SEND_MODE", "inline")
+    stub_sqs = StubSQS()
+    stub_twilio = StubTwilioClient()
+    ingest = _load_ingest(monkeypatch, stub_sqs, stub_twilio)
+
+    payload = {
+        "event_id": "e-10",
+        "event": "advance_approved",
+        "user": {"phone": "+15555550123"},
+        "amount": 50,
+        "send_in_transit_now": True,
+    }
+    resp = ingest.lambda_handler({"body": json.dumps(payload)}, None)
+
+    assert resp["statusCode"] == 202
+    assert len(stub_twilio._sent) == 1
+    assert len(stub_sqs.sent) == 1
+
+def test_ingest_acknowledges_already_sent_event(monkeypatch, fake_dynamodb):
+    stub_sqs = StubSQS()
+    ingest = _load_ingest(monkeypatch, stub_sqs)
+    fake_dynamodb.tables["payslice-sms-idempotency"] = {
+        "e-7": {"id": {"S": "e-7"}, "status": {"S": "completed"}, "expires_at": {"N": "9999999999"}},
+    }
+
+    payload = {"event_id": "e-7", "event": "advance_approved", "user": {"phone": "+15555550123"}, "amount": 5}
+    resp = ingest.lambda_handler({"body": json.dumps(payload)}, None)
+
+    assert resp["statusCode"] == 200
+    assert json.loads(resp["body"]) == {"queued": False, "duplicate": True}
+    assert stub_sqs.sent == []
+
+def test_ingest_schedules_sends_beyond_the_sqs_delay(monkeypatch):
+    import time
+
+    from utils.scheduler import InMemoryScheduleStore, Scheduler
+
+    stub_sqs = StubSQS()
+    ingest = _load_ingest(monkeypatch, stub_sqs)
+    monkeypatch.setattr(ingest, "scheduler", Scheduler(InMemoryScheduleStore()))
+
+    send_at = int(time.time()) + 3 * 3600
+    payload = {
+        "event_id": "e-11",
+        "event": "advance_approved",
+        "user": {"phone": "+15555550123"},
+        "amount": 50,
+        "send_at": send_at,
+        "send_in_transit_now": True,
+    }
+    resp = ingest.lambda_handler({"body": json.dumps(payload)}, None)
+
+    assert resp["statusCode"] == 202
+    assert json.loads(resp["body"]) == {"queued": True, "scheduled": True, "send_at": send_at}
+    # The instant SMS still goes straight to SQS; the approved one waits in the index
+    assert [json.loads(m["MessageBody"])["event"] for m in stub_sqs.sent] == ["advance_in_transit"]
+    assert ingest.scheduler.store.pending() == 1
+
+    # Within SQS's range send_at becomes DelaySeconds
+    payload.update({"event_id": "e-12", "send_at": time.time() + 300, "send_in_transit_now": False})
+    ingest.lambda_handler({"body": json.dumps(payload)}, None)
+    assert 299 <= stub_sqs.sent[-1]["DelaySeconds"] <= 301
+
+def test_ingest_rejects_unschedulable_send_at(monkeypatch):
+    stub_sqs = StubSQS()
+    ingest = _load_ingest(monkeypatch, stub_sqs)
+    monkeypatch.setattr(ingest, "scheduler", None)
+
+    base = {"event": "advance_approved", "user": {"phone": "+15555550123"}, "amount": 5}
+    for send_at, error in [
+        ("2030-01-01T09:00:00", "invalid_send_at"),
+        ("2099-01-01T09:00:00-05:00", "scheduling_unavailable"),
+    ]:
+        resp = ingest.lambda_handler({"body": json.dumps({**base, "send_at": send_at})}, None)
+        assert resp["statusCode"] == 400
+        assert json.loads(resp["body"]) == {"error": error}
+    assert stub_sqs.sent == []
+
+def test_ingest_routes_each_event_to_its_lane_queue(monkeypatch):
+    monkeypatch.setenv("INSTANT_QUEUE_URL", "https://sqs.us-east-1.amazonaws.com/471448382674/payslice-instant-queue")
+    stub_sqs = StubSQS()
+    ingest = _load_ingest(monkeypatch, stub_sqs)
+
+    events = [
+        {"event_id": "e-1", "event": "advance_approved", "user": {"phone": "+15555550123"}, "amount": 5,
+         "send_in_transit_now": True},
+        {"event_id": "e-2", "event": "advance_in_transit", "user": {"phone": "+15555550123"}},
+    ]
+    resp = ingest.lambda_handler(_batch_event(events), None)
+
+    assert resp["statusCode"] == 202
+    # One SendMessageBatch per lane, never mixed
+    assert sorted(stub_sqs.batch_calls) == [["0-0", "1-0"], ["0-1"]]
+    routed = sorted((m["QueueUrl"].rsplit("/", 1)[1], json.loads(m["MessageBody"])["event_id"]) for m in stub_sqs.sent)
+    assert routed == [
+        ("payslice-approved-queue", "e-1"),
+        ("payslice-instant-queue", "e-1:advance_in_transit"),
+        ("payslice-instant-queue", "e-2"),
+    ]
+    assert all("due_at_ms" in json.loads(m["MessageBody"]) for m in stub_sqs.sent)
+
+def _load_ingest_with_auth(monkeypatch, secret):
+    monkeypatch.setenv("INGEST_AUTH_REQUIRED", "true")
+    monkeypatch.setenv("INGEST_AUTH_MAX_REJECTIONS", "3")
+    monkeypatch.setenv("APPROVED_QUEUE_URL", "https://sqs/approved")
+    monkeypatch.setattr("utils.secrets.get_twilio_secrets", lambda: dict(secret), raising=True)
+    stub_sqs = StubSQS()
+    monkeypatch.setattr("boto3.client", lambda name, **kwargs: stub_sqs, raising=True)
+    return importlib.reload(importlib.import_module("ingest")), stub_sqs
+
+def _with_token(token, ip="203.0.113.7"):
+    event = _load_event("tests/events/api_ingest_approved.json")
+    event["requestContext"]["http"]["sourceIp"] = ip
+    if token is None:
+        del event["headers"]["authorization"]
+    else:
+        event["headers"]["authorization"] = f"Bearer {token}"
+    return event
+
+def test_ingest_rejects_unauthenticated_requests_and_throttles_the_client(monkeypatch, caplog):
+    ingest, stub_sqs = _load_ingest_with_auth(monkeypatch, {"bearer": "test-bearer"})
+
+    assert ingest.lambda_handler(_with_token(None), None)["statusCode"] == 401
+    assert ingest.lambda_handler(_with_token("guess-1"), None)["statusCode"] == 401
+    # Rejected before the body is parsed or the request is logged
+    assert "ingest.lambda_start" not in caplog.text
+    assert stub_sqs.sent == []
+
+    assert ingest.lambda_handler(_with_token("test-bearer"), None)["statusCode"] == 202
+    assert "ingest.lambda_start" in caplog.text
+
+    assert ingest.lambda_handler(_with_token("guess-2"), None)["statusCode"] == 401
+    # Third rejection in the window: the client is now turned away outright,
+    # even with a valid token, while other clients are unaffected
+    resp = ingest.lambda_handler(_with_token("test-bearer"), None)
+    assert resp["statusCode"] == 429
+    assert resp["headers"]["Retry-After"] == "60"
+    assert ingest.lambda_handler(_with_token("test-bearer", ip="198.51.100.1"), None)["statusCode"] == 202
+    assert ingest.authenticator.tracker.rejections("203.0.113.7") == 3
+
+def test_ingest_accepts_every_active_token_during_rotation(monkeypatch):
+    secret = {"bearer": "old-token", "bearers": ["new-token"]}
+    ingest, _ = _load_ingest_with_auth(monkeypatch, secret)
+
+    assert ingest.lambda_handler(_with_token("old-token"), None)["statusCode"] == 202
+    assert ingest.lambda_handler(_with_token("new-token"), None)["statusCode"] == 202
+
+    # Rotation finished in Secrets Manager mid-TTL: the retired token stops
+    # working once the key set reloads on an unknown token
+    secret.update({"bearer": "newer-token", "bearers": []})
+    monkeypatch.setattr("utils.secrets.get_twilio_secrets", lambda: dict(secret), raising=True)
+    ingest.authenticator.keys.min_reload_seconds = 0
+    assert ingest.lambda_handler(_with_token("newer-token"), None)["statusCode"] == 202
+    assert ingest.lambda_handler(_with_token("old-token"), None)["statusCode"] == 401
+
+def test_ingest_normalizes_and_validates_phone_numbers(monkeypatch, tmp_path):
+    table = tmp_path / "line_types.csv"
+    table.write_text("+1305306,landline\n")
+    monkeypatch.setenv("PHONE_LINE_TYPES_FILE", str(table))
+    monkeypatch.setenv("APPROVED_QUEUE_URL", "https://sqs/approved")
+    from utils import phone
+    phone.reset()
+    stub_sqs = StubSQS()
+    monkeypatch.setattr("boto3.client", lambda name, **kwargs: stub_sqs, raising=True)
+    ingest = importlib.reload(importlib.import_module("ingest"))
+
+    base = {"event": "advance_approved", "amount": 5}
+    try:
+        resp = ingest.lambda_handler({"body": json.dumps({**base, "event_id": "e-1", "user": {"phone": "(555) 555-0123"}})}, None)
+        assert resp["statusCode"] == 202
+        assert json.loads(stub_sqs.sent[0]["MessageBody"])["user"]["phone"] == "+15555550123"
+
+        resp = ingest.lambda_handler({"body": json.dumps({**base, "event_id": "e-2", "user": {"phone": "+1555"}})}, None)
+        assert resp["statusCode"] == 400
+        assert json.loads(resp["body"]) == {"error": "invalid_phone", "fields": ["user.phone"]}
+
+        events = [
+            {**base, "event_id": "e-3", "user": {"phone": "+13053061525"}},
+            {**base, "event_id": "e-4", "user": {"phone": "+15555550124"}},
+        ]
+        body = json.loads(ingest.lambda_handler({"body": json.dumps(events)}, None)["body"])
+        assert [(r["status"], r.get("error")) for r in body["results"]] == [
+            ("rejected", "unsupported_line_type"),
+            ("queued", None),
+        ]
+        assert len(stub_sqs.sent) == 2
+    finally:
+        phone.reset()
@@ -0,0 +1,30 @@
+from utils import lanes
+
+# Target under test: utils.lanes (event type → priority lane → queue)
+
+
+def test_default_routes_send_in_transit_to_the_instant_lane(monkeypatch):
+    monkeypatch.delenv("LANE_ROUTES", raising=False)
+    assert lanes.lane_for("advance_in_transit") == lanes.LANE_INSTANT
+    assert lanes.lane_for("advance_approved") == lanes.LANE_STANDARD
+    assert lanes.lane_for(None) == lanes.LANE_STANDARD
+
+
+def test_route_overrides_and_queue_fallback(monkeypatch):
+    monkeypatch.setenv("LANE_ROUTES", "advance_approved=bulk, bogus")
+    monkeypatch.setenv("APPROVED_QUEUE_URL", "https://sqs/approved")
+    monkeypatch.delenv("BULK_QUEUE_URL", raising=False)
+    monkeypatch.setenv("INSTANT_QUEUE_URL", "https://sqs/instant")
+
+    assert lanes.lane_for("advance_approved") == "bulk"
+    assert lanes.lane_for("advance_in_transit") == lanes.LANE_INSTANT
+    # A lane without a queue of its own shares the standard queue
+    assert lanes.queue_url_for("bulk") == "https://sqs/approved"
+    assert lanes.queue_url_for(lanes.LANE_INSTANT) == "https://sqs/instant"
+
+
+def test_dwell_slo_per_lane(monkeypatch):
+    monkeypatch.setenv("LANE_DWELL_SLO_MS_INSTANT", "500")
+    assert lanes.dwell_slo_ms(lanes.LANE_INSTANT) == 500
+    assert lanes.dwell_slo_ms(lanes.LANE_STANDARD) == lanes.DEFAULT_DWELL_SLO_MS[lanes.LANE_STANDARD]
+    assert lanes.dwell_slo_ms("bulk") == lanes.DEFAULT_DWELL_SLO_MS[lanes.LANE_STANDARD]
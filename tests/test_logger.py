@@ -0,0 +1,51 @@
+import io
+import json
+import logging
+
+from utils.logger import BufferedStreamHandler, JsonFormatter, SamplingFilter
+
+# Target under test: utils.logger
+
+def _record(msg, level=logging.INFO, args=(), **extra):
+    record = logging.LogRecord("worker", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+def test_formatter_keeps_extra_and_flattens_fields():
+    line = JsonFormatter().format(
+        _record("ingest.enqueued", queue_url="https://q", fields={"message_sid": "SM1"})
+    )
+    payload = json.loads(line)
+
+    assert payload["message"] == "ingest.enqueued"
+    assert payload["queue_url"] == "https://q"
+    assert payload["message_sid"] == "SM1"
+    assert payload["level"] == "INFO"
+    assert payload["timestamp"].endswith("+0000")
+
+def test_formatter_serializes_unknown_types():
+    payload = json.loads(JsonFormatter().format(_record("x", when=object)))
+    assert "object" in payload["when"]
+
+def test_sampling_filter_only_samples_listed_info_events():
+    drop_all = SamplingFilter(0.0, frozenset({"worker.twilio_sent"}))
+
+    assert not drop_all.filter(_record("worker.twilio_sent: sid=%s", args=("SM1",)))
+    assert drop_all.filter(_record("worker.batch_complete: records=%d", args=(1,)))
+    assert drop_all.filter(_record("worker.twilio_sent: sid=%s", level=logging.ERROR, args=("SM1",)))
+
+def test_buffered_handler_writes_once_per_flush():
+    stream = io.StringIO()
+    handler = BufferedStreamHandler(stream, capacity=100)
+    handler.setFormatter(JsonFormatter())
+
+    handler.emit(_record("a"))
+    handler.emit(_record("b"))
+    assert stream.getvalue() == ""
+
+    handler.flush()
+    assert [json.loads(l)["message"] for l in stream.getvalue().splitlines()] == ["a", "b"]
+
+    # Errors are never held back
+    handler.emit(_record("boom", level=logging.ERROR))
+    assert "boom" in stream.getvalue()
@@ -0,0 +1,69 @@
+import io
+import json
+
+from utils import metrics as metrics_mod
+
+# Target under test: utils.metrics (EMF recorder)
+
+
+def _docs(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_flush_writes_one_emf_document_per_dimension_set():
+    stream = io.StringIO()
+    m = metrics_mod.Metrics("PaySliceSms", "worker", service="payslice-sms", stream=stream, clock=lambda: 12.5)
+
+    m.count("Records", dimensions={"Outcome": "sent"})
+    m.count("Records", 2, dimensions={"Outcome": "sent"})
+    m.observe("TwilioSendLatency", 81.25)
+    m.observe("TwilioSendLatency", 120.0)
+    m.gauge("CircuitBreakerState", 2)
+    m.flush()
+
+    docs = sorted(_docs(stream), key=lambda d: "Outcome" in d)
+    plain, outcome = docs
+    assert plain["TwilioSendLatency"] == [81.25, 120.0]
+    assert plain["CircuitBreakerState"] == 2
+    assert plain["Function"] == "worker" and plain["Service"] == "payslice-sms"
+    definition = plain["_aws"]["CloudWatchMetrics"][0]
+    assert plain["_aws"]["Timestamp"] == 12500
+    assert definition["Namespace"] == "PaySliceSms"
+    assert definition["Dimensions"] == [["Function", "Service"]]
+    assert {"Name": "TwilioSendLatency", "Unit": "Milliseconds"} in definition["Metrics"]
+
+    assert outcome["Records"] == 3 and outcome["Outcome"] == "sent"
+    assert outcome["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [["Function", "Outcome", "Service"]]
+
+    # Flushed state is reset; an empty flush writes nothing
+    m.flush()
+    assert len(_docs(stream)) == 2
+
+
+def test_observations_past_the_emf_limit_spill_into_more_documents():
+    stream = io.StringIO()
+    m = metrics_mod.Metrics("ns", "ingest", stream=stream)
+    for i in range(250):
+        m.observe("SqsEnqueueLatency", i)
+    m.count("Requests")
+    m.flush()
+
+    docs = _docs(stream)
+    assert [len(d["SqsEnqueueLatency"]) for d in docs] == [100, 100, 50]
+    assert [("Requests" in d) for d in docs] == [True, False, False]
+
+
+def test_disabled_without_namespace_or_when_switched_off(monkeypatch):
+    monkeypatch.delenv("POWERTOOLS_METRICS_NAMESPACE", raising=False)
+    assert isinstance(metrics_mod.get_metrics("worker"), metrics_mod.NullMetrics)
+
+    monkeypatch.setenv("POWERTOOLS_METRICS_NAMESPACE", "PaySliceSms")
+    monkeypatch.setenv("METRICS_ENABLED", "false")
+    null = metrics_mod.get_metrics("worker")
+    assert not null.enabled
+    with null.timer("Anything"):
+        null.count("Anything")
+    null.flush()
+
+    monkeypatch.setenv("METRICS_ENABLED", "true")
+    assert metrics_mod.get_metrics("worker").enabled
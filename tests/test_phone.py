@@ -0,0 +1,65 @@
+import pytest
+
+from utils import phone
+from utils.phone import InvalidPhone, LineTypeTable, PhoneValidator, normalize
+
+
+@pytest.mark.parametrize(
+    "raw, expected",
+    [
+        ("+15555550123", "+15555550123"),
+        ("+1 (555) 555-0123", "+15555550123"),
+        ("555.555.0123", "+15555550123"),
+        ("15555550123", "+15555550123"),
+        ("0044 20 7946 0958", "+442079460958"),
+    ],
+)
+def test_normalize_to_e164(raw, expected):
+    assert normalize(raw) == expected
+
+
+@pytest.mark.parametrize(
+    "raw, reason",
+    [
+        ("call me", phone.INVALID_CHARACTERS),
+        ("+1555555O123", phone.INVALID_CHARACTERS),
+        ("+0123456789", phone.INVALID_COUNTRY_CODE),
+        ("+1555", phone.INVALID_LENGTH),
+        ("+1234567890123456", phone.INVALID_LENGTH),
+        ("+15550550123", phone.INVALID_NANP),
+        ("+10555550123", phone.INVALID_NANP),
+    ],
+)
+def test_normalize_rejects_malformed_numbers(raw, reason):
+    with pytest.raises(InvalidPhone) as e:
+        normalize(raw)
+    assert e.value.reason == reason
+
+
+def test_validator_applies_line_types_and_caches(tmp_path, monkeypatch):
+    table = tmp_path / "line_types.csv"
+    table.write_text("# prefix,line type\n+1555555,mobile\n+1305306,landline\n+13053061,voip\n")
+    monkeypatch.setenv("PHONE_LINE_TYPES_FILE", str(table))
+    validator = phone.from_env()
+
+    assert validator.check("+1 555 555 0123") == ("+15555550123", "mobile")
+    assert validator.check("+13053061525") == ("+13053061525", "voip")  # longest prefix wins
+    assert validator.check("+12125550123") == ("+12125550123", None)
+    with pytest.raises(InvalidPhone) as e:
+        validator.check("+13053069999")
+    assert (e.value.reason, e.value.line_type) == (phone.UNSUPPORTED_LINE_TYPE, "landline")
+
+    # Repeats (valid or not) are answered from the LRU
+    with pytest.raises(InvalidPhone):
+        validator.check("+13053069999")
+    assert validator.check("+1 555 555 0123")[0] == "+15555550123"
+    assert validator.cache_info().hits == 2
+
+
+def test_line_type_table_lookup_without_match():
+    table = LineTypeTable({"+44": "mobile"})
+    assert table.lookup("+15555550123") is None
+    assert PhoneValidator(line_types=table, reject_line_types=frozenset()).check("+447700900123") == (
+        "+447700900123",
+        "mobile",
+    )
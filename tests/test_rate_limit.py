@@ -0,0 +1,70 @@
+import pytest
+
+from utils.rate_limit import InMemoryTokenBucketStore, RateLimiter, RateLimitExceeded
+
+# Target under test: utils.rate_limit.RateLimiter with the in-memory store
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+def test_global_bucket_waits_for_tokens():
+    clock = FakeClock()
+    limiter = RateLimiter(
+        InMemoryTokenBucketStore(clock=clock),
+        global_rate=10,
+        global_burst=2,
+        max_wait=1.0,
+        sleep=clock.sleep,
+    )
+
+    for _ in range(4):
+        limiter.acquire("+15555550123")
+
+    # Burst of 2 is free, the next two each wait 1/10 s for a refill
+    assert clock.now == pytest.approx(0.2)
+
+def test_global_bucket_gives_up_after_max_wait():
+    clock = FakeClock()
+    limiter = RateLimiter(
+        InMemoryTokenBucketStore(clock=clock),
+        global_rate=1,
+        max_wait=0.5,
+        sleep=clock.sleep,
+    )
+
+    limiter.acquire()
+    with pytest.raises(RateLimitExceeded) as exc:
+        limiter.acquire()
+    assert exc.value.scope == "global"
+
+def test_per_phone_bucket_defers_bursts_to_one_number():
+    clock = FakeClock()
+    limiter = RateLimiter(InMemoryTokenBucketStore(clock=clock), phone_rate=1 / 60, phone_burst=1)
+
+    limiter.acquire("+15555550001")
+    limiter.acquire("+15555550002")
+    with pytest.raises(RateLimitExceeded) as exc:
+        limiter.acquire("+15555550001")
+    assert exc.value.scope == "phone"
+
+    clock.now = 60
+    limiter.acquire("+15555550001")
+
+def test_scoped_global_buckets_do_not_share_tokens():
+    clock = FakeClock()
+    store = InMemoryTokenBucketStore(clock=clock)
+    standard = RateLimiter(store, global_rate=1, global_key="ratelimit#global#standard")
+    instant = RateLimiter(store, global_rate=1, global_key="ratelimit#global#instant")
+
+    standard.acquire()
+    with pytest.raises(RateLimitExceeded):
+        standard.acquire()
+    # A drained standard lane leaves the instant lane's share untouched
+    instant.acquire()
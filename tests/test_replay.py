@@ -0,0 +1,148 @@
+import json
+import time
+
+from botocore.exceptions import ClientError
+
+import replay
+from bench.fakes import FakeSQS
+from utils import idempotency
+
+DLQ = "https://sqs.local/dlq"
+APPROVED = "https://sqs.local/approved"
+INSTANT = "https://sqs.local/instant"
+
+
+def _dead(sqs, event_id, event="advance_approved", **extra):
+    body = {"event_id": event_id, "event": event, "user": {"phone": "+15555550123"}, "amount": 185.0, **extra}
+    sqs.send_message(QueueUrl=DLQ, MessageBody=json.dumps(body))
+
+
+def _run(sqs, filters, **kwargs):
+    return replay.replay(
+        filters, time.time() + 30, dlq_url=DLQ, queue_url=APPROVED, rate_per_second=1000, client=sqs, **kwargs
+    )
+
+
+def _bodies(sqs, url):
+    return [json.loads(r["body"]) for r in sqs.receive(url, max_records=100)]
+
+
+def test_replay_redrives_to_lane_queues_and_deletes(monkeypatch):
+    monkeypatch.setenv("INSTANT_QUEUE_URL", INSTANT)
+    sqs = FakeSQS()
+    _dead(sqs, "e-1", due_at_ms=1)
+    _dead(sqs, "e-2", event="advance_in_transit")
+    _dead(sqs, "e-3")                                       # sent after all
+    _dead(sqs, "e-4", event="advance_cancelled")            # filtered out
+    sqs.send_message(QueueUrl=DLQ, MessageBody=json.dumps({"MessageSid": "SM1", "MessageStatus": "failed"}))
+    idempotency.complete("e-3")
+
+    stats = _run(sqs, replay.ReplayFilter(events=["advance_approved", "advance_in_transit"]), pollers=2)
+
+    assert stats["received"] == 5
+    assert (stats["matched"], stats["skipped"], stats["unrecognized"]) == (3, 1, 1)
+    assert (stats["replayed"], stats["already_sent"], stats["deleted"]) == (2, 1, 3)
+    [approved] = _bodies(sqs, APPROVED)
+    assert approved["event_id"] == "e-1" and approved["due_at_ms"] > 1
+    assert [m["event_id"] for m in _bodies(sqs, INSTANT)] == ["e-2"]
+    # Skipped messages stay in the DLQ for a later run
+    assert sqs.depth(DLQ) == 2
+
+
+def test_replay_filters_on_recorded_error_class_and_dry_run():
+    now = [time.time()]
+    sqs = FakeSQS(clock=lambda: now[0])
+    for event_id in ("e-1", "e-2", "e-3"):
+        _dead(sqs, event_id)
+    idempotency.record_failure("e-1", "twilio_error")
+    idempotency.record_failure("e-2", "rate_limited")
+
+    dry = _run(sqs, replay.ReplayFilter(error_classes=["twilio_error", replay.ERROR_UNKNOWN]), dry_run=True)
+    assert (dry["matched"], dry["replayed"], dry["deleted"]) == (2, 0, 0)
+    assert sqs.depth(DLQ) == 3
+
+    now[0] += 3600  # past the dry run's visibility timeout
+    stats = _run(sqs, replay.ReplayFilter(error_classes=["twilio_error"]), max_messages=2)
+
+    assert (stats["received"], stats["matched"], stats["replayed"]) == (2, 1, 1)
+    assert [m["event_id"] for m in _bodies(sqs, APPROVED)] == ["e-1"]
+    assert sqs.depth(DLQ) == 2
+
+
+def _failing_receives(sqs, failures):
+    receive = sqs.receive_message
+    left = [failures]
+
+    def receive_message(**kwargs):
+        if left[0]:
+            left[0] -= 1
+            raise ClientError({"Error": {"Code": "ThrottlingException"}}, "ReceiveMessage")
+        return receive(**kwargs)
+
+    sqs.receive_message = receive_message
+
+
+def test_replay_retries_failed_receives_and_gives_up_with_partial_counts(monkeypatch):
+    monkeypatch.setattr(replay, "RECEIVE_RETRY_BASE_SECONDS", 0)
+    sqs = FakeSQS()
+    for event_id in ("e-1", "e-2", "e-3"):
+        _dead(sqs, event_id)
+
+    _failing_receives(sqs, 2)
+    stats = _run(sqs, replay.ReplayFilter(), pollers=1)
+    assert (stats["replayed"], stats["receive_failed"], stats["pollers_failed"]) == (3, 2, 0)
+
+    _dead(sqs, "e-4")
+    _failing_receives(sqs, 100)
+    stats = _run(sqs, replay.ReplayFilter(), pollers=1)
+    assert (stats["receive_failed"], stats["pollers_failed"]) == (replay.RECEIVE_ERRORS_TO_STOP, 1)
+    assert sqs.depth(DLQ) == 1
+
+
+def test_replay_counts_processing_errors_instead_of_raising(monkeypatch):
+    sqs = FakeSQS()
+    _dead(sqs, "e-1")
+
+    def unavailable(event_ids):
+        raise RuntimeError("idempotency table unavailable")
+
+    monkeypatch.setattr(idempotency, "completed_ids", unavailable)
+    stats = _run(sqs, replay.ReplayFilter(), pollers=1)
+
+    assert (stats["received"], stats["process_failed"], stats["replayed"]) == (1, 1, 0)
+    assert sqs.depth(DLQ) == 1
+
+
+def test_replay_charges_max_messages_for_messages_received():
+    sqs = FakeSQS()
+    for i in range(10):
+        _dead(sqs, f"e-{i}")
+    receive = sqs.receive_message
+    # SQS often returns fewer messages than asked for
+    sqs.receive_message = lambda **kwargs: receive(**dict(kwargs, MaxNumberOfMessages=min(3, kwargs["MaxNumberOfMessages"])))
+
+    stats = _run(sqs, replay.ReplayFilter(), pollers=1, max_messages=7)
+
+    assert (stats["received"], stats["replayed"]) == (7, 7)
+    assert sqs.depth(DLQ) == 3
+
+
+def test_replay_stops_at_deadline_instead_of_waiting_for_rate_tokens():
+    now = [time.time()]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    sqs = FakeSQS()
+    for i in range(5):
+        _dead(sqs, f"e-{i}")
+    replayer = replay.Replayer(
+        sqs, DLQ, replay.ReplayFilter(), now[0] + 1.5, default_queue_url=APPROVED,
+        rate_per_second=1, pollers=1, clock=lambda: now[0], sleep=sleep,
+    )
+    stats = replayer.run()
+
+    assert stats["received"] == 5
+    assert stats["replayed"] == stats["deleted"] < 5
+    assert now[0] < replayer.deadline
+    assert sqs.depth(DLQ) == 5 - stats["replayed"]
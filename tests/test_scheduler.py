@@ -0,0 +1,140 @@
+import importlib
+import json
+
+import pytest
+
+from utils import scheduler as scheduler_mod
+
+# Target under test: utils.scheduler (time-bucketed schedule index) and the
+# dispatcher Lambda that drains it.
+
+T0 = 1_699_999_980  # a bucket boundary (divisible by 60)
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class RecordingStore(scheduler_mod.InMemoryScheduleStore):
+    def __init__(self):
+        super().__init__(page_size=2)
+        self.queried = []
+
+    def due(self, partition, until_sort_key):
+        self.queried.append(partition)
+        return super().due(partition, until_sort_key)
+
+
+def _scheduler(clock, store=None, **kwargs):
+    kwargs.setdefault("shards", 2)
+    return scheduler_mod.Scheduler(store or RecordingStore(), clock=clock, **kwargs)
+
+
+def test_due_messages_are_enqueued_with_remaining_delay():
+    clock = Clock(T0)
+    sched = _scheduler(clock)
+    sched.schedule('{"n": 1}', T0 + 3600 + 20, schedule_id="e-1")
+    sched.schedule('{"n": 2}', T0 + 3600 + 50, schedule_id="e-2")
+    sched.schedule('{"n": 3}', T0 + 7200, schedule_id="e-3")
+
+    enqueued = []
+
+    def enqueue(entries):
+        enqueued.extend((e["schedule_id"], e["delay_seconds"]) for e in entries)
+        return []
+
+    stats = sched.dispatch(enqueue)
+    assert enqueued == [] and stats["due"] == 0
+
+    # Once both are within the lookahead (60s) they go out together, with
+    # SQS holding each until its send time
+    clock.now = T0 + 3600 - 10
+    stats = sched.dispatch(enqueue)
+    assert sorted(enqueued) == [("e-1", 30), ("e-2", 60)]
+    assert stats["dispatched"] == 2
+    assert sched.store.pending() == 1
+
+
+def test_dispatch_reads_only_buckets_between_cursor_and_now():
+    clock = Clock(T0)
+    store = RecordingStore()
+    sched = _scheduler(clock, store, max_buckets_per_run=5)
+    sched.dispatch(lambda entries: [])
+    assert store.get_cursor() == T0 + 60
+
+    # Ten minutes later: the run catches up at most five buckets
+    store.queried.clear()
+    clock.now = T0 + 600
+    stats = sched.dispatch(lambda entries: [])
+    assert stats["buckets"] == 5
+    assert store.queried == [f"{T0 + 60 * b}#{s}" for b in range(1, 6) for s in range(2)]
+    assert store.get_cursor() == T0 + 360
+
+    sched.dispatch(lambda entries: [])
+    assert store.get_cursor() == T0 + 660
+
+
+def test_failed_enqueue_stays_scheduled_and_holds_the_cursor():
+    clock = Clock(T0)
+    sched = _scheduler(clock)
+    sched.dispatch(lambda entries: [])
+    sched.schedule("{}", T0 + 1000, schedule_id="e-1")
+    sched.schedule("{}", T0 + 1010, schedule_id="e-2")
+
+    clock.now = T0 + 1100
+    stats = sched.dispatch(lambda entries: [e for e in entries if e["schedule_id"] == "e-2"])
+    assert (stats["dispatched"], stats["failed"]) == (1, 1)
+    assert sched.store.pending() == 1
+    assert sched.store.get_cursor() == T0 + 960
+
+    retried = []
+    sched.dispatch(lambda entries: retried.extend(e["schedule_id"] for e in entries) or [])
+    assert retried == ["e-2"]
+    assert sched.store.pending() == 0
+    assert sched.store.get_cursor() == T0 + 1140
+
+
+def test_schedule_rejects_send_times_out_of_range():
+    sched = _scheduler(Clock(T0), max_delay_seconds=86400)
+    with pytest.raises(ValueError):
+        sched.schedule("{}", T0 + 90)
+    with pytest.raises(ValueError):
+        sched.schedule("{}", T0 + 2 * 86400)
+    entry = sched.schedule("{}", T0 + 3600)
+    assert entry["partition"].startswith(f"{T0 + 3600}#")
+
+
+class StubSQS:
+    def __init__(self):
+        self.sent = []
+
+    def send_message_batch(self, QueueUrl, Entries):
+        self.sent.extend((QueueUrl, json.loads(e["MessageBody"]), e["DelaySeconds"]) for e in Entries)
+        return {"Successful": [{"Id": e["Id"], "MessageId": "m"} for e in Entries], "Failed": []}
+
+
+def test_dispatcher_handler_enqueues_to_message_or_default_queue(monkeypatch):
+    stub_sqs = StubSQS()
+    monkeypatch.setenv("APPROVED_QUEUE_URL", "https://sqs/approved")
+    monkeypatch.setattr("boto3.client", lambda name, **kwargs: stub_sqs)
+    dispatcher = importlib.reload(importlib.import_module("dispatcher"))
+
+    clock = Clock(T0)
+    monkeypatch.setattr(dispatcher, "scheduler", _scheduler(clock))
+    dispatcher.scheduler.schedule(json.dumps({"event_id": "e-1"}), T0 + 1000, schedule_id="e-1")
+    dispatcher.scheduler.schedule(
+        json.dumps({"event_id": "e-2"}), T0 + 1000, schedule_id="e-2", queue_url="https://sqs/other"
+    )
+
+    clock.now = T0 + 990
+    stats = dispatcher.lambda_handler({}, None)
+
+    assert stats["dispatched"] == 2
+    assert sorted(stub_sqs.sent, key=lambda s: s[1]["event_id"]) == [
+        ("https://sqs/approved", {"event_id": "e-1"}, 10),
+        ("https://sqs/other", {"event_id": "e-2"}, 10),
+    ]
@@ -0,0 +1,90 @@
+import glob
+import json
+import os
+
+import pytest
+
+from utils import schema
+
+EVENTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "events")
+
+
+def _event(**overrides):
+    payload = {"event_id": "e-1", "event": "advance_approved", "user": {"phone": "+15555550123"}, "amount": 185.0}
+    payload.update(overrides)
+    return payload
+
+
+def test_parse_event_returns_slotted_message():
+    evt = schema.parse_event(_event(send_at="2030-01-01T09:00:00-05:00", send_in_transit_now=True))
+
+    assert (evt.event_id, evt.event, evt.phone, evt.amount) == ("e-1", "advance_approved", "+15555550123", 185.0)
+    assert evt.send_at == 1893506400.0 and evt.send_in_transit_now
+    assert not hasattr(evt, "__dict__")
+
+
+@pytest.mark.parametrize(
+    "payload, error, fields",
+    [
+        (_event(user={}), schema.ERROR_MISSING_FIELDS, ["user.phone"]),
+        (_event(amount=None), schema.ERROR_MISSING_FIELDS, ["amount"]),
+        (_event(amount="185"), schema.ERROR_INVALID_FIELDS, ["amount"]),
+        (_event(amount=True), schema.ERROR_INVALID_FIELDS, ["amount"]),
+        (_event(user={"phone": 15555550123}), schema.ERROR_INVALID_FIELDS, ["user.phone"]),
+        (_event(event="advance_cancelled"), schema.ERROR_UNSUPPORTED_EVENT, ["event"]),
+        (_event(user={"phone": "555-0123"}), schema.ERROR_INVALID_PHONE, ["user.phone"]),
+        (_event(send_at="2030-01-01T09:00:00"), schema.ERROR_INVALID_SEND_AT, ["send_at"]),
+        (["not", "an", "object"], schema.ERROR_MISSING_FIELDS, ["event", "user.phone", "amount"]),
+    ],
+)
+def test_parse_event_enforces_the_contract(payload, error, fields):
+    with pytest.raises(schema.InvalidMessage) as exc:
+        schema.parse_event(payload)
+    assert (exc.value.error, exc.value.fields) == (error, fields)
+
+
+def test_in_transit_event_may_omit_amount():
+    assert schema.parse_event(_event(event="advance_in_transit", amount=None)).amount is None
+
+
+def test_worker_message_round_trip():
+    msg = schema.parse_event(_event(advance_id="adv-1")).worker_message()
+    msg.due_at_ms = 1_700_000_000_000
+
+    decoded = schema.decode_worker_message(msg.encode())
+
+    assert decoded.to_dict() == {
+        "event_id": "e-1",
+        "event": "advance_approved",
+        "user": {"phone": "+15555550123"},
+        "amount": 185.0,
+        "advance_id": "adv-1",
+        "due_at_ms": 1_700_000_000_000,
+    }
+
+
+@pytest.mark.parametrize(
+    "raw, error",
+    [
+        ("{not json", schema.ERROR_INVALID_JSON),
+        ('{"event_id": "e-1", "phone": "+15555550123", "amount": 1}', schema.ERROR_MISSING_FIELDS),
+        ('{"event": "advance_approved", "user": {"phone": "+1"}, "due_at_ms": "soon"}', schema.ERROR_INVALID_FIELDS),
+    ],
+)
+def test_decode_worker_message_rejects_malformed_bodies(raw, error):
+    with pytest.raises(schema.InvalidMessage) as exc:
+        schema.decode_worker_message(raw)
+    assert exc.value.error == error
+
+
+def test_sample_events_match_the_contract():
+    for path in glob.glob(os.path.join(EVENTS_DIR, "*.json")):
+        with open(path, "r", encoding="utf-8") as f:
+            event = json.load(f)
+        if "Records" in event:
+            for rec in event["Records"]:
+                schema.decode_worker_message(rec["body"])
+        elif event.get("routeKey") == "POST /sms":
+            schema.parse_event(json.loads(event["body"]))
+        elif "body" not in event:
+            schema.parse_event(event)
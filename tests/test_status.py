@@ -0,0 +1,166 @@
+import importlib
+import json
+from urllib.parse import parse_qsl
+
+from botocore.exceptions import ClientError
+
+import utils.status_store as status_store
+from utils import twilio_signature
+
+CALLBACK_URL = "https://api.example.com/staging/status"
+
+# Targets under test: status.lambda_handler, status_consumer.lambda_handler
+# We monkeypatch:
+#  - boto3.client("sqs") used inside status
+#  - utils.secrets.get_twilio_secrets (webhook signature auth token)
+#  - utils.status_store._client (DynamoDB)
+
+class StubSQS:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, QueueUrl, MessageBody):
+        self.sent.append(json.loads(MessageBody))
+        return {"MessageId": "1"}
+
+class FakeStatusTable:
+    """Understands the monotonic update and event_id query status_store issues."""
+
+    def __init__(self):
+        self.items = {}
+        self.updates = 0
+
+    def update_item(self, TableName, Key, UpdateExpression, ConditionExpression,
+                    ExpressionAttributeNames, ExpressionAttributeValues):
+        self.updates += 1
+        sid = Key["message_sid"]["S"]
+        values = ExpressionAttributeValues
+        item = self.items.get(sid)
+        if item is not None and int(item["status_rank"]["N"]) >= int(values[":r"]["N"]):
+            raise ClientError({"Error": {"Code": "ConditionalCheckFailedException"}}, "UpdateItem")
+        item = item or {"message_sid": {"S": sid}}
+        item.update({"status": values[":s"], "status_rank": values[":r"], "updated_at": values[":now"]})
+        if ":eid" in values:
+            item.setdefault("event_id", values[":eid"])
+        self.items[sid] = item
+        return {}
+
+    def query(self, TableName, IndexName, KeyConditionExpression, ExpressionAttributeValues):
+        eid = ExpressionAttributeValues[":eid"]["S"]
+        return {"Items": [i for i in self.items.values() if i.get("event_id", {}).get("S") == eid]}
+
+def _callback(sid, status, event_id="e-1"):
+    return {
+        "requestContext": {"http": {"method": "POST", "path": "/staging/status"}},
+        "rawPath": "/staging/status",
+        "rawQueryString": f"event_id={event_id}",
+        "queryStringParameters": {"event_id": event_id},
+        "body": f"MessageSid={sid}&MessageStatus={status}&To=%2B15555550123",
+    }
+
+def _sqs_records(updates):
+    return {"Records": [{"messageId": f"m-{i}", "body": json.dumps(u)} for i, u in enumerate(updates)]}
+
+def _signed(event, auth_token="token-1", url=CALLBACK_URL):
+    params = parse_qsl(event["body"])
+    if event.get("rawQueryString"):
+        url = f"{url}?{event['rawQueryString']}"
+    event.setdefault("headers", {})["x-twilio-signature"] = twilio_signature.compute_signature(url, params, auth_token)
+    return event
+
+def _load_status(monkeypatch, auth_tokens=("token-1",)):
+    monkeypatch.setenv("STATUS_QUEUE_URL", "https://sqs/status")
+    monkeypatch.setenv("STATUS_CALLBACK_URL", CALLBACK_URL)
+    tokens = list(auth_tokens)
+    monkeypatch.setattr("utils.secrets.get_twilio_secrets", lambda: {"auth_token": tokens.pop(0) if len(tokens) > 1 else tokens[0]})
+    stub_sqs = StubSQS()
+    monkeypatch.setattr("boto3.client", lambda name, **kwargs: stub_sqs, raising=True)
+    return importlib.reload(importlib.import_module("status")), stub_sqs
+
+def test_signature_matches_twilio_reference_vector():
+    params = {"CallSid": "CA1234567890ABCDE", "Caller": "+12349013030", "Digits": "1234", "From": "+12349013030", "To": "+18005551212"}
+    url = "https://mycompany.com/myapp.php?foo=1&bar=2"
+    assert twilio_signature.compute_signature(url, params.items(), "12345") == "0/KCTR6DLpKmkAf8muzZqo1nDgQ="
+
+def test_status_webhook_forwards_to_queue(monkeypatch):
+    status, stub_sqs = _load_status(monkeypatch)
+
+    with open("tests/events/api_twilio_status.json", "r", encoding="utf-8") as f:
+        event = json.load(f)
+    resp = status.lambda_handler(_signed(event), None)
+
+    assert resp["statusCode"] == 200
+    assert stub_sqs.sent[0]["message_sid"] == "SMabc123"
+    assert stub_sqs.sent[0]["status"] == "delivered"
+
+def test_status_webhook_rejects_unsigned_and_forged_callbacks(monkeypatch):
+    status, stub_sqs = _load_status(monkeypatch)
+
+    assert status.lambda_handler(_callback("SM1", "delivered"), None)["statusCode"] == 403
+    forged = _signed(_callback("SM1", "delivered"), auth_token="not-the-token")
+    assert status.lambda_handler(forged, None)["statusCode"] == 403
+    # Signed for a different event_id than the one in the URL
+    tampered = _signed(_callback("SM1", "delivered"))
+    tampered["rawQueryString"] = "event_id=e-2"
+    assert status.lambda_handler(tampered, None)["statusCode"] == 403
+    assert stub_sqs.sent == []
+
+    signed = _signed(_callback("SM1", "delivered"))
+    assert status.lambda_handler(signed, None)["statusCode"] == 200
+    assert stub_sqs.sent == [
+        {"message_sid": "SM1", "status": "delivered", "event_id": "e-1", "error_code": None,
+         "received_at": stub_sqs.sent[0]["received_at"]}
+    ]
+
+def test_status_webhook_picks_up_rotated_auth_token(monkeypatch):
+    status, stub_sqs = _load_status(monkeypatch, auth_tokens=("token-old", "token-new"))
+    status.signatures.min_reload_seconds = 0
+
+    resp = status.lambda_handler(_signed(_callback("SM1", "sent"), auth_token="token-new"), None)
+
+    assert resp["statusCode"] == 200
+    assert [u["message_sid"] for u in stub_sqs.sent] == ["SM1"]
+
+def test_status_consumer_collapses_and_never_regresses(monkeypatch):
+    monkeypatch.setenv("STATUS_TABLE", "delivery-status")
+    table = FakeStatusTable()
+    monkeypatch.setattr(status_store, "_client", table)
+    consumer = importlib.reload(importlib.import_module("status_consumer"))
+
+    batch = [
+        {"message_sid": "SM1", "status": "queued", "event_id": "e-1"},
+        {"message_sid": "SM1", "status": "delivered"},
+        {"message_sid": "SM1", "status": "sent"},
+        {"message_sid": "SM2", "status": "sent", "event_id": "e-2"},
+    ]
+    assert consumer.lambda_handler(_sqs_records(batch), None) == {"batchItemFailures": []}
+    # One conditional write per MessageSid, not per callback
+    assert table.updates == 2
+    assert table.items["SM1"]["status"] == {"S": "delivered"}
+    assert table.items["SM1"]["event_id"] == {"S": "e-1"}
+
+    # A late, out-of-order callback is ignored
+    consumer.lambda_handler(_sqs_records([{"message_sid": "SM1", "status": "sent"}]), None)
+    assert table.items["SM1"]["status"] == {"S": "delivered"}
+
+    assert status_store.latest_for_event("e-1")["status"] == "delivered"
+
+def test_status_query_requires_bearer_token(monkeypatch):
+    monkeypatch.setenv("INGEST_AUTH_REQUIRED", "true")
+    monkeypatch.setenv("STATUS_TABLE", "delivery-status")
+    monkeypatch.setattr("utils.secrets.get_twilio_secrets", lambda: {"auth_token": "token-1", "bearer": "test-bearer"})
+    table = FakeStatusTable()
+    table.items["SM1"] = {"message_sid": {"S": "SM1"}, "event_id": {"S": "e-1"}, "status": {"S": "delivered"},
+                          "status_rank": {"N": "4"}, "updated_at": {"N": "1700000000"}}
+    monkeypatch.setattr(status_store, "_client", table)
+    status = importlib.reload(importlib.import_module("status"))
+
+    query = {"requestContext": {"http": {"method": "GET", "sourceIp": "203.0.113.7"}}, "pathParameters": {"event_id": "e-1"}}
+    resp = status.lambda_handler(dict(query, headers={}), None)
+    assert resp["statusCode"] == 401
+    assert "SM1" not in resp["body"]
+    assert status.lambda_handler(dict(query, headers={"authorization": "Bearer wrong"}), None)["statusCode"] == 401
+
+    resp = status.lambda_handler(dict(query, headers={"authorization": "Bearer test-bearer"}), None)
+    assert resp["statusCode"] == 200
+    assert json.loads(resp["body"])["message_sid"] == "SM1"
@@ -0,0 +1,46 @@
+import pytest
+
+from utils.templates import TEMPLATES, TemplateRegistry, encoding_info
+
+# Target under test: utils.templates
+
+def test_encoding_info_counts_segments():
+    assert encoding_info("a" * 160) == ("GSM-7", 160, 1)
+    assert encoding_info("a" * 161) == ("GSM-7", 161, 2)
+    # Extension-table characters take two septets
+    assert encoding_info("€" * 80) == ("GSM-7", 160, 1)
+    # Emoji force UCS-2 and count as two UTF-16 code units
+    assert encoding_info("🎉" + "a" * 68) == ("UCS-2", 70, 1)
+    assert encoding_info("🎉" + "a" * 69) == ("UCS-2", 71, 2)
+
+def test_render_reports_encoding_and_version():
+    registry = TemplateRegistry(TEMPLATES)
+    rendered = registry.render({"event": "advance_approved", "amount": 185})
+
+    assert "$185.00" in rendered.body
+    assert rendered.encoding == "UCS-2"
+    assert rendered.segments == 2
+    assert rendered.as_fields()["template"] == "advance_approved@v1"
+    assert registry.stats["segments"] == 2
+
+def test_render_falls_back_to_single_gsm7_segment():
+    registry = TemplateRegistry(TEMPLATES, gsm7_fallback=True)
+    rendered = registry.render({"event": "advance_approved", "amount": 185})
+
+    assert rendered.variant == "gsm7"
+    assert rendered.encoding == "GSM-7"
+    assert rendered.segments == 1
+
+def test_render_rejects_unknown_events_and_missing_amount():
+    registry = TemplateRegistry(TEMPLATES)
+    with pytest.raises(ValueError):
+        registry.render({"event": "advance_cancelled", "amount": 1})
+    with pytest.raises(KeyError):
+        registry.render({"event": "advance_approved"})
+    assert registry.render({"event": "advance_in_transit"}).variant == "text_no_amount"
+
+def test_templates_are_precompiled_like_str_format():
+    registry = TemplateRegistry({"ping": {"version": 1, "text": "{{ok}} ${amount:,.2f} now"}})
+    assert registry.render({"event": "ping", "amount": 1234.5}).body == "{ok} $1,234.50 now"
+    with pytest.raises(ValueError):
+        TemplateRegistry({"ping": {"version": 1, "text": "{user.phone}"}})
@@ -0,0 +1,51 @@
+import utils.twilio_client as twilio_client
+
+# Target under test: utils.twilio_client.TwilioClientProvider
+# We monkeypatch:
+#  - utils.twilio_client.build_client
+
+class StubAuthError(Exception):
+    status = 401
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def _counting_builder(monkeypatch):
+    builds = []
+    def fake_build_client():
+        builds.append(len(builds) + 1)
+        return f"client-{len(builds)}", {"messaging_service_sid": "MGxxx"}
+    monkeypatch.setattr("utils.twilio_client.build_client", fake_build_client, raising=True)
+    return builds
+
+def test_provider_is_lazy_and_cached(monkeypatch):
+    builds = _counting_builder(monkeypatch)
+    clock = FakeClock()
+    provider = twilio_client.TwilioClientProvider(ttl_seconds=100, refresh_ahead_seconds=0, clock=clock)
+
+    assert builds == []
+    assert provider.get()[0] == "client-1"
+    clock.now = 99
+    assert provider.get()[0] == "client-1"
+    clock.now = 100
+    assert provider.get()[0] == "client-2"
+    assert builds == [1, 2]
+
+def test_provider_refreshes_once_on_401(monkeypatch):
+    builds = _counting_builder(monkeypatch)
+    provider = twilio_client.TwilioClientProvider(ttl_seconds=100, refresh_ahead_seconds=0)
+
+    calls = []
+    def send(client, conf):
+        calls.append(client)
+        if client == "client-1":
+            raise StubAuthError()
+        return "SM123"
+
+    assert provider.call(send) == "SM123"
+    assert calls == ["client-1", "client-2"]
+    assert builds == [1, 2]
@@ -1,8 +1,9 @@
 import json
-import os
 import importlib
+import threading
+import time
 
-# Target under test: src/worker.lambda_handler
+# Target under test: worker.lambda_handler
 # We monkeypatch:
 #  - utils.twilio_client.build_client
 
@@ -10,38 +11,349 @@ class StubTwilioMsg:
     def __init__(self, sid="SMYYYYYYYYYYYYYYYYYYYYYYYYYYYYYYY"):
         self.sid = sid
 
+class StubTwilioError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
 class StubTwilioClient:
-    def __init__(self):
+    def __init__(self, delay=0.0, fail_for=(), reject_for=()):
         self.sent = []
-
-    def messages(self):
-        return self
+        self.delay = delay
+        self.fail_for = set(fail_for)
+        self.reject_for = set(reject_for)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        # Twilio SDK uses .messages.create(...)
+        self.messages = self
 
     def create(self, to, messaging_service_sid, body):
-        self.sent.append({"to": to, "msid": messaging_service_sid, "body": body})
-        return StubTwilioMsg()
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.delay:
+                time.sleep(self.delay)
+            if to in self.fail_for:
+                raise RuntimeError("twilio down")
+            if to in self.reject_for:
+                raise StubTwilioError(400)
+            with self._lock:
+                self.sent.append({"to": to, "msid": messaging_service_sid, "body": body})
+            return StubTwilioMsg()
+        finally:
+            with self._lock:
+                self.in_flight -= 1
 
-def _load_event(path):
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+def _load_worker(monkeypatch, stub):
+    def fake_build_client():
+        return stub, {"messaging_service_sid": "MGxxxxxxxxxxxxxxxxxxxxx"}
+    monkeypatch.setattr("utils.twilio_client.build_client", fake_build_client, raising=True)
+    return importlib.reload(importlib.import_module("worker"))
 
-def test_worker_sends_approved(monkeypatch):
-    os.environ["AWS_REGION"] = "us-east-1"
-    os.environ["TWILIO_SECRET_NAME"] = "payslice/twilio/txn"
+def _record(i, event="advance_approved", phone="+15555550123", amount=185.0):
+    body = {"event_id": f"e-{i}", "event": event, "user": {"phone": phone}, "amount": amount}
+    return {"messageId": f"m-{i}", "receiptHandle": f"rh-{i}", "body": json.dumps(body)}
 
+def test_worker_sends_approved(monkeypatch):
     stub = StubTwilioClient()
-    def fake_build_client():
-        return stub, {"TWILIO_MSID": "MGxxxxxxxxxxxxxxxxxxxxx", "msid": "MGxxxxxxxxxxxxxxxxxxxxx"}
-    monkeypatch.setattr("src.utils.twilio_client.build_client", fake_build_client, raising=True)
+    worker = _load_worker(monkeypatch, stub)
 
-    worker = importlib.reload(importlib.import_module("src.worker"))
-    event = _load_event("tests/events/sqs_worker_event.json")
+    resp = worker.lambda_handler({"Records": [_record(1)]}, None)
 
-    resp = worker.lambda_handler(event, None)
-    assert resp["statusCode"] == 200
+    assert resp == {"batchItemFailures": []}
     assert len(stub.sent) == 1
     msg = stub.sent[0]
     assert msg["to"] == "+15555550123"
     assert msg["msid"].startswith("MG")
     assert "approved" in msg["body"].lower()
     assert "$185.00" in msg["body"]
+
+def test_worker_dispatches_batch_concurrently(monkeypatch):
+    monkeypatch.setenv("WORKER_CONCURRENCY", "4")
+    stub = StubTwilioClient(delay=0.05)
+    worker = _load_worker(monkeypatch, stub)
+
+    records = [_record(i, phone=f"+1555555{i:04d}") for i in range(8)]
+    started = time.perf_counter()
+    worker.lambda_handler({"Records": records}, None)
+    elapsed = time.perf_counter() - started
+
+    assert len(stub.sent) == 8
+    assert stub.max_in_flight == 4
+    # Two waves of 4 concurrent sends, not eight sequential ones.
+    assert elapsed < 0.05 * 8
+
+def test_worker_collects_per_record_results(monkeypatch):
+    monkeypatch.setenv("WORKER_CONCURRENCY", "1")
+    stub = StubTwilioClient(fail_for={"+15555550002"})
+    worker = _load_worker(monkeypatch, stub)
+
+    results = [
+        worker._process_record(_record(1, phone="+15555550001")),
+        worker._process_record(_record(2, phone="+15555550002")),
+        worker._process_record({"messageId": "m-3", "body": "{not json"}),
+    ]
+
+    assert [r["status"] for r in results] == ["sent", "transient_error", "permanent_error"]
+    assert results[1]["error"] == "twilio_error"
+    assert results[2]["error"] == "invalid_json"
+
+def test_worker_reports_only_transient_failures(monkeypatch):
+    stub = StubTwilioClient(fail_for={"+15555550002"}, reject_for={"+15555550003"})
+    worker = _load_worker(monkeypatch, stub)
+
+    records = [
+        _record(1, phone="+15555550001"),
+        _record(2, phone="+15555550002"),             # Twilio outage -> retry
+        _record(3, phone="+15555550003"),             # Twilio 400 -> drop
+        {"messageId": "m-4", "body": "{not json"},    # bad JSON -> drop
+        {"messageId": "m-5", "body": json.dumps({"event_id": "e-5", "event": "advance_approved", "amount": 1})},
+        _record(6, event="advance_cancelled"),        # unsupported event -> drop
+    ]
+    resp = worker.lambda_handler({"Records": records}, None)
+
+    assert resp == {"batchItemFailures": [{"itemIdentifier": "m-2"}]}
+    assert [m["to"] for m in stub.sent] == ["+15555550001"]
+
+def test_worker_renders_in_transit_without_amount(monkeypatch):
+    stub = StubTwilioClient()
+    worker = _load_worker(monkeypatch, stub)
+
+    body = {"event_id": "e-1", "event": "advance_in_transit", "user": {"phone": "+15555550123"}}
+    resp = worker.lambda_handler({"Records": [{"messageId": "m-1", "body": json.dumps(body)}]}, None)
+
+    assert resp == {"batchItemFailures": []}
+    assert "Ta-dah! Your advance is being sent" in stub.sent[0]["body"]
+
+def test_worker_skips_event_ids_already_sent(monkeypatch, fake_dynamodb):
+    stub = StubTwilioClient()
+    worker = _load_worker(monkeypatch, stub)
+
+    first = worker.lambda_handler({"Records": [_record(1), _record(2)]}, None)
+    # Redelivery of e-1 alongside a new event
+    second = worker.lambda_handler({"Records": [_record(1), _record(3)]}, None)
+
+    assert first == {"batchItemFailures": []}
+    assert second == {"batchItemFailures": []}
+    assert len(stub.sent) == 3
+    item = fake_dynamodb.tables["payslice-sms-idempotency"]["e-1"]
+    assert item["status"] == {"S": "completed"}
+
+def test_worker_releases_claim_on_failed_send(monkeypatch, fake_dynamodb):
+    stub = StubTwilioClient(fail_for={"+15555550123"})
+    worker = _load_worker(monkeypatch, stub)
+
+    resp = worker.lambda_handler({"Records": [_record(1)]}, None)
+
+    assert resp == {"batchItemFailures": [{"itemIdentifier": "m-1"}]}
+    assert "e-1" not in fake_dynamodb.tables["payslice-sms-idempotency"]
+
+def test_worker_defers_rate_limited_recipients(monkeypatch, fake_dynamodb):
+    monkeypatch.setenv("RATE_LIMIT_PHONE_PER_MINUTE", "1")
+    monkeypatch.setenv("WORKER_CONCURRENCY", "1")
+    stub = StubTwilioClient()
+    worker = _load_worker(monkeypatch, stub)
+
+    resp = worker.lambda_handler({"Records": [_record(1), _record(2)]}, None)
+
+    assert len(stub.sent) == 1
+    assert resp == {"batchItemFailures": [{"itemIdentifier": "m-2"}]}
+    # The deferred event can be claimed again on redelivery
+    assert "e-2" not in fake_dynamodb.tables["payslice-sms-idempotency"]
+
+def test_worker_retries_only_the_record_whose_rate_limit_check_failed(monkeypatch, fake_dynamodb):
+    stub = StubTwilioClient()
+    worker = _load_worker(monkeypatch, stub)
+    acquire = worker.limiter.acquire
+
+    def flaky_acquire(phone):
+        if phone == "+15555550002":
+            raise RuntimeError("ProvisionedThroughputExceededException")
+        return acquire(phone)
+
+    monkeypatch.setattr(worker.limiter, "acquire", flaky_acquire)
+    records = [_record(i, phone=f"+1555555{i:04d}") for i in range(1, 4)]
+    resp = worker.lambda_handler({"Records": records}, None)
+
+    assert resp == {"batchItemFailures": [{"itemIdentifier": "m-2"}]}
+    assert len(stub.sent) == 2
+    assert "e-2" not in fake_dynamodb.tables["payslice-sms-idempotency"]
+
+def test_worker_sheds_remaining_records_when_breaker_opens(monkeypatch, fake_dynamodb):
+    monkeypatch.setenv("WORKER_CONCURRENCY", "1")
+    monkeypatch.setenv("CIRCUIT_BREAKER_MIN_CALLS", "3")
+    phones = [f"+1555555{i:04d}" for i in range(10)]
+    stub = StubTwilioClient(fail_for=phones)
+    worker = _load_worker(monkeypatch, stub)
+
+    resp = worker.lambda_handler({"Records": [_record(i, phone=p) for i, p in enumerate(phones)]}, None)
+
+    # Every record is retried, but only the first 3 waited on Twilio
+    assert len(resp["batchItemFailures"]) == 10
+    snap = worker.breaker.snapshot()
+    assert snap["state"] == "open"
+    assert snap["rejected"] == 7
+    # Shed records never claimed their event_id
+    assert fake_dynamodb.calls.count("put_item") == 3
+
+def test_worker_emits_stage_metrics(monkeypatch, capsys):
+    monkeypatch.setenv("POWERTOOLS_METRICS_NAMESPACE", "PaySliceSms")
+    stub = StubTwilioClient()
+    worker = _load_worker(monkeypatch, stub)
+    worker.templates.registry.drain_stats()
+
+    rec = _record(1)
+    rec["attributes"] = {
+        "SentTimestamp": "1700000000000",
+        "ApproximateFirstReceiveTimestamp": "1700000120500",
+        "ApproximateReceiveCount": "1",
+    }
+    worker.lambda_handler({"Records": [rec]}, None)
+
+    docs = [json.loads(line) for line in capsys.readouterr().out.splitlines() if '"_aws"' in line]
+    merged = {}
+    for doc in docs:
+        merged.update({k: v for k, v in doc.items() if k not in ("_aws", "Function")})
+    assert merged["QueueDwellTime"] == [120500]
+    assert merged["BatchSize"] == [1]
+    assert len(merged["TwilioSendLatency"]) == 1
+    assert merged["SmsRendered"] == 1
+    assert merged["CircuitBreakerState"] == 0
+    assert any(d.get("Outcome") == "sent" and d["Records"] == 1 for d in docs)
+
+def test_worker_reports_lane_slo_breaches(monkeypatch, capsys, caplog):
+    monkeypatch.setenv("POWERTOOLS_METRICS_NAMESPACE", "PaySliceSms")
+    monkeypatch.setenv("WORKER_LANE", "instant")
+    monkeypatch.setenv("LANE_DWELL_SLO_MS_INSTANT", "1000")
+    worker = _load_worker(monkeypatch, StubTwilioClient())
+
+    records = []
+    for i, due_at in enumerate((1700000000000, 1700000004000)):
+        rec = _record(i)
+        body = json.loads(rec["body"])
+        body["due_at_ms"] = due_at
+        rec["body"] = json.dumps(body)
+        rec["attributes"] = {
+            "SentTimestamp": "1700000000000",
+            "ApproximateFirstReceiveTimestamp": "1700000004500",
+            "ApproximateReceiveCount": "1",
+        }
+        records.append(rec)
+    worker.lambda_handler({"Records": records}, None)
+
+    out = capsys.readouterr().out
+    lane_doc = next(
+        json.loads(line) for line in out.splitlines() if '"_aws"' in line and '"Lane"' in line
+    )
+    assert lane_doc["Lane"] == "instant"
+    assert lane_doc["QueueLateness"] == [4500, 500]
+    assert lane_doc["DwellSloBreaches"] == 1
+    assert "worker.lane_slo_breached: lane=instant breaches=1" in caplog.text
+
+def test_worker_coalesces_same_advance_into_one_sms(monkeypatch, fake_dynamodb):
+    stub = StubTwilioClient()
+    worker = _load_worker(monkeypatch, stub)
+
+    in_transit = {"event_id": "e-1:advance_in_transit", "event": "advance_in_transit", "user": {"phone": "+15555550123"}}
+    records = [
+        {"messageId": "m-0", "body": json.dumps(in_transit)},
+        _record(1),                                   # advance_approved for the same advance
+        _record(2, phone="+15555550999"),             # someone else: sent as is
+    ]
+    resp = worker.lambda_handler({"Records": records}, None)
+
+    assert resp == {"batchItemFailures": []}
+    bodies = {m["to"]: m["body"] for m in stub.sent}
+    assert len(stub.sent) == 2
+    assert "approved and is being sent" in bodies["+15555550123"]
+    assert "$185.00" in bodies["+15555550123"]
+    # The suppressed record is marked done, so a redelivery is a duplicate
+    item = fake_dynamodb._table("payslice-sms-idempotency")[fake_dynamodb._key({"id": {"S": "e-1:advance_in_transit"}})]
+    assert item["coalesced_into"] == {"S": "e-1"}
+
+def test_worker_coalesced_records_retry_with_their_primary(monkeypatch, fake_dynamodb):
+    stub = StubTwilioClient(fail_for={"+15555550123"})
+    worker = _load_worker(monkeypatch, stub)
+
+    in_transit = {"event_id": "e-1:advance_in_transit", "event": "advance_in_transit", "user": {"phone": "+15555550123"}}
+    resp = worker.lambda_handler({"Records": [{"messageId": "m-0", "body": json.dumps(in_transit)}, _record(1)]}, None)
+
+    assert resp == {"batchItemFailures": [{"itemIdentifier": "m-0"}, {"itemIdentifier": "m-1"}]}
+
+def test_worker_retries_coalesced_records_when_primary_was_not_sent(monkeypatch, fake_dynamodb):
+    stub = StubTwilioClient()
+    worker = _load_worker(monkeypatch, stub)
+    claim = worker.idempotency.claim
+    # e-1 was sent by another container between the pre-check and its claim
+    monkeypatch.setattr(worker.idempotency, "claim",
+                        lambda event_id: worker.idempotency.ALREADY_COMPLETED if event_id == "e-1" else claim(event_id))
+
+    in_transit = {"event_id": "e-1:advance_in_transit", "event": "advance_in_transit", "user": {"phone": "+15555550123"}}
+    resp = worker.lambda_handler({"Records": [{"messageId": "m-0", "body": json.dumps(in_transit)}, _record(1)]}, None)
+
+    # The merged SMS never went out, so the in-transit record is retried
+    assert resp == {"batchItemFailures": [{"itemIdentifier": "m-0"}]}
+    assert stub.sent == []
+    assert "e-1:advance_in_transit" not in fake_dynamodb.tables["payslice-sms-idempotency"]
+
+def test_worker_drops_event_covered_by_recent_send(monkeypatch, fake_dynamodb):
+    monkeypatch.setenv("COALESCE_WINDOW_SECONDS", "300")
+    stub = StubTwilioClient()
+    worker = _load_worker(monkeypatch, stub)
+    worker.coalescer.store._client = fake_dynamodb
+
+    in_transit = {"event_id": "e-1:advance_in_transit", "event": "advance_in_transit",
+                  "user": {"phone": "+15555550123"}, "amount": 185.0}
+    worker.lambda_handler({"Records": [{"messageId": "m-0", "body": json.dumps(in_transit)}]}, None)
+    # Approval for the same advance arrives on the standard lane later on
+    resp = worker.lambda_handler({"Records": [_record(1), _record(2, amount=50.0)]}, None)
+
+    assert resp == {"batchItemFailures": []}
+    assert [m["body"] for m in stub.sent][0].startswith("Ta-dah!")
+    assert len(stub.sent) == 2  # e-2 is a different advance
+
+def test_worker_records_error_class_on_last_receive(monkeypatch, fake_dynamodb):
+    stub = StubTwilioClient(fail_for={"+15555550123"})
+    worker = _load_worker(monkeypatch, stub)
+
+    first, last = _record(1), _record(2)
+    first["attributes"] = {"ApproximateReceiveCount": "1"}
+    last["attributes"] = {"ApproximateReceiveCount": str(worker.MAX_RECEIVE_COUNT)}
+    worker.lambda_handler({"Records": [first, last]}, None)
+
+    assert worker.idempotency.failure_classes(["e-1", "e-2"]) == {"e-2": "twilio_error"}
+
+def test_worker_drops_content_duplicates_under_new_event_ids(monkeypatch, fake_dynamodb):
+    monkeypatch.setenv("DEDUP_WINDOW_SECONDS", "300")
+    stub = StubTwilioClient()
+    worker = _load_worker(monkeypatch, stub)
+    worker.deduper.store._client = fake_dynamodb
+
+    # e-1 and e-2 are the same approval emitted twice upstream
+    resp = worker.lambda_handler({"Records": [_record(1), _record(2), _record(3, amount=50.0)]}, None)
+
+    assert resp == {"batchItemFailures": []}
+    assert len(stub.sent) == 2
+    table = fake_dynamodb.tables["payslice-sms-idempotency"]
+    dropped = "e-2" if table["e-1"].get("sid") else "e-1"
+    assert table[dropped]["status"] == {"S": "completed"}
+    assert "duplicate_of" in table[dropped]
+
+    # A later copy is dropped from the in-container cache
+    worker.lambda_handler({"Records": [_record(4)]}, None)
+    assert len(stub.sent) == 2
+
+def test_worker_releases_content_claim_on_failed_send(monkeypatch, fake_dynamodb):
+    monkeypatch.setenv("DEDUP_WINDOW_SECONDS", "300")
+    stub = StubTwilioClient(fail_for={"+15555550123"})
+    worker = _load_worker(monkeypatch, stub)
+    worker.deduper.store._client = fake_dynamodb
+
+    assert worker.lambda_handler({"Records": [_record(1)]}, None) == {"batchItemFailures": [{"itemIdentifier": "m-1"}]}
+
+    # Twilio recovered: the copy under another event_id now goes out
+    stub.fail_for.clear()
+    assert worker.lambda_handler({"Records": [_record(2)]}, None) == {"batchItemFailures": []}
+    assert len(stub.sent) == 1